@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+from tkinter import messagebox
+
+# Фоновые задачи для GUI: работа (SQL, расчёт) идёт в пуле потоков, а результат
+# передаётся в главный поток Tk опросом через root.after — трогать виджеты
+# можно только оттуда.
+#
+# Задачи с одним ключом вытесняют друг друга: новый refresh отменяет ещё не
+# начатый старый, а результат уже запущенного просто не применяется.
+# Задачи с ключом None (запись) выполняются и применяются всегда.
+
+WORKERS = 2
+POLL_MS = 30
+
+
+class BackgroundExecutor:
+    def __init__(self, root, workers: int = WORKERS,
+                 on_busy: Optional[Callable[[bool], None]] = None):
+        self.root = root
+        self.on_busy = on_busy
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assistant-bg")
+        self._pending: List[tuple] = []  # (ключ, поколение, future, on_done, on_error)
+        self._generations: Dict[Hashable, int] = {}
+        self._polling = False
+        self._busy = False
+
+    def submit(self, key: Optional[Hashable], work: Callable, on_done: Callable,
+               on_error: Optional[Callable[[BaseException], None]] = None):
+        generation = 0
+        if key is not None:
+            self.cancel(key)
+            generation = self._generations[key]
+        future = self._pool.submit(work)
+        self._pending.append((key, generation, future, on_done, on_error or self.show_error))
+        self._set_busy(True)
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def cancel(self, key: Hashable):
+        self._generations[key] = self._generations.get(key, 0) + 1
+        for pending_key, _, future, _, _ in self._pending:
+            if pending_key == key:
+                future.cancel()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def show_error(error: BaseException):
+        messagebox.showerror("Ошибка", str(error))
+
+    def _current(self, key: Optional[Hashable], generation: int) -> bool:
+        return key is None or self._generations.get(key) == generation
+
+    def _poll(self):
+        pending, finished = [], []
+        for item in self._pending:
+            (finished if item[2].done() else pending).append(item)
+        self._pending = pending
+
+        # Колбэки могут поставить новые задачи — к этому моменту список уже обновлён
+        for key, generation, future, on_done, on_error in finished:
+            if future.cancelled() or not self._current(key, generation):
+                continue
+            error = future.exception()
+            if error is not None:
+                on_error(error)
+            else:
+                on_done(future.result())
+
+        if self._pending:
+            self.root.after(POLL_MS, self._poll)
+        else:
+            self._polling = False
+        self._set_busy(any(self._current(key, generation) for key, generation, *_ in self._pending))
+
+    def _set_busy(self, busy: bool):
+        if busy != self._busy:
+            self._busy = busy
+            if self.on_busy:
+                self.on_busy(busy)
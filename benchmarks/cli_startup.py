@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from day_planner import PLAN_TIME_BUDGET
+
+# Старт консольного входа (cli.py). Время импорта берётся из python -X
+# importtime (собственное время модулей без старта интерпретатора), время
+# команд — по часам вокруг процесса, вместе со стартом интерпретатора.
+# Бюджет импорта и запрет tkinter, модулей GUI и numpy проверяет pytest
+# (tests/test_cli_startup.py); здесь — отчёт по времени и бюджет команд.
+# Запуск: python -m benchmarks.cli_startup [число задач]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 30      # import cli: argparse и datetime
+COMMAND_BUDGET_MS = 150    # одна команда с запуском python; plan — плюс PLAN_TIME_BUDGET
+FORBIDDEN = ("tkinter", "_tkinter", "numpy", "smart_assistant", "gui_main", "gui_tabs",
+             "gui_windows", "paged_tree", "background", "events")
+COMMANDS = (
+    ["recommend", "--peek"],
+    ["list", "today"],
+    ["list", "done", "--limit", "5"],
+    ["plan"],
+    ["postpone", "{task}"],
+    ["done", "{task}"],
+)
+
+
+def command_args(db_path: str, command: list) -> list:
+    # {task} — открытая задача: done и postpone по закрытой честно вернут 1
+    conn = sqlite3.connect(db_path)
+    try:
+        task_id = conn.execute("SELECT MIN(id) FROM tasks WHERE status = 'todo'").fetchone()[0]
+    finally:
+        conn.close()
+    return ["--db", db_path] + [arg.format(task=task_id) for arg in command]
+
+
+def imported(args: list) -> tuple:
+    # (модули, что загрузились при импорте до запуска команды, мс на import cli).
+    # Упавшая команда не успела бы загрузить всё, что нужно дальше, поэтому
+    # ненулевой код выхода — ошибка, а не «лёгкий» набор модулей
+    probe = ("import sys, cli; sys.argv[1:] = %r; "
+             "code = cli.main(); print(*sorted(sys.modules), sep='\\n', file=sys.stderr); "
+             "sys.exit(code)" % (args,))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe if args else "import cli"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        errors = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"cli {' '.join(args)}: код {result.returncode}\n{errors}")
+    modules, cli_us = set(), 0
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            parts = [part.strip() for part in line[len("import time:"):].split("|")]
+            name = parts[2]
+            modules.add(name.strip())
+            if name == "cli":
+                cli_us = int(parts[1])
+        elif line and " " not in line:
+            modules.add(line)
+    return modules, cli_us / 1000
+
+
+def run(db_path: str) -> list:
+    failures = []
+    _, cli_ms = imported([])
+    print(f"import cli: {cli_ms:.1f} мс (бюджет {IMPORT_BUDGET_MS})")
+
+    for command in COMMANDS:
+        args = command_args(db_path, command)
+        start = time.perf_counter()
+        imported(args)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{' '.join(command):28} {elapsed:7.1f} мс")
+        budget = COMMAND_BUDGET_MS + (PLAN_TIME_BUDGET * 1000 if command[0] == "plan" else 0)
+        if elapsed > budget:
+            failures.append(f"{' '.join(command)}: {elapsed:.1f} мс")
+    return failures
+
+
+def main() -> int:
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = run(generate(os.path.join(tmp, "cli.db"), n_tasks))
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
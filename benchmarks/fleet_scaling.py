@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.generate import generate
+from fleet import database_paths, score_fleet
+
+# Пакетная оценка (fleet.py): DATABASES баз по n задач, сначала в один
+# процесс, потом пулом по ядрам. Записи пула должны совпасть с
+# последовательными (кроме времени), энергия — быть подставленной, битая база —
+# дать строку с ошибкой, не трогая остальные. Ускорение проверяется, только
+# если ядер больше одного: не меньше SPEEDUP_SHARE от min(ядер, баз).
+# Запуск: python -m benchmarks.fleet_scaling [задач на базу] [баз]
+
+DATABASES = 16
+SPEEDUP_SHARE = 0.5
+
+
+def timed(paths: list, now: datetime, workers: int) -> tuple:
+    start = time.perf_counter()
+    records = list(score_fleet(paths, now, "high", 5, workers=workers))
+    return time.perf_counter() - start, records
+
+
+def comparable(records: list) -> list:
+    return sorted(({key: value for key, value in record.items() if key != "ms"} for record in records),
+                  key=lambda record: record["db"])
+
+
+def main() -> int:
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    n_databases = int(sys.argv[2]) if len(sys.argv) > 2 else DATABASES
+    cores = os.cpu_count() or 1
+    # Завтра в 10:00 — задачи генератора разбросаны по датам, на завтра они тоже есть
+    now = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(n_databases):
+            generate(os.path.join(tmp, f"person_{i:03}.db"), n_tasks, seed=i + 1)
+        paths = database_paths([tmp])
+
+        serial, expected = timed(paths, now, 1)
+        # Хотя бы два процесса, чтобы пул сверялся и на одном ядре
+        parallel, records = timed(paths, now, max(cores, 2))
+        speedup = serial / parallel
+        print(f"{len(paths)} баз по {n_tasks} задач: один процесс {serial:.2f} с, "
+              f"{max(cores, 2)} процессов {parallel:.2f} с ({speedup:.2f}x), ядер {cores}")
+
+        if comparable(records) != comparable(expected):
+            failures.append("пул и один процесс дали разные рекомендации")
+        for record in records:
+            if "error" in record:
+                failures.append(f"{record['db']}: {record['error']}")
+            elif record["energy_level"] != "high" or not record["recommendations"]:
+                failures.append(f"{record['db']}: энергия {record['energy_level']}, "
+                                f"рекомендаций {len(record['recommendations'])}")
+        if cores > 1 and speedup < SPEEDUP_SHARE * min(cores, len(paths)):
+            failures.append(f"ускорение {speedup:.2f}x на {cores} ядрах")
+
+        broken = os.path.join(tmp, "broken.db")
+        with open(broken, "wb") as f:
+            f.write(b"not a database")
+        _, records = timed([broken, paths[0]], now, 2)
+        errors = {record["db"]: "error" in record for record in records}
+        if errors != {broken: True, paths[0]: False}:
+            failures.append(f"битая база: {errors}")
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from init_db import init_db
+from priority_calculator import DAYS
+
+# Детерминированный генератор баз со схемой assistant.db: расписание, цели,
+# история энергии, задачи и случайный DAG зависимостей. Одинаковые n и seed
+# дают одинаковую базу (даты — относительно дня генерации).
+# users > 1 — общая база: у каждого пользователя свои n задач, цели, энергия и
+# расписание, id идут подряд по пользователям.
+# Запуск: python -m benchmarks.generate путь.db [число задач] [seed] [пользователей]
+
+CHUNK = 10_000
+TASKS_PER_GOAL = 50
+DEPENDENCY_WINDOW = 1_000  # блокеры ищутся среди ближайших предыдущих задач
+
+
+def generate(path: str, n_tasks: int, seed: int = 1, users: int = 1) -> str:
+    if os.path.exists(path):
+        os.remove(path)
+    rnd = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+
+    conn = sqlite3.connect(path)
+    init_db(conn)
+    cursor = conn.cursor()
+    for user_id in range(1, users + 1):
+        _generate_user(cursor, rnd, user_id, n_tasks, now)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _generate_user(cursor: sqlite3.Cursor, rnd: random.Random, user_id: int, n_tasks: int, now: datetime):
+    today = now.date()
+    cursor.execute("INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)", (user_id, f"user{user_id}"))
+
+    # Рабочий день на все сутки: рекомендации есть в любое время запуска
+    cursor.executemany("INSERT INTO schedule (user_id, day_of_week, start_time, end_time) VALUES (?, ?, ?, ?)",
+                       [(user_id, day, "00:00", "23:59") for day in DAYS])
+
+    n_goals = max(1, n_tasks // TASKS_PER_GOAL)
+    first_goal = (user_id - 1) * n_goals + 1
+    cursor.executemany("INSERT INTO goals (id, user_id, title, weight, deadline) VALUES (?, ?, ?, ?, ?)", [
+        (goal_id, user_id, f"Цель {goal_id}", rnd.choice((0.1, 0.3, 0.5, 0.8, 1.0)),
+         (today + timedelta(days=rnd.randint(1, 180))).isoformat() if rnd.random() < 0.6 else None)
+        for goal_id in range(first_goal, first_goal + n_goals)])
+
+    n_energy = max(1, n_tasks // 100)
+    cursor.executemany("INSERT INTO user_energy (user_id, energy_level, updated_at) VALUES (?, ?, ?)", [
+        (user_id, rnd.choice(("low", "medium", "high")),
+         (now - timedelta(minutes=30 * (n_energy - i))).strftime("%Y-%m-%d %H:%M:%S"))
+        for i in range(n_energy)])
+
+    first_task = (user_id - 1) * n_tasks + 1
+    last_task = first_task + n_tasks - 1
+    for start in range(first_task, last_task + 1, CHUNK):
+        tasks, edges = [], []
+        for task_id in range(start, min(start + CHUNK, last_task + 1)):
+            tasks.append((user_id,) + _task_row(rnd, task_id, n_goals, now, first_goal - 1))
+            if task_id > first_task and rnd.random() < 0.3:
+                low = max(first_task, task_id - DEPENDENCY_WINDOW)
+                for blocker_id in rnd.sample(range(low, task_id), min(task_id - low, rnd.randint(1, 3))):
+                    edges.append((task_id, blocker_id))
+        cursor.executemany('''
+            INSERT INTO tasks (
+                user_id, id, title, duration_minutes, importance_level, status, created_date,
+                scheduled_date, deadline, goal_id, energy_type, task_type, contribution
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', tasks)
+        cursor.executemany("INSERT INTO task_dependencies (task_id, blocker_id) VALUES (?, ?)", edges)
+
+
+def _task_row(rnd: random.Random, task_id: int, n_goals: int, now: datetime, goal_offset: int = 0) -> tuple:
+    today = now.date()
+    # Примерно пятая часть задач — на сегодня, остальные в пределах ±30 дней
+    offset = 0 if rnd.random() < 0.2 else rnd.randint(-30, 30)
+    deadline = None
+    if rnd.random() < 0.6:
+        deadline = (now + timedelta(minutes=rnd.randint(-600, 60 * 24 * 14))).strftime("%Y-%m-%d %H:%M")
+    return (task_id, f"Задача {task_id}", rnd.randint(5, 240), rnd.randint(1, 10),
+            rnd.choices(("todo", "in_progress", "done"), (6, 1, 3))[0],
+            (today - timedelta(days=rnd.randint(0, 60))).isoformat(),
+            (today + timedelta(days=offset)).isoformat(), deadline,
+            goal_offset + rnd.randint(1, n_goals) if rnd.random() < 0.8 else None,
+            rnd.choice(("low", "medium", "high")),
+            rnd.choice(("creative", "analytical", "routine", "communication")),
+            rnd.choice((0.5, 0.8, 1.0)))
+
+
+if __name__ == "__main__":
+    generate(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10_000,
+             int(sys.argv[3]) if len(sys.argv) > 3 else 1,
+             int(sys.argv[4]) if len(sys.argv) > 4 else 1)
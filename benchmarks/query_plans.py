@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks.generate import generate
+from horizon_scheduler import HorizonScheduler
+from priority_calculator import PriorityCalculator
+from task_views import today_list, done_list, goal_task_list, today_rows, goal_rows
+
+# Проверка EXPLAIN QUERY PLAN для горячих запросов: каждый вызов ниже
+# выполняется на сгенерированной базе, его SELECT-ы перехватываются через
+# set_trace_callback и разбираются. Запрос не проходит, если в плане нет
+# ожидаемого индекса или есть полный просмотр таблицы без индекса.
+# Запуск: python -m benchmarks.query_plans [число задач]; те же проверки
+# собирает pytest (tests/test_query_plans.py)
+
+FULL_SCAN_ALLOWED = (
+    "SELECT id, status FROM tasks",                           # граф зависимостей грузит все задачи
+    "SELECT task_id, blocker_id FROM task_dependencies",
+    "SELECT day_of_week, start_time, end_time FROM schedule",  # семь строк
+)
+
+
+def checks(conn: sqlite3.Connection):
+    # (название, вызов, ожидаемый индекс, соединение, на котором идут его запросы)
+    calc = PriorityCalculator(conn)
+    goal_id = conn.execute("SELECT MIN(goal_id) FROM tasks").fetchone()[0]
+    return [entry + (conn,) if len(entry) == 3 else entry for entry in [
+        ("candidate_rows (сегодня)", calc.fetch_tasks, "idx_tasks_day_status"),
+        # Все даты: покрывающий индекс по диапазону пользователя дешевле, чем
+        # idx_tasks_status (user_id, status) с чтением строк таблицы
+        ("candidate_rows (все даты)", lambda: calc.fetch_tasks(all_dates=True), "idx_tasks_day_status"),
+        ("load_today_tasks", lambda: today_rows(conn), "idx_tasks_day_importance"),
+        ("страница сегодня (keyset)", lambda: today_list().page(conn, (5, 10 ** 9), 100),
+         "idx_tasks_day_importance"),
+        ("граница страницы сегодня", lambda: today_list().key_at(conn, None, 1000),
+         "idx_tasks_day_importance"),
+        ("страница выполненных", lambda: done_list().page(conn, (10 ** 9,), 100), "idx_tasks_day_status"),
+        ("задачи цели", lambda: goal_task_list(goal_id).page(conn, ("todo", None, 0), 100), "idx_tasks_goal"),
+        ("load_goals", lambda: goal_rows(conn), "idx_goals_user"),
+        # Расписание и энергия читаются на отдельном соединении контекста
+        ("energy_level", lambda: (calc.schedule_context.invalidate_energy(),
+                                  calc.schedule_context.energy_level()), "idx_user_energy_updated",
+         calc.schedule_context.conn),
+        ("get_dynamic_goal_weight", lambda: calc.get_dynamic_goal_weight(goal_id), None),
+        ("горизонт", lambda: HorizonScheduler(calc).plan(), "idx_tasks_status"),
+    ]]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> list:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def check(conn: sqlite3.Connection, name: str, func, expected_index) -> list:
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = [(sql, query_plan(conn, sql)) for sql in statements
+             if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+    print(f"{name}:")
+    for sql, plan in plans:
+        for line in plan:
+            print(f"    {line}")
+    failures = []
+    used = " ".join(line for _, plan in plans for line in plan)
+    if expected_index and expected_index not in used:
+        failures.append(f"{name}: не используется {expected_index}")
+    for sql, plan in plans:
+        if " ".join(sql.split()) in FULL_SCAN_ALLOWED:
+            continue
+        for line in plan:
+            if line.startswith("SCAN") and "INDEX" not in line and not line.startswith(("SCAN g", "SCAN goals")):
+                failures.append(f"{name}: полный просмотр ({line})")
+    return failures
+
+
+def run(conn: sqlite3.Connection) -> list:
+    failures = []
+    for name, func, expected_index, target in checks(conn):
+        failures.extend(check(target, name, func, expected_index))
+    return failures
+
+
+def main(n: int = 5_000):
+    path = os.path.join(tempfile.gettempdir(), f"query_plans_{n}.db")
+    generate(path, n)
+    conn = sqlite3.connect(path)
+    try:
+        failures = run(conn)
+    finally:
+        conn.close()
+        os.remove(path)
+    for line in failures:
+        print("ОШИБКА:", line)
+    print("Все запросы используют индексы" if not failures else f"Проблем: {len(failures)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000))
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from server import AssistantServer
+from storage import Storage
+
+# Нагрузка на server.py: сервер и клиенты в одном процессе и одном потоке
+# asyncio (клиенты тоже на этом ядре, так что оценка снизу). CLIENTS
+# соединений keep-alive одновременно шлют по ROUNDS запросов рекомендации и
+# списка; посередине одна отметка «выполнено» должна сбросить кэш, и
+# следующая рекомендация — уже другая задача.
+# Запуск: python -m benchmarks.server_load [число задач] [соединений]
+
+ROUNDS = 5
+
+
+async def request(reader, writer, method: str, target: str, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                 + body)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port: int, latencies: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for round_no in range(ROUNDS):
+            for target in ("/recommend", "/tasks?status=todo&limit=50"):
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, "GET", target)
+                latencies.append(time.perf_counter() - start)
+                assert status == 200, (target, status)
+    finally:
+        writer.close()
+
+
+async def run(path: str, clients: int) -> list:
+    storage = Storage(path)
+    app = AssistantServer(storage)
+    server = await asyncio.start_server(app.handle, "127.0.0.1", 0, backlog=clients)
+    port = server.sockets[0].getsockname()[1]
+    failures = []
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        _, first = await request(reader, writer, "GET", "/recommend")
+
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(port, latencies) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        print(f"{len(latencies)} запросов от {clients} соединений за {elapsed:.2f} с "
+              f"({len(latencies) / elapsed:.0f} в секунду), "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс")
+
+        if first["task"] is None:
+            failures.append("нет рекомендации на сгенерированной базе")
+        else:
+            status, done = await request(reader, writer, "POST", "/tasks/done", {"ids": [first["task"]["id"]]})
+            _, second = await request(reader, writer, "GET", "/recommend")
+            if status != 200 or done["changed"] != [first["task"]["id"]]:
+                failures.append(f"отметка выполненной: {status} {done}")
+            elif second["task"] and second["task"]["id"] == first["task"]["id"]:
+                failures.append("после отметки кэш отдал ту же рекомендацию")
+        for target, expected in (("/nope", 404), ("/tasks?status=maybe", 400), ("/tasks/done", 405),
+                                 ("/recommend?user=999999", 404)):
+            status, _ = await request(reader, writer, "GET", target)
+            if status != expected:
+                failures.append(f"{target}: {status} вместо {expected}")
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+        app.close()
+        storage.close()
+    return failures
+
+
+def main() -> int:
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = asyncio.run(run(generate(os.path.join(tmp, "server.db"), n_tasks), clients))
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate import generate
+from priority_calculator import PriorityCalculator, DependencyGraph
+from task_views import today_rows, goal_rows
+
+# Набор замеров на синтетических базах: время (лучшее и медиана из repeat
+# запусков после прогрева), число SQL-запросов и пик памяти на один вызов.
+# Результат пишется в JSON; --baseline сравнивает с прошлым прогоном.
+# Запуск: python -m benchmarks.suite [--sizes 1000,10000] [--output results.json]
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+GOAL_WEIGHT_CALLS = 100
+REGRESSION_RATIO = 1.2
+
+
+def measure(conn: sqlite3.Connection, func, repeat: int) -> dict:
+    # Прогон с подсчётом запросов заодно прогревает кэши
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+
+    # Время — без tracemalloc, он сам замедляет каждое выделение памяти
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"best_s": min(times), "median_s": statistics.median(times),
+            "statements": len(statements), "peak_bytes": peak}
+
+
+def operations(conn: sqlite3.Connection) -> dict:
+    calc = PriorityCalculator(conn)
+    goal_ids = [row[0] for row in conn.execute("SELECT id FROM goals ORDER BY id LIMIT ?",
+                                               (GOAL_WEIGHT_CALLS,))]
+
+    def recommend_cold():
+        calc.invalidate()
+        calc.recommend_task()
+
+    def goal_weights():
+        for goal_id in goal_ids:
+            calc.get_dynamic_goal_weight(goal_id)
+
+    return {
+        "graph_load": lambda: DependencyGraph().load(conn),
+        "fetch_tasks": calc.fetch_tasks,
+        "recommend_task": recommend_cold,
+        "recommend_task_cached": calc.recommend_task,
+        f"get_dynamic_goal_weight_x{len(goal_ids)}": goal_weights,
+        "load_today_tasks": lambda: today_rows(conn),
+        "load_goals": lambda: goal_rows(conn),
+    }
+
+
+def run(sizes, seed: int = 1, repeat: int = 5, db_dir: str = None, reuse: bool = False) -> dict:
+    db_dir = db_dir or tempfile.gettempdir()
+    results = []
+    for n in sizes:
+        path = os.path.join(db_dir, f"bench_{n}_{seed}.db")
+        generate_s = None
+        if not (reuse and os.path.exists(path)):
+            started = time.perf_counter()
+            generate(path, n, seed)
+            generate_s = time.perf_counter() - started
+
+        conn = sqlite3.connect(path)
+        try:
+            for name, func in operations(conn).items():
+                result = {"size": n, "op": name, **measure(conn, func, repeat)}
+                results.append(result)
+                print(f"{n:>9} {name:<30} {result['best_s'] * 1000:>10.2f} мс "
+                      f"{result['statements']:>6} запр. {result['peak_bytes'] / 2 ** 20:>8.1f} МБ")
+        finally:
+            conn.close()
+        if generate_s is not None:
+            results.append({"size": n, "op": "generate", "best_s": generate_s, "median_s": generate_s,
+                            "statements": None, "peak_bytes": None})
+
+    return {
+        "meta": {"created": datetime.now().isoformat(timespec="seconds"), "seed": seed, "repeat": repeat,
+                 "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                 "machine": platform.machine()},
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list:
+    # Замедление больше REGRESSION_RATIO или рост числа запросов
+    old = {(r["size"], r["op"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = old.get((r["size"], r["op"]))
+        if not before or r["op"] == "generate":
+            continue
+        ratio = r["best_s"] / before["best_s"] if before["best_s"] else 1.0
+        if ratio > REGRESSION_RATIO or (r["statements"] or 0) > (before["statements"] or 0):
+            regressions.append(f"{r['size']} {r['op']}: {before['best_s'] * 1000:.2f} → "
+                               f"{r['best_s'] * 1000:.2f} мс (x{ratio:.2f}), "
+                               f"запросов {before['statements']} → {r['statements']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры PriorityCalculator и вкладок на синтетических базах")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES[:3]),
+                        help="размеры баз через запятую (по умолчанию 1000,10000,100000)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db-dir", help="куда складывать базы (по умолчанию временный каталог)")
+    parser.add_argument("--reuse", action="store_true", help="не генерировать базу заново, если она есть")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    report = run([int(n) for n in args.sizes.split(",")], args.seed, args.repeat, args.db_dir, args.reuse)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(json.load(f), report)
+        for line in regressions:
+            print("Регрессия:", line)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
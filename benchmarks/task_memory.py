@@ -0,0 +1,92 @@
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from priority_calculator import Task, TaskBatch
+
+# Память и время построения дневного списка: прежний Task на __dict__ с
+# немедленным разбором дедлайна против Task со __slots__ и TaskBatch. Task и
+# TaskBatch разбирают дедлайны лениво, поэтому отдельной строкой — TaskBatch
+# вместе с разбором (первым обращением к deadlines, как при расчёте).
+# Запуск: python -m benchmarks.task_memory [число задач]
+
+
+class DictTask:
+    # Прежнее представление Task, оставлено только для сравнения
+    def __init__(self, id, title, duration, importance_level, deadline=None, goal_weight=1.0,
+                 contribution=1.0, energy_type="medium", task_type="routine", dependents=0):
+        self.id = id
+        self.title = title
+        self.duration = duration
+        self.importance_level = min(5, max(1, importance_level // 2))
+        self.deadline = datetime.fromisoformat(deadline) if deadline else None
+        self.goal_weight = goal_weight
+        self.contribution = contribution
+        self.energy_type = energy_type
+        self.task_type = task_type
+        self.dependents = dependents
+
+
+def make_rows(n, seed=42):
+    rnd = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(n):
+        deadline = None
+        if rnd.random() < 0.7:
+            deadline = (start + timedelta(minutes=rnd.randint(0, 60 * 24 * 30))).strftime("%Y-%m-%d %H:%M")
+        rows.append((i + 1, f"Задача {i + 1}", rnd.randint(5, 240), rnd.randint(1, 10), deadline,
+                     rnd.uniform(0.1, 4.0), rnd.uniform(0.0, 1.0), rnd.choice(("low", "medium", "high")),
+                     rnd.choice(("creative", "analytical", "routine", "communication")), rnd.randint(0, 5)))
+    return rows
+
+
+def measure(build, rows):
+    # Время меряем без tracemalloc: он сам замедляет каждое выделение памяти
+    gc.collect()
+    started = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - started
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, retained, peak
+
+
+def build_batch(rows):
+    batch = TaskBatch()
+    batch.extend(rows)
+    return batch
+
+
+def build_batch_parsed(rows):
+    batch = build_batch(rows)
+    batch.deadlines
+    return batch
+
+
+def main(n=100_000):
+    rows = make_rows(n)
+    variants = [
+        ("Task на __dict__", lambda rs: [DictTask(*r) for r in rs]),
+        ("Task со __slots__", lambda rs: [Task(*r) for r in rs]),
+        ("TaskBatch", build_batch),
+        ("TaskBatch + дедлайны", build_batch_parsed),
+    ]
+    print(f"{n} задач")
+    print(f"{'вариант':<20} {'время, с':>10} {'память, МБ':>12} {'пик, МБ':>10}")
+    for name, build in variants:
+        elapsed, retained, peak = measure(build, rows)
+        print(f"{name:<20} {elapsed:>10.3f} {retained / 2 ** 20:>12.1f} {peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
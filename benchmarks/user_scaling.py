@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+from priority_calculator import PriorityCalculator
+from task_views import today_list
+
+# Общая база на команду: у каждого пользователя одинаковое число задач,
+# пользователей всё больше. Рекомендация (холодная, со сбросом кэша) и
+# первая страница «Задач на сегодня» одного пользователя читают только его
+# диапазон индексов, так что время не растёт с числом пользователей.
+# Запуск: python -m benchmarks.user_scaling [задач на пользователя] [пользователей,...]
+
+USERS = (1, 10, 50)
+REPEAT = 5
+SLOWDOWN_ALLOWED = 1.5
+
+
+def measure(conn: sqlite3.Connection, user_id: int) -> dict:
+    calc = PriorityCalculator(conn, user_id=user_id)
+    source = today_list(user_id)
+
+    def recommend():
+        calc.invalidate()
+        return calc.recommend_tasks(6)
+
+    times = {"recommend": [], "today_page": []}
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        recommend()
+        times["recommend"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        source.page(conn, None, 100)
+        times["today_page"].append(time.perf_counter() - started)
+    result = {name: min(values) for name, values in times.items()}
+    result["candidates"] = len(calc.fetch_tasks())
+    return result
+
+
+def main() -> int:
+    per_user = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    users = tuple(int(n) for n in sys.argv[2].split(",")) if len(sys.argv) > 2 else USERS
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in users:
+            path = generate(os.path.join(tmp, f"users_{n}.db"), per_user, users=n)
+            conn = sqlite3.connect(path)
+            try:
+                # Замер у последнего пользователя: его строки в конце таблицы
+                results[n] = measure(conn, n)
+            finally:
+                conn.close()
+            r = results[n]
+            print(f"пользователей {n:4}: рекомендация {r['recommend'] * 1000:7.2f} мс, "
+                  f"страница сегодня {r['today_page'] * 1000:6.2f} мс, кандидатов {r['candidates']}")
+
+    failures = []
+    base = results[users[0]]
+    for n in users[1:]:
+        for name in ("recommend", "today_page"):
+            if results[n][name] > base[name] * SLOWDOWN_ALLOWED:
+                failures.append(f"{name}: {n} пользователей — {results[n][name] / base[name]:.2f}x")
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
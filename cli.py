@@ -0,0 +1,139 @@
+import argparse
+import sys
+from datetime import date, timedelta
+
+# Консольный вход без Tk: рекомендация, списки, отметки и план из командной
+# строки и cron. Наверху — только стандартная библиотека, которая нужна для
+# разбора аргументов; модули ассистента импортируются внутри команд, и каждая
+# тянет только своё (done и postpone не грузят калькулятор приоритетов).
+# Tkinter и модули GUI (gui_*, smart_assistant, paged_tree) не импортируются
+# никогда — это проверяет benchmarks/cli_startup.py.
+# Запуск: python cli.py recommend | list | done ID... | postpone ID... | plan
+
+LISTS = ("today", "in_progress", "done", "goal")
+
+
+def connect(path: str = None):
+    from init_db import init_db
+    from storage import DB_PATH, open_writer
+
+    conn = open_writer(path or DB_PATH)
+    init_db(conn)
+    return conn
+
+
+def cmd_recommend(conn, args) -> int:
+    from priority_calculator import what_to_do_now_smart
+
+    what_to_do_now_smart(conn, args.alternatives, args.plan, args.debug, start=not args.peek,
+                         user_id=args.user)
+    return 0
+
+
+def cmd_list(conn, args) -> int:
+    import task_views
+
+    if args.name == "goal":
+        if args.goal_id is None:
+            print("Для списка goal нужен id цели", file=sys.stderr)
+            return 2
+        if not conn.execute("SELECT 1 FROM goals WHERE id = ? AND user_id = ?", (args.goal_id, args.user)).fetchone():
+            print(f"Нет цели {args.goal_id}", file=sys.stderr)
+            return 1
+        source = task_views.goal_task_list(args.goal_id)
+    else:
+        source = getattr(task_views, f"{args.name}_list")(args.user)
+
+    # Строки идут страницами (TaskList.rows) и печатаются сразу
+    for count, (values, tag) in enumerate(source.rows(conn), 1):
+        if args.limit and count > args.limit:
+            break
+        print("\t".join(str(value) for value in values))
+    return 0
+
+
+def cmd_done(conn, args) -> int:
+    import task_mutations
+
+    with conn:
+        mutation = task_mutations.set_status(conn, args.ids, "done", args.user)
+    print(f"Выполнено: {len(mutation)}")
+    return 0 if len(mutation) else 1
+
+
+def cmd_postpone(conn, args) -> int:
+    import task_mutations
+
+    day = args.date or (date.today() + timedelta(days=1)).isoformat()
+    with conn:
+        mutation = task_mutations.postpone(conn, args.ids, day, args.user)
+    print(f"Перенесено на {day}: {len(mutation)}")
+    return 0 if len(mutation) else 1
+
+
+def cmd_plan(conn, args) -> int:
+    if args.week:
+        from horizon_scheduler import print_horizon
+        print_horizon(conn, user_id=args.user)
+        return 0
+
+    from day_planner import print_day_plan
+    print_day_plan(conn, args.user)
+    return 0
+
+
+def iso_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается дата ГГГГ-ММ-ДД: {value}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python cli.py", description="Умный ассистент без GUI")
+    parser.add_argument("--db", help="файл базы (по умолчанию assistant.db)")
+    parser.add_argument("--user", type=int, help="id пользователя (по умолчанию 1)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recommend = commands.add_parser("recommend", help="что делать сейчас")
+    recommend.add_argument("-n", "--alternatives", type=int, default=5)
+    recommend.add_argument("--plan", action="store_true", help="показать план дня")
+    recommend.add_argument("--peek", action="store_true", help="не отмечать задачу начатой")
+    recommend.add_argument("--debug", action="store_true", help="запросы и время по фазам")
+    recommend.set_defaults(func=cmd_recommend)
+
+    listing = commands.add_parser("list", help="задачи вкладки")
+    listing.add_argument("name", choices=LISTS, nargs="?", default="today")
+    listing.add_argument("goal_id", type=int, nargs="?")
+    listing.add_argument("--limit", type=int, default=0)
+    listing.set_defaults(func=cmd_list)
+
+    done = commands.add_parser("done", help="отметить задачи выполненными")
+    done.add_argument("ids", type=int, nargs="+")
+    done.set_defaults(func=cmd_done)
+
+    postpone = commands.add_parser("postpone", help="перенести задачи")
+    postpone.add_argument("ids", type=int, nargs="+")
+    postpone.add_argument("--date", type=iso_date, help="по умолчанию — завтра")
+    postpone.set_defaults(func=cmd_postpone)
+
+    plan = commands.add_parser("plan", help="план на сегодня")
+    plan.add_argument("--week", action="store_true", help="распланировать горизонт и сохранить даты")
+    plan.set_defaults(func=cmd_plan)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    conn = connect(args.db)
+    if args.user is None:
+        from init_db import DEFAULT_USER_ID
+        args.user = DEFAULT_USER_ID
+    try:
+        return args.func(conn, args)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
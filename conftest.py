@@ -0,0 +1 @@
+# Корень репозитория: модули лежат плоско, тесты импортируют их напрямую
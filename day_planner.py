@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Set, Tuple
+import heapq
+import random
+import sqlite3
+import time
+
+from init_db import DEFAULT_USER_ID
+from priority_calculator import PriorityCalculator, Task
+
+# Планировщик дня: раскладывает сегодняшние задачи по рабочему окну из schedule
+# так, чтобы сумма приоритетов была максимальной.
+#
+# Ограничения: задача ставится только после своих блокеров (блокер, которого нет
+# среди задач на сегодня, делает её недоступной), а задача с будущим дедлайном
+# должна закончиться до него. Просроченные задачи ставятся как можно раньше.
+#
+# Сначала строится жадный план по плотности (приоритет / минуты), затем, пока
+# не кончится time_budget, его улучшает локальный поиск "разрушить и
+# достроить" — пока не кончится бюджет или PLAN_STALL_ROUNDS попыток подряд
+# не дадут улучшения. Если бюджета нет, остаётся жадный план.
+
+PLAN_TIME_BUDGET = 0.2  # секунд на улучшение жадного плана
+PLAN_STALL_ROUNDS = 200  # попыток без улучшения, после которых поиск останавливается
+
+
+def plan_day(calc: PriorityCalculator, now: Optional[datetime] = None,
+             time_budget: float = PLAN_TIME_BUDGET) -> Dict:
+    # Подставленное now задаёт и время суток, и день, чьи задачи планируются
+    context = calc.get_current_context(now)
+    now = context["now"]
+    plan = {"window": None, "items": [], "total_score": 0.0, "free_minutes": 0, "optimized": False}
+
+    window = plan_window(calc, now)
+    if not window:
+        return plan
+    start, end = window
+    capacity = int((end - start).total_seconds() // 60)
+    plan["window"] = window
+
+    tasks = {t.id: t for t in calc.fetch_tasks(include_blocked=True, today=now.strftime("%Y-%m-%d"))}
+    blockers = _plannable_blockers(calc, tasks)
+    candidates = [tasks[task_id] for task_id in blockers if tasks[task_id].duration <= capacity]
+    if not candidates:
+        plan["free_minutes"] = capacity
+        return plan
+
+    scores = {t.id: calc.score_task(t, context) for t in candidates}
+    planner = _Planner(candidates, blockers, scores, start, capacity)
+
+    selected = planner.greedy(planner.order)
+    best_value = planner.value(selected)
+    optimized = False
+
+    # Разрушить и достроить: убрать несколько задач (с зависимыми), достроить
+    # жадно в слегка перемешанном порядке, оставить лучший результат
+    rnd = random.Random(0)
+    stop_at = time.perf_counter() + time_budget
+    stall = 0
+    while selected and stall < PLAN_STALL_ROUNDS and time.perf_counter() < stop_at:
+        stall += 1
+        trial = set(selected)
+        for _ in range(rnd.randint(1, 3)):
+            if trial:
+                planner.remove_with_dependents(trial, rnd.choice(sorted(trial)))
+        order = sorted(planner.order, key=lambda t: -planner.density[t] * rnd.uniform(0.8, 1.2))
+        trial = planner.greedy(order, trial)
+        value = planner.value(trial)
+        if value > best_value + 1e-9:
+            selected, best_value, optimized = trial, value, True
+            stall = 0
+
+    sequence = planner.sequence(selected) or []
+    plan["items"] = [{"task": planner.tasks[task_id], "start": task_start, "end": task_end,
+                      "score": scores[task_id]} for task_id, task_start, task_end in sequence]
+    plan["total_score"] = round(best_value, 3)
+    plan["free_minutes"] = capacity - sum(planner.tasks[t].duration for t in selected)
+    plan["optimized"] = optimized
+    return plan
+
+
+def plan_window(calc: PriorityCalculator, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+    # Остаток текущего рабочего окна или сегодняшнее окно, если оно ещё не началось
+    schedule = calc.schedule_context
+    window = schedule.current_window(now)
+    if window:
+        start = now.replace(second=0, microsecond=0)
+        if start < now:
+            start += timedelta(minutes=1)
+        return (start, window[1]) if start < window[1] else None
+    window = schedule.window(now.date())
+    if window and now < window[0]:
+        return window
+    return None
+
+
+def _plannable_blockers(calc: PriorityCalculator, tasks: Dict[int, Task]) -> Dict[int, List[int]]:
+    # {задача: её незавершённые блокеры}, только для задач, которые можно выполнить
+    # сегодня: все блокеры (транзитивно) тоже стоят на сегодня
+    open_blockers = {task_id: calc.graph.open_blocker_ids(task_id) for task_id in tasks}
+    pending = {task_id: len(ids) for task_id, ids in open_blockers.items()}
+    dependents: Dict[int, List[int]] = {}
+    for task_id, ids in open_blockers.items():
+        for blocker_id in ids:
+            dependents.setdefault(blocker_id, []).append(task_id)
+
+    # Снимаем блокеры по мере того, как они сами оказываются выполнимыми; задачи
+    # с блокером не на сегодня или в цикле так и остаются с pending > 0
+    ready = [task_id for task_id, n in pending.items() if n == 0]
+    plannable = set()
+    while ready:
+        task_id = ready.pop()
+        plannable.add(task_id)
+        for dependent_id in dependents.get(task_id, ()):
+            pending[dependent_id] -= 1
+            if pending[dependent_id] == 0:
+                ready.append(dependent_id)
+
+    return {task_id: open_blockers[task_id] for task_id in sorted(plannable)}
+
+
+class _Planner:
+    def __init__(self, candidates: List[Task], blockers: Dict[int, List[int]],
+                 scores: Dict[int, float], start: datetime, capacity: int):
+        self.tasks = {t.id: t for t in candidates}
+        self.blockers = {t.id: blockers[t.id] for t in candidates}
+        self.dependents: Dict[int, List[int]] = {t.id: [] for t in candidates}
+        for task_id, task_blockers in self.blockers.items():
+            for blocker_id in task_blockers:
+                if blocker_id in self.dependents:
+                    self.dependents[blocker_id].append(task_id)
+        self.scores = scores
+        self.start = start
+        self.capacity = capacity
+        self.density = {t.id: scores[t.id] / max(1, t.duration) for t in candidates}
+        self.order = sorted(self.tasks, key=lambda t: (-self.density[t], t))
+
+    def value(self, selected: Set[int]) -> float:
+        return sum(self.scores[t] for t in selected)
+
+    def used(self, selected: Set[int]) -> int:
+        return sum(self.tasks[t].duration for t in selected)
+
+    def closure(self, task_id: int, selected: Set[int]) -> Optional[Set[int]]:
+        # Задача вместе с ещё не выбранными блокерами; None, если блокер не влез в кандидаты
+        group, stack = set(), [task_id]
+        while stack:
+            current = stack.pop()
+            if current in group or current in selected:
+                continue
+            if current not in self.tasks:
+                return None
+            group.add(current)
+            stack.extend(self.blockers[current])
+        return group
+
+    def remove_with_dependents(self, selected: Set[int], task_id: int):
+        stack = [task_id]
+        while stack:
+            current = stack.pop()
+            if current in selected:
+                selected.discard(current)
+                stack.extend(self.dependents[current])
+
+    def greedy(self, order: List[int], selected: Optional[Set[int]] = None) -> Set[int]:
+        selected = set(selected or ())
+        used = self.used(selected)
+        for task_id in order:
+            if task_id in selected or used + self.tasks[task_id].duration > self.capacity:
+                continue
+            group = self.closure(task_id, selected)
+            if group is None:
+                continue
+            duration = sum(self.tasks[t].duration for t in group)
+            if used + duration > self.capacity:
+                continue
+            if self.sequence(selected | group) is None:
+                continue
+            selected |= group
+            used += duration
+        return selected
+
+    def sequence(self, selected: Set[int]) -> Optional[List[Tuple[int, datetime, datetime]]]:
+        # Порядок "блокеры раньше, ближайший дедлайн первым". Дедлайн задачи
+        # заранее сдвигается на дедлайны зависимых минус их длительность, и тогда
+        # такой порядок выполним, если выполним хоть какой-то.
+        # Возвращает [(id, начало, конец)] или None, если дедлайн не соблюсти
+        due: Dict[int, datetime] = {}
+        enforced: Set[int] = set()
+        for task_id in selected:
+            deadline = self.tasks[task_id].deadline
+            if deadline and deadline > self.start:
+                enforced.add(task_id)
+                due[task_id] = deadline
+            else:
+                # без дедлайна — в конец, просроченные — в начало
+                due[task_id] = deadline or datetime.max
+
+        waiting = {t: sum(1 for b in self.blockers[t] if b in selected) for t in selected}
+        order: List[int] = []
+        ready = [t for t, n in waiting.items() if n == 0]
+        while ready:
+            current = ready.pop()
+            order.append(current)
+            for dependent_id in self.dependents[current]:
+                if dependent_id in waiting:
+                    waiting[dependent_id] -= 1
+                    if waiting[dependent_id] == 0:
+                        ready.append(dependent_id)
+
+        for task_id in reversed(order):
+            for dependent_id in self.dependents[task_id]:
+                if dependent_id in selected and due[dependent_id] != datetime.max:
+                    latest = due[dependent_id] - timedelta(minutes=self.tasks[dependent_id].duration)
+                    if latest < due[task_id]:
+                        due[task_id] = latest
+
+        waiting = {t: sum(1 for b in self.blockers[t] if b in selected) for t in selected}
+        heap = [(due[t], -self.scores[t], t) for t, n in waiting.items() if n == 0]
+        heapq.heapify(heap)
+        clock = self.start
+        result = []
+        while heap:
+            _, _, task_id = heapq.heappop(heap)
+            task_end = clock + timedelta(minutes=self.tasks[task_id].duration)
+            if task_id in enforced and task_end > self.tasks[task_id].deadline:
+                return None
+            result.append((task_id, clock, task_end))
+            clock = task_end
+            for dependent_id in self.dependents[task_id]:
+                if dependent_id in waiting:
+                    waiting[dependent_id] -= 1
+                    if waiting[dependent_id] == 0:
+                        heapq.heappush(heap, (due[dependent_id], -self.scores[dependent_id], dependent_id))
+        return result
+
+
+def format_plan(plan: Dict) -> List[str]:
+    if not plan["window"]:
+        return ["Сегодня больше нет рабочего времени."]
+    if not plan["items"]:
+        return ["Нечего планировать: подходящих задач на сегодня нет."]
+    start, end = plan["window"]
+    lines = [f"План на {start:%d.%m} ({start:%H:%M}–{end:%H:%M}), "
+             f"суммарный приоритет {plan['total_score']:.3f}, свободно {plan['free_minutes']} мин:"]
+    for item in plan["items"]:
+        lines.append(f"   {item['start']:%H:%M}–{item['end']:%H:%M}  {item['task'].title} "
+                     f"({item['task'].duration} мин, {item['score']:.3f})")
+    return lines
+
+
+def print_day_plan(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID):
+    for line in format_plan(plan_day(PriorityCalculator(conn, user_id=user_id))):
+        print(line)
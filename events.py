@@ -0,0 +1,54 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+# Шина изменений для GUI: код, который пишет в базу, сообщает, что поменялось
+# (id задач и целей, расписание, энергия), а вкладки, заголовок окна и кэши
+# подписываются на нужные им виды изменений.
+# События за один проход цикла Tk копятся и доставляются одной пачкой в
+# after_idle — десять publish подряд дают одно обновление вкладки.
+# Подписчики с immediate=True (сброс кэшей) получают событие сразу: до
+# ближайшего idle кто-нибудь может успеть прочитать устаревший кэш.
+
+TASKS = "tasks"
+GOALS = "goals"
+SCHEDULE = "schedule"
+ENERGY = "energy"
+
+# Вид изменения -> id затронутых строк; None — неизвестно какие (все)
+Changes = Dict[str, Optional[Set[int]]]
+
+
+class ChangeBus:
+    def __init__(self, root):
+        self.root = root
+        self._subscribers: List[tuple] = []  # (виды, колбэк, immediate)
+        self._pending: Changes = {}
+        self._scheduled = False
+
+    def subscribe(self, kinds: Iterable[str], callback: Callable[[Changes], None],
+                  immediate: bool = False):
+        self._subscribers.append((frozenset(kinds), callback, immediate))
+
+    def publish(self, kind: str, ids: Optional[Iterable[int]] = None):
+        ids = None if ids is None else set(ids)
+        for kinds, callback, immediate in self._subscribers:
+            if immediate and kind in kinds:
+                callback({kind: ids})
+
+        if kind in self._pending:
+            if self._pending[kind] is not None:
+                if ids is None:
+                    self._pending[kind] = None
+                else:
+                    self._pending[kind] |= ids
+        else:
+            self._pending[kind] = ids
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after_idle(self._flush)
+
+    def _flush(self):
+        changes, self._pending = self._pending, {}
+        self._scheduled = False
+        for kinds, callback, immediate in list(self._subscribers):
+            if not immediate and kinds & changes.keys():
+                callback(changes)
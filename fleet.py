@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
+
+from init_db import DEFAULT_USER_ID, MIGRATIONS
+from priority_calculator import ENERGY_MATCH, PriorityCalculator, release_database
+from server import recommendation_json
+from storage import open_reader
+
+# Пакетная оценка многих баз ассистента (по базе на человека) для утренней
+# сводки команды. Каждая база считается в отдельном процессе пула на
+# соединении только для чтения; «сейчас» и энергия задаются один раз на весь
+# прогон, так что сводка воспроизводима и не зависит от того, когда какой
+# процесс дошёл до базы. Результат — JSONL, строка на базу, в порядке
+# готовности; ошибка одной базы попадает в её строку и не валит прогон.
+# Запуск: python -m fleet team/ extra.db --k 3 --now 2026-10-19T09:30 --energy high -o digest.jsonl
+
+DB_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def database_paths(sources: Iterable[str]) -> List[str]:
+    # Каталог — все базы в нём (без вложенных), файл — как есть
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(os.path.join(source, name) for name in os.listdir(source)
+                                if name.endswith(DB_SUFFIXES)))
+        else:
+            paths.append(source)
+    return paths
+
+
+def score_database(path: str, now: datetime, energy_level: Optional[str], k: int,
+                   user_id: int = DEFAULT_USER_ID) -> Dict:
+    # Выполняется в процессе пула: только чтение, init_db не вызывается —
+    # базу со старой схемой не трогаем, а сообщаем о ней
+    record = {"db": path, "user": user_id}
+    started = time.perf_counter()
+    try:
+        conn = open_reader(path)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        return record
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < len(MIGRATIONS):
+            record["error"] = f"схема версии {version}, нужна {len(MIGRATIONS)}: откройте базу ассистентом"
+            return record
+        calc = PriorityCalculator(conn, user_id=user_id)
+        context = calc.get_current_context(now, energy_level)
+        record["energy_level"] = context["energy_level"]
+        record["working_time"] = calc.is_working_time(context)
+        record["recommendations"] = [recommendation_json(rec)
+                                     for rec in calc.recommend_tasks(k, now, energy_level)]
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        release_database(conn)
+        conn.close()
+        record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def score_fleet(paths: List[str], now: Optional[datetime] = None, energy_level: Optional[str] = None,
+                k: int = 3, user_id: int = DEFAULT_USER_ID, workers: Optional[int] = None) -> Iterator[Dict]:
+    # Записи по мере готовности. Одно «сейчас» на весь прогон; процессов —
+    # по ядрам, но не больше, чем баз
+    now = now or datetime.now()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        for path in paths:
+            yield score_database(path, now, energy_level, k, user_id)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(score_database, path, now, energy_level, k, user_id) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_report(records: Iterable[Dict], out: TextIO) -> Dict[str, int]:
+    totals = {"databases": 0, "errors": 0}
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        totals["databases"] += 1
+        totals["errors"] += "error" in record
+    return totals
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m fleet",
+                                     description="Рекомендации по многим базам ассистента в один JSONL")
+    parser.add_argument("sources", nargs="+", help="файлы баз или каталоги с ними")
+    parser.add_argument("--k", type=int, default=3, help="рекомендаций на базу")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="момент оценки, ГГГГ-ММ-ДДTЧЧ:ММ")
+    parser.add_argument("--energy", choices=tuple(ENERGY_MATCH), help="энергия вместо отметки в базе")
+    parser.add_argument("--user", type=int, default=DEFAULT_USER_ID, help="id пользователя")
+    parser.add_argument("--workers", type=int, help="процессов (по умолчанию — по ядрам)")
+    parser.add_argument("-o", "--output", help="файл отчёта (по умолчанию — stdout)")
+    args = parser.parse_args(argv)
+
+    paths = database_paths(args.sources)
+    if not paths:
+        parser.error("баз не найдено")
+    records = score_fleet(paths, args.now, args.energy, args.k, args.user, args.workers)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            totals = write_report(records, out)
+    else:
+        totals = write_report(records, sys.stdout)
+    print(f"Баз: {totals['databases']}, с ошибками: {totals['errors']}", file=sys.stderr)
+    return 1 if totals["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
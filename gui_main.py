@@ -1,10 +1,13 @@
+import sys
 from tkinter import Tk
+from init_db import DEFAULT_USER_ID
 from smart_assistant import SmartAssistantGUI
 
-def run_gui():
+def run_gui(user_id: int = DEFAULT_USER_ID):
     root = Tk()
-    app = SmartAssistantGUI(root)
+    app = SmartAssistantGUI(root, user_id)
     root.mainloop()
 
 if __name__ == "__main__":
-    run_gui()
\ No newline at end of file
+    # python gui_main.py [id пользователя]
+    run_gui(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USER_ID)
\ No newline at end of file
@@ -1,14 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
-from priority_calculator import PriorityCalculator
-import json
+from day_planner import plan_day, format_plan
+import task_mutations
+from events import TASKS, GOALS
+from paged_tree import PagedTree, sync_tree
+from task_views import today_list, in_progress_list, done_list, goal_task_list, goal_rows
+
+TASK_TABS = ("today", "in_progress", "done")
+
 
 class GUITabs:
     def __init__(self, main_app):
         self.main_app = main_app
         self.conn = main_app.conn
+        self.goals_shown = {}  # iid -> (values, tag) строк в дереве целей
+        # Вкладки, ждущие перечитывания; у целей — какие id (None — все)
+        self.stale_tabs = set()
+        self.stale_goal_ids = None
         self.setup_styles()
+        main_app.events.subscribe((TASKS, GOALS), self.on_changes)
 
     def setup_styles(self):
         style = ttk.Style()
@@ -36,10 +47,14 @@ class GUITabs:
         goals_frame = tk.Frame(tab_control, bg="#f0f4f8")
         tab_control.add(goals_frame, text=" Цели ")
 
+        plan_frame = tk.Frame(tab_control, bg="#f0f4f8")
+        tab_control.add(plan_frame, text=" План на день ")
+
         self.setup_task_tree(today_frame, "today")
         self.setup_task_tree(in_progress_frame, "in_progress")
         self.setup_task_tree(done_frame, "done")
         self.setup_goals_tree(goals_frame)
+        self.setup_plan_tree(plan_frame)
 
     def setup_task_tree(self, parent, tab_type):
         frame = tk.LabelFrame(parent, text=" ", font=("Helvetica", 10))
@@ -50,18 +65,20 @@ class GUITabs:
         if tab_type == "done":
             style_name = "Done.Treeview"
         
-        tree = ttk.Treeview(frame, columns=columns, show="headings", height=10, 
-                           style=style_name, selectmode="extended")
+        # Списки могут быть длинными: в дереве только видимое окно, строки читаются страницами
+        tree = PagedTree(frame, columns, self.main_app.reader, height=10,
+                         style=style_name, selectmode="extended")
         
         for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120, anchor="center")
-        tree.column("Задача", width=300, anchor="w")
-        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+            tree.tree.heading(col, text=col)
+            tree.tree.column(col, width=120, anchor="center")
+        tree.tree.column("Задача", width=300, anchor="w")
 
-        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Стили
+        if tab_type == "today":
+            tree.tree.tag_configure("blocked", background="#ffebee", foreground="#c62828")
+            tree.tree.tag_configure("in_progress", background="#fff8e1", foreground="#e65100")
+            tree.tree.tag_configure("normal", background="#ffffff", foreground="#000000")
 
         btn_frame = tk.Frame(frame)
         btn_frame.pack(pady=5)
@@ -72,6 +89,8 @@ class GUITabs:
                       command=lambda: self.mark_done(tree)).pack(side=tk.LEFT, padx=5)
             ttk.Button(btn_frame, text="Перенести на завтра",
                       command=lambda: self.postpone_selected(tree)).pack(side=tk.LEFT, padx=5)
+            ttk.Button(btn_frame, text="Изменить выбранные",
+                      command=lambda: self.edit_selected(tree)).pack(side=tk.LEFT, padx=5)
         elif tab_type == "in_progress":  # in_progress
             ttk.Button(btn_frame, text="Завершить задачу",
                       command=lambda: self.finish_task(tree)).pack(side=tk.LEFT, padx=5)
@@ -79,6 +98,8 @@ class GUITabs:
                       command=lambda: self.postpone_selected(tree)).pack(side=tk.LEFT, padx=5)
             ttk.Button(btn_frame, text="Вернуть в список",
                       command=lambda: self.return_to_todo(tree)).pack(side=tk.LEFT, padx=5)
+            ttk.Button(btn_frame, text="Изменить выбранные",
+                      command=lambda: self.edit_selected(tree)).pack(side=tk.LEFT, padx=5)
         
         elif tab_type == "done":
             ttk.Button(btn_frame, text="Удалить навсегда",
@@ -105,6 +126,11 @@ class GUITabs:
             tree.column(col, width=100, anchor="center")
         tree.column("Цель", width=250, anchor="w")
         tree.column("Прогресс", width=120, anchor="center")
+        tree.tag_configure("completed", background="#e8f5e9", foreground="#2e7d32")
+        tree.tag_configure("on_fire",   background="#ffebee", foreground="#c62828", font=("Helvetica", 10, "bold"))
+        tree.tag_configure("hot",       background="#ffcdd2", foreground="#b71c1c")
+        tree.tag_configure("warm",      background="#fff3e0", foreground="#ef6c00")
+        tree.tag_configure("normal",    background="#ffffff", foreground="#000000")
         tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
@@ -118,202 +144,141 @@ class GUITabs:
 
         self.tree_goals = tree
 
-    def refresh_all_tabs(self):
-        self.load_today_tasks()
-        self.load_in_progress_tasks()
-        self.load_done_tasks()
-        self.load_goals()
+    def setup_plan_tree(self, parent):
+        frame = tk.LabelFrame(parent, text=" ", font=("Helvetica", 10))
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-    def load_goals(self):
-        if not hasattr(self, 'tree_goals'):
-            return
-        tree = self.tree_goals
-        for i in tree.get_children():
-            tree.delete(i)
+        self.plan_label = tk.Label(frame, text="Нажми «Составить план»", anchor="w")
+        self.plan_label.pack(fill=tk.X, padx=5, pady=(5, 0))
 
-        calc = PriorityCalculator(self.conn)
-        cursor = self.conn.cursor()
-
-        cursor.execute('''
-            SELECT g.id, g.title, g.weight, g.deadline
-            FROM goals g
-            ORDER BY 
-                CASE WHEN g.deadline IS NULL THEN 1 ELSE 0 END,
-                g.deadline ASC
-        ''')
-        goals = cursor.fetchall()
-
-        for goal in goals:
-            goal_id, title, base_weight, deadline = goal
-            deadline_str = deadline or "—"
-
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_tasks,
-                    SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END) as done_tasks,
-                    SUM(importance_level) as total_importance,
-                    SUM(CASE WHEN status = 'done' THEN importance_level ELSE 0 END) as done_importance
-                FROM tasks 
-                WHERE goal_id = ?
-            """, (goal_id,))
-            
-            row = cursor.fetchone()
-            total_tasks = row[0] or 0
-            done_tasks = row[1] or 0
-            total_importance = row[2] or 0
-            done_importance = row[3] or 0
-
-            if total_importance > 0:
-                percent = int(100 * done_importance / total_importance)
-                progress_text = f"{done_importance}/{total_importance} важн. ({percent}%)"
-            else:
-                percent = 0 if total_tasks == 0 else int(100 * done_tasks / total_tasks)
-                progress_text = f"{done_tasks}/{total_tasks} задач ({percent}%)"
-
-            if percent == 100 and total_tasks > 0:
-                progress_text += " [Выполнена]"
-
-            current_weight = calc.get_dynamic_goal_weight(goal_id)
-
-            if abs(current_weight - base_weight) < 0.05:
-                weight_display = f"{base_weight:.2f}"
-            else:
-                weight_display = f"{base_weight:.2f} → {current_weight:.2f}"
-                if current_weight >= base_weight * 2.0:
-                    weight_display += " [Горячо!]"
-                elif current_weight >= base_weight * 1.5:
-                    weight_display += " [Тепло]"
-
-            if percent == 100 and total_tasks > 0:
-                tag = "completed"
-            elif current_weight >= base_weight * 2.5:
-                tag = "on_fire"     
-            elif current_weight >= base_weight * 1.8:
-                tag = "hot"
-            elif current_weight >= base_weight * 1.3:
-                tag = "warm"
-            else:
-                tag = "normal"
+        columns = ("Начало", "Конец", "ID", "Задача", "Время", "Приоритет")
+        tree = ttk.Treeview(frame, columns=columns, show="headings", height=12, selectmode="browse")
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=90, anchor="center")
+        tree.column("Задача", width=350, anchor="w")
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-            tree.insert("", tk.END, values=(
-                goal_id,
-                title,
-                weight_display,
-                deadline_str,
-                done_tasks,
-                total_tasks,
-                progress_text
-            ), tags=(tag,))
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        tree.tag_configure("completed", background="#e8f5e9", foreground="#2e7d32")
-        tree.tag_configure("on_fire",   background="#ffebee", foreground="#c62828", font=("Helvetica", 10, "bold"))
-        tree.tag_configure("hot",       background="#ffcdd2", foreground="#b71c1c")
-        tree.tag_configure("warm",      background="#fff3e0", foreground="#ef6c00")
-        tree.tag_configure("normal",    background="#ffffff", foreground="#000000")
+        btn_frame = tk.Frame(frame)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="Составить план",
+                   command=self.load_plan).pack(side=tk.LEFT, padx=5)
 
-    def load_today_tasks(self):
-        tree = self.tree_today
-        for i in tree.get_children():
-            tree.delete(i)
+        self.tree_plan = tree
 
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        cursor.execute('''
-            SELECT t.id, t.title, t.duration_minutes, t.importance_level, t.deadline,
-                g.title, t.status, t.blocks_task_ids
-            FROM tasks t
-            LEFT JOIN goals g ON t.goal_id = g.id
-            WHERE t.scheduled_date = ? AND t.status IN ('todo', 'in_progress')
-            ORDER BY t.importance_level DESC
-        ''', (today,))
-
-        for row in cursor.fetchall():
-            task_id, title, duration, importance, deadline, goal_title, status, blocks_json = row
-
-            deadline_str = deadline[:16].replace("T", " ") if deadline else "-"
-            status_suffix = " [в процессе]" if status == "in_progress" else ""
-
-            # Проверка: заблокирована ли задача
-            blocked = False
-            blocking_tasks = []
-            if blocks_json:
-                try:
-                    blocked_ids = json.loads(blocks_json)
-                    if blocked_ids:
-                        placeholders = ','.join('?' * len(blocked_ids))
-                        cursor.execute(f'''
-                            SELECT id, title FROM tasks
-                            WHERE id IN ({placeholders}) AND status != 'done'
-                        ''', blocked_ids)
-                        blocking = cursor.fetchall()
-                        if blocking:
-                            blocked = True
-                            blocking_tasks = [f"{tid}: {tname}" for tid, tname in blocking]
-                except Exception as e:
-                    print(f"JSON error: {e}")
-
-            # Отображение
-            if blocked:
-                hint = ", ".join(blocking_tasks[:2])
-                if len(blocking_tasks) > 2:
-                    hint += f" и ещё {len(blocking_tasks)-2}"
-                title_display = f"[Заблокирована: {hint}] {title}"
-                tag = "blocked"
-            else:
-                title_display = f"{title}{status_suffix}"
-                tag = "normal" if status == "todo" else "in_progress"
+    def load_plan(self):
+        # План считается в фоне (поиск идёт до PLAN_TIME_BUDGET)
+        main_app = self.main_app
 
-            tree.insert("", tk.END, values=(
-                task_id, title_display, f"{duration} мин", f"{importance}/10",
-                deadline_str, goal_title or "-"
-            ), tags=(tag,))
+        def work():
+            with main_app.scoring_lock:
+                return plan_day(main_app.scorer)
 
-        # Стили
-        tree.tag_configure("blocked", background="#ffebee", foreground="#c62828")
-        tree.tag_configure("in_progress", background="#fff8e1", foreground="#e65100")
-        tree.tag_configure("normal", background="#ffffff", foreground="#000000")
+        main_app.executor.submit("plan", work, self.show_plan)
 
-    def load_in_progress_tasks(self):
-        tree = self.tree_in_progress
+    def show_plan(self, plan):
+        tree = self.tree_plan
         for i in tree.get_children():
             tree.delete(i)
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute('''
-            SELECT t.id, t.title, t.duration_minutes, t.importance_level, t.deadline,
-                   g.title
-            FROM tasks t
-            LEFT JOIN goals g ON t.goal_id = g.id
-            WHERE t.scheduled_date = ? AND t.status = 'in_progress'
-        ''', (today,))
-        for row in cursor.fetchall():
-            deadline = row[4][:16].replace("T", " ") if row[4] else "-"
+
+        lines = format_plan(plan)
+        self.plan_label.config(text=lines[0])
+
+        for item in plan["items"]:
+            t = item["task"]
             tree.insert("", tk.END, values=(
-                row[0], row[1], f"{row[2]} мин", f"{row[3]}/10", deadline, row[5] or "-"
+                f"{item['start']:%H:%M}", f"{item['end']:%H:%M}", t.id, t.title,
+                f"{t.duration} мин", f"{item['score']:.3f}"
             ))
 
-    def load_done_tasks(self):
+    def refresh_all_tabs(self):
+        self.refresh_tabs(TASK_TABS + ("goals",))
+
+    def on_changes(self, changes):
+        # Задачи — три списка задач; цели — только дерево целей, и если все
+        # изменившиеся цели уже в нём, перечитываются лишь их строки
+        names = set(TASK_TABS) if TASKS in changes else set()
+        if GOALS in changes:
+            names.add("goals")
+        self.refresh_tabs(names, changes.get(GOALS))
+
+    def refresh_tabs(self, names, goal_ids=None):
+        # Запросы — в фоне на соединении из пула читателей, вставка строк — в
+        # главном потоке. Новый запрос отменяет ещё не показанный старый,
+        # поэтому грузит и вкладки, которые тот не успел обновить.
+        # Списки задач читаются не целиком, а на окно вокруг текущей прокрутки
+        main_app = self.main_app
+        if "goals" in names:
+            partial = goal_ids is not None and {str(i) for i in goal_ids} <= self.goals_shown.keys()
+            if "goals" not in self.stale_tabs:
+                self.stale_goal_ids = set(goal_ids) if partial else None
+            elif self.stale_goal_ids is not None:
+                self.stale_goal_ids = (self.stale_goal_ids | set(goal_ids)) if partial else None
+        self.stale_tabs |= set(names)
+        if not self.stale_tabs:
+            return
+
+        trees = {"today": (self.tree_today, today_list), "in_progress": (self.tree_in_progress, in_progress_list),
+                 "done": (self.tree_done, done_list)}
+        user_id = main_app.user_id
+        lists = [(name, tree, source(user_id), tree.window()) for name, (tree, source) in trees.items()
+                 if name in self.stale_tabs]
+        load_goals, goal_ids = "goals" in self.stale_tabs, self.stale_goal_ids
+
+        def load():
+            with main_app.reader() as conn:
+                result = {name: tree.load(source, conn, *window) for name, tree, source, window in lists}
+                if load_goals:
+                    result["goals"] = goal_rows(conn, user_id, goal_ids)
+                return result
+
+        main_app.executor.submit("tabs", load, lambda result: self.show_tabs(result, goal_ids))
+
+    def show_tabs(self, result, goal_ids):
+        # Показываем результат последнего запроса — он покрывает всё, что ждало
+        self.stale_tabs = set()
+        self.stale_goal_ids = None
+        loaders = {"today": self.load_today_tasks, "in_progress": self.load_in_progress_tasks,
+                   "done": self.load_done_tasks}
+        with self.main_app.metrics.phase("render"):
+            for name, pages in result.items():
+                if name in loaders:
+                    loaders[name](pages)
+            if "goals" in result:
+                if goal_ids is None:
+                    self.load_goals(result["goals"])
+                else:
+                    self.update_goals(result["goals"])
+        self.main_app.update_debug_bar()
+
+    def load_goals(self, rows):
+        if not hasattr(self, 'tree_goals'):
+            return
+        self.goals_shown = sync_tree(self.tree_goals, [(str(values[0]), values, tag) for values, tag in rows],
+                                     self.goals_shown)
+
+    def update_goals(self, rows):
+        # Только строки изменившихся целей; порядок (по дедлайну) от задач не зависит
+        for values, tag in rows:
+            iid, fingerprint = str(values[0]), (tuple(values), tag)
+            if self.goals_shown.get(iid) != fingerprint:
+                self.tree_goals.item(iid, values=values, tags=(tag,) if tag else ())
+                self.goals_shown[iid] = fingerprint
+
+    def load_today_tasks(self, pages):
+        self.tree_today.show(pages)
+
+    def load_in_progress_tasks(self, pages):
+        self.tree_in_progress.show(pages)
+
+    def load_done_tasks(self, pages):
         if not hasattr(self, 'tree_done') or not self.tree_done:
             return
-        tree = self.tree_done
-        for i in tree.get_children():
-            tree.delete(i)
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor.execute('''
-            SELECT t.id, t.title, t.duration_minutes, t.importance_level, t.deadline,
-                g.title
-            FROM tasks t
-            LEFT JOIN goals g ON t.goal_id = g.id
-            WHERE t.scheduled_date = ? AND t.status = 'done'
-            ORDER BY t.id DESC
-        ''', (today,))
-        for row in cursor.fetchall():
-            deadline = row[4][:16].replace("T", " ") if row[4] else "-"
-            tree.insert("", tk.END, values=(
-                row[0], row[1], f"{row[2]} мин", f"{row[3]}/10", deadline, row[5] or "-"
-            ))
+        self.tree_done.show(pages)
 
     def show_goal_tasks(self, tree):
         selected = tree.selection()
@@ -327,105 +292,82 @@ class GUITabs:
         win.geometry("700x500")
         win.configure(bg="#f0f4f8")
 
-        task_tree = ttk.Treeview(win, columns=("ID", "Задача", "Статус", "Дедлайн"), show="headings")
-        for col in task_tree["columns"]:
-            task_tree.heading(col, text=col)
-            task_tree.column(col, width=150, anchor="center")
-        task_tree.column("Задача", width=300, anchor="w")
-        task_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id, title, status, deadline
-            FROM tasks
-            WHERE goal_id = ?
-            ORDER BY status, deadline
-        ''', (goal_id,))
-        for row in cursor.fetchall():
-            deadline = row[3][:16].replace("T", " ") if row[3] else "-"
-            status_ru = {"todo": "к выполнению", "in_progress": "в процессе", "done": "выполнена"}[row[2]]
-            task_tree.insert("", tk.END, values=(row[0], row[1], status_ru, deadline))
+        columns = ("ID", "Задача", "Статус", "Дедлайн")
+        task_tree = PagedTree(win, columns, self.main_app.reader)
+        for col in columns:
+            task_tree.tree.heading(col, text=col)
+            task_tree.tree.column(col, width=150, anchor="center")
+        task_tree.tree.column("Задача", width=300, anchor="w")
+
+        # Первая страница читается сразу, остальные — по мере прокрутки
+        with self.main_app.reader() as conn:
+            pages = task_tree.load(goal_task_list(goal_id), conn, *task_tree.window())
+        task_tree.show(pages)
 
     # === Общие методы работы с задачами ===
+    # Одна операция — один запрос по всему выбору в одной транзакции, в фоне на
+    # пишущем соединении. Граф, план на неделю и события обновляются по её
+    # итогу в главном потоке (SmartAssistantGUI.apply_mutation).
+    # work(conn, user_id) — изменения только в задачах пользователя окна
+    def run_mutation(self, work, message):
+        storage, main_app = self.main_app.storage, self.main_app
+
+        def write():
+            with storage.write() as conn:
+                return work(conn, main_app.user_id)
+
+        def finish(mutation):
+            main_app.apply_mutation(mutation)
+            messagebox.showinfo("Готово", f"{message}: {len(mutation)}")
+
+        main_app.executor.submit(None, write, finish)
+
     def postpone_selected(self, tree):
-        selected = tree.selection()
-        if not selected:
+        task_ids = tree.selected_ids()
+        if not task_ids:
             messagebox.showwarning("Внимание", "Выберите хотя бы одну задачу!")
             return
-
         tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        cursor = self.conn.cursor()
-        moved = 0
-        for item in selected:
-            task_id = tree.item(item)['values'][0]
-            cursor.execute('''
-                UPDATE tasks SET scheduled_date = ?, status = 'todo'
-                WHERE id = ? AND status != 'done'
-            ''', (tomorrow, task_id))
-            moved += cursor.rowcount
-        self.conn.commit()
-        messagebox.showinfo("Готово", f"Перенесено задач: {moved}")
-        self.refresh_all_tabs()
+        self.run_mutation(lambda conn, user_id: task_mutations.postpone(conn, task_ids, tomorrow, user_id),
+                          "Перенесено задач")
 
     def mark_done(self, tree):
-        selected = tree.selection()
-        if not selected:
+        task_ids = tree.selected_ids()
+        if not task_ids:
             messagebox.showwarning("Внимание", "Выберите задачу!")
             return
-        cursor = self.conn.cursor()
-        done = 0
-        for item in selected:
-            task_id = tree.item(item)['values'][0]
-            cursor.execute("UPDATE tasks SET status = 'done' WHERE id = ?", (task_id,))
-            done += cursor.rowcount
-        self.conn.commit()
-        messagebox.showinfo("Готово", f"Выполнено задач: {done}")
-        self.refresh_all_tabs()
+        self.run_mutation(lambda conn, user_id: task_mutations.set_status(conn, task_ids, "done", user_id),
+                          "Выполнено задач")
 
     def delete_done(self, tree):
-        selected = tree.selection()
-        if not selected:
+        task_ids = tree.selected_ids()
+        if not task_ids:
             messagebox.showwarning("Внимание", "Выберите задачу для удаления!")
             return
         if not messagebox.askyesno("Удалить", "Удалить выбранные задачи навсегда?"):
             return
-
-        cursor = self.conn.cursor()
-        deleted = 0
-        for item in selected:
-            task_id = tree.item(item)['values'][0]
-            cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-            deleted += cursor.rowcount
-        self.conn.commit()
-        messagebox.showinfo("Готово", f"Удалено задач: {deleted}")
-        self.refresh_all_tabs()
+        self.run_mutation(lambda conn, user_id: task_mutations.delete(conn, task_ids, user_id),
+                          "Удалено задач")
 
     def finish_task(self, tree):
-        selected = tree.selection()
-        if not selected:
+        task_ids = tree.selected_ids()
+        if not task_ids:
             messagebox.showwarning("Внимание", "Выберите задачу!")
             return
-        cursor = self.conn.cursor()
-        done = 0
-        for item in selected:
-            task_id = tree.item(item)['values'][0]
-            cursor.execute("UPDATE tasks SET status = 'done' WHERE id = ?", (task_id,))
-            done += cursor.rowcount
-        self.conn.commit()
-        messagebox.showinfo("Готово", f"Завершено задач: {done}")
-        self.refresh_all_tabs()
+        self.run_mutation(lambda conn, user_id: task_mutations.set_status(conn, task_ids, "done", user_id),
+                          "Завершено задач")
 
     def return_to_todo(self, tree):
-        selected = tree.selection()
-        if not selected:
+        task_ids = tree.selected_ids()
+        if not task_ids:
             messagebox.showwarning("Внимание", "Выберите задачу!")
             return
-        cursor = self.conn.cursor()
-        returned = 0
-        for item in selected:
-            task_id = tree.item(item)['values'][0]
-            cursor.execute("UPDATE tasks SET status = 'todo' WHERE id = ?", (task_id,))
-            returned += cursor.rowcount
-        self.conn.commit()
-        messagebox.showinfo("Готово", f"Возвращено в список: {returned}")
-        self.refresh_all_tabs()
\ No newline at end of file
+        self.run_mutation(lambda conn, user_id: task_mutations.set_status(conn, task_ids, "todo", user_id),
+                          "Возвращено в список")
+
+    def edit_selected(self, tree):
+        task_ids = tree.selected_ids()
+        if not task_ids:
+            messagebox.showwarning("Внимание", "Выберите хотя бы одну задачу!")
+            return
+        self.main_app.gui_windows.open_bulk_edit(task_ids)
@@ -1,12 +1,31 @@
+import json
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
 from datetime import datetime
+import task_mutations
+from events import TASKS, GOALS, SCHEDULE, ENERGY
+from priority_calculator import get_dependency_graph, DependencyCycleError
+
+TYPE_MAP = {
+    "Творческая": "creative",
+    "Аналитическая": "analytical",
+    "Рутинная": "routine",
+    "Общение": "communication"
+}
+ENERGY_MAP = {
+    "Низкая": "low",
+    "Средняя": "medium",
+    "Высокая": "high"
+}
+UNCHANGED = "(не менять)"
+
 
 class GUIWindows:
+    # Окна читают и пишут данные пользователя main_app.user_id
     def __init__(self, main_app):
         self.main_app = main_app
         self.conn = main_app.conn
+        self.user_id = main_app.user_id
 
     def open_schedule(self):
         win = tk.Toplevel(self.main_app.root)
@@ -31,7 +50,8 @@ class GUIWindows:
             entries[day_ru] = (start, end)
 
         cursor = self.conn.cursor()
-        cursor.execute("SELECT day_of_week, start_time, end_time FROM schedule")
+        cursor.execute("SELECT day_of_week, start_time, end_time FROM schedule WHERE user_id = ?",
+                       (self.user_id,))
         for row in cursor.fetchall():
             day_en = row[0]
             day_ru = next((ru for ru, en in day_map.items() if en == day_en), None)
@@ -41,19 +61,20 @@ class GUIWindows:
                 end.insert(0, row[2])
 
         def save():
-            cursor = self.conn.cursor()
-            for day_ru, (start, end) in entries.items():
-                s, e = start.get().strip(), end.get().strip()
-                if s and e:
-                    day_en = day_map[day_ru]
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO schedule (day_of_week, start_time, end_time)
-                        VALUES (?, ?, ?)
-                    ''', (day_en, s, e))
-            self.conn.commit()
+            with self.main_app.storage.write_lock, self.main_app.metrics.phase("save"):
+                cursor = self.conn.cursor()
+                for day_ru, (start, end) in entries.items():
+                    s, e = start.get().strip(), end.get().strip()
+                    if s and e:
+                        day_en = day_map[day_ru]
+                        cursor.execute('''
+                            INSERT OR REPLACE INTO schedule (user_id, day_of_week, start_time, end_time)
+                            VALUES (?, ?, ?, ?)
+                        ''', (self.user_id, day_en, s, e))
+                self.conn.commit()
+            self.main_app.events.publish(SCHEDULE)
             messagebox.showinfo("Готово", "Расписание сохранено!")
             win.destroy()
-            self.main_app.refresh_all()
 
         ttk.Button(win, text="Сохранить", command=save).pack(pady=10)
 
@@ -87,13 +108,14 @@ class GUIWindows:
                 weight = 1.0
             deadline = deadline_entry.get().strip() or None
 
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO goals (title, weight, deadline) VALUES (?, ?, ?)",
-                           (title, weight, deadline))
-            self.conn.commit()
+            with self.main_app.storage.write_lock, self.main_app.metrics.phase("save"):
+                cursor = self.conn.cursor()
+                cursor.execute("INSERT INTO goals (user_id, title, weight, deadline) VALUES (?, ?, ?, ?)",
+                               (self.user_id, title, weight, deadline))
+                self.conn.commit()
+            self.main_app.events.publish(GOALS, [cursor.lastrowid])
             messagebox.showinfo("Готово", f"Цель «{title}» добавлена!")
             win.destroy()
-            self.main_app.refresh_all()
 
         ttk.Button(win, text="Добавить", command=save).pack(pady=15)
 
@@ -121,7 +143,7 @@ class GUIWindows:
         goal_combo = ttk.Combobox(win, textvariable=goal_var, state="readonly", width=47)
         goal_combo.pack(pady=2, padx=20)
         cursor = self.conn.cursor()
-        cursor.execute("SELECT id, title FROM goals")
+        cursor.execute("SELECT id, title FROM goals WHERE user_id = ?", (self.user_id,))
         goals = [(row[0], row[1]) for row in cursor.fetchall()]
         goal_combo['values'] = ["(не привязывать)"] + [f"{id}. {title}" for id, title in goals]
         goal_combo.current(0)
@@ -158,18 +180,6 @@ class GUIWindows:
         blocks_entry = tk.Entry(win, width=50)
         blocks_entry.pack(pady=2, padx=20)
 
-        TYPE_MAP = {
-            "Творческая": "creative",
-            "Аналитическая": "analytical",
-            "Рутинная": "routine",
-            "Общение": "communication"
-        }
-        ENERGY_MAP = {
-            "Низкая": "low",
-            "Средняя": "medium",
-            "Высокая": "high"
-        }
-
         def save():
             title = fields["title"].get().strip()
             if not title:
@@ -203,31 +213,119 @@ class GUIWindows:
                 contribution = 0.8
 
             blocks_input = blocks_entry.get().strip()
-            blocks_json = "[]"
+            blocker_ids = []
             if blocks_input:
                 try:
-                    ids = [int(x.strip()) for x in blocks_input.split(",") if x.strip().isdigit()]
-                    blocks_json = json.dumps(ids)
+                    blocker_ids = [int(x.strip()) for x in blocks_input.split(",") if x.strip().isdigit()]
                 except:
                     messagebox.showwarning("Внимание", "Некорректные ID зависимостей")
 
             today = datetime.now().strftime("%Y-%m-%d")
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO tasks (
-                    title, duration_minutes, importance_level, status, created_date,
-                    scheduled_date, deadline, goal_id, energy_type, task_type,
-                    blocks_task_ids, contribution
-                ) VALUES (?, ?, ?, 'todo', ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (title, duration, importance, today, today, deadline, goal_id,
-                  energy_type_en, task_type_en, blocks_json, contribution))
-            self.conn.commit()
+            with self.main_app.storage.write_lock, self.main_app.metrics.phase("save"):
+                graph = get_dependency_graph(self.conn)
+                cursor = self.conn.cursor()
+                # Ждать можно только своих задач
+                cursor.execute('''
+                    SELECT id FROM tasks
+                    WHERE user_id = ? AND id IN (SELECT value FROM json_each(?))
+                ''', (self.user_id, json.dumps(blocker_ids)))
+                blocker_ids = [row[0] for row in cursor.fetchall()]
+                cursor.execute('''
+                    INSERT INTO tasks (
+                        user_id, title, duration_minutes, importance_level, status, created_date,
+                        scheduled_date, deadline, goal_id, energy_type, task_type,
+                        contribution
+                    ) VALUES (?, ?, ?, ?, 'todo', ?, ?, ?, ?, ?, ?, ?)
+                ''', (self.user_id, title, duration, importance, today, today, deadline, goal_id,
+                      energy_type_en, task_type_en, contribution))
+                task_id = cursor.lastrowid
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO task_dependencies (task_id, blocker_id) VALUES (?, ?)
+                ''', [(task_id, blocker_id) for blocker_id in blocker_ids])
+                try:
+                    graph.add_task(task_id, "todo", blocker_ids)
+                except DependencyCycleError as e:
+                    self.conn.rollback()
+                    messagebox.showerror("Ошибка", str(e))
+                    return
+                self.conn.commit()
+                if self.main_app.horizon:
+                    self.main_app.horizon.add_task(task_id)
+            self.main_app.events.publish(TASKS, [task_id])
+            if goal_id:
+                self.main_app.events.publish(GOALS, [goal_id])
             messagebox.showinfo("Готово", f"Задача «{title}» добавлена!")
             win.destroy()
-            self.main_app.refresh_all()
 
         ttk.Button(win, text="Добавить задачу", command=save).pack(pady=15)
 
+    def open_bulk_edit(self, task_ids):
+        win = tk.Toplevel(self.main_app.root)
+        win.title("Изменить задачи")
+        win.geometry("450x380")
+        win.configure(bg="#f0f4f8")
+
+        tk.Label(win, text=f"Выбрано задач: {len(task_ids)}. Пустые поля не меняются.",
+                 bg="#f0f4f8").pack(anchor="w", padx=20, pady=(10, 5))
+
+        tk.Label(win, text="Цель:", bg="#f0f4f8").pack(anchor="w", padx=20, pady=2)
+        goal_combo = ttk.Combobox(win, state="readonly", width=40)
+        goal_combo.pack(pady=2, padx=20)
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, title FROM goals WHERE user_id = ?", (self.user_id,))
+        goal_combo['values'] = [UNCHANGED, "(не привязывать)"] + [f"{id}. {title}" for id, title in cursor.fetchall()]
+        goal_combo.current(0)
+
+        tk.Label(win, text="Важность (1–10):", bg="#f0f4f8").pack(anchor="w", padx=20, pady=2)
+        importance_entry = tk.Entry(win, width=10)
+        importance_entry.pack(pady=2, padx=20)
+
+        tk.Label(win, text="Тип задачи:", bg="#f0f4f8").pack(anchor="w", padx=20, pady=2)
+        type_combo = ttk.Combobox(win, state="readonly", width=40)
+        type_combo['values'] = (UNCHANGED,) + tuple(TYPE_MAP)
+        type_combo.current(0)
+        type_combo.pack(pady=2, padx=20)
+
+        tk.Label(win, text="Требуемая энергия:", bg="#f0f4f8").pack(anchor="w", padx=20, pady=2)
+        energy_combo = ttk.Combobox(win, state="readonly", width=40)
+        energy_combo['values'] = (UNCHANGED,) + tuple(ENERGY_MAP)
+        energy_combo.current(0)
+        energy_combo.pack(pady=2, padx=20)
+
+        def save():
+            fields = {}
+            goal_choice = goal_combo.get()
+            if goal_choice == "(не привязывать)":
+                fields["goal_id"] = None
+            elif goal_choice and goal_choice != UNCHANGED:
+                fields["goal_id"] = int(goal_choice.split('.')[0])
+            if importance_entry.get().strip():
+                try:
+                    fields["importance_level"] = int(importance_entry.get())
+                    if not 1 <= fields["importance_level"] <= 10: raise ValueError
+                except ValueError:
+                    messagebox.showerror("Ошибка", "Важность от 1 до 10!")
+                    return
+            if type_combo.get() in TYPE_MAP:
+                fields["task_type"] = TYPE_MAP[type_combo.get()]
+            if energy_combo.get() in ENERGY_MAP:
+                fields["energy_type"] = ENERGY_MAP[energy_combo.get()]
+            if not fields:
+                messagebox.showwarning("Внимание", "Ничего не изменено")
+                return
+
+            try:
+                with self.main_app.storage.write() as conn, self.main_app.metrics.phase("save"):
+                    mutation = task_mutations.edit(conn, task_ids, fields, self.user_id)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+            self.main_app.apply_mutation(mutation)
+            messagebox.showinfo("Готово", f"Изменено задач: {len(mutation)}")
+            win.destroy()
+
+        ttk.Button(win, text="Сохранить", command=save).pack(pady=15)
+
     def open_set_energy(self):
         win = tk.Toplevel(self.main_app.root)
         win.title("Установить энергию")
@@ -241,9 +339,12 @@ class GUIWindows:
         def save():
             level = var.get()
             now = datetime.now().isoformat()
-            cursor = self.conn.cursor()
-            cursor.execute("INSERT INTO user_energy (energy_level, updated_at) VALUES (?, ?)", (level, now))
-            self.conn.commit()
+            with self.main_app.storage.write_lock, self.main_app.metrics.phase("save"):
+                cursor = self.conn.cursor()
+                cursor.execute("INSERT INTO user_energy (user_id, energy_level, updated_at) VALUES (?, ?, ?)",
+                               (self.user_id, level, now))
+                self.conn.commit()
+            self.main_app.events.publish(ENERGY)
             messagebox.showinfo("Готово", f"Энергия: {level}")
             win.destroy()
 
@@ -0,0 +1,355 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, date
+from typing import Optional, Iterable, List, Dict, Set, Tuple
+import heapq
+import json
+import math
+import sqlite3
+
+from init_db import DEFAULT_USER_ID
+from priority_calculator import PriorityCalculator, Task, WEIGHTS, epoch_seconds
+from day_planner import plan_window
+
+# Планировщик на несколько рабочих дней вперёд: раскладывает все открытые задачи
+# по ближайшим HORIZON_DAYS рабочим дням из schedule и пишет scheduled_date.
+#
+# Порядок задач (ранг) — ближайший дедлайн, затем статический приоритет
+# (важность, цель, зависимые, длительность). Задача ставится в первый день, где
+# хватает времени и где уже стоят все её блокеры. Что не влезло в горизонт,
+# уходит на первый рабочий день после него.
+#
+# После полного плана изменения одной задачи чинятся локально: новая задача
+# вытесняет менее важные на следующий день (каскадом), а освободившееся место
+# заполняется задачами с более поздних дней. Дни, которых изменение не коснулось,
+# не пересчитываются. Ранги считаются при загрузке и до полного плана не меняются.
+
+HORIZON_DAYS = 7
+LOOKAHEAD_DAYS = 366  # сколько календарных дней просматривать в поисках рабочих
+
+
+class HorizonScheduler:
+    def __init__(self, calc: PriorityCalculator, days: int = HORIZON_DAYS):
+        self.calc = calc
+        self.conn = calc.conn
+        self.graph = calc.graph
+        self.horizon_days = days
+
+        self.dates: List[date] = []        # рабочие дни горизонта + день переполнения
+        self.date_strs: List[str] = []
+        self.capacity: List[float] = []
+        self.used: List[int] = []
+        self.queues: List[List[tuple]] = []  # ранги задач дня по возрастанию
+        self.tasks: Dict[int, Task] = {}
+        self.rank: Dict[int, tuple] = {}
+        self.day_of: Dict[int, int] = {}
+        self.saved: Dict[int, str] = {}      # scheduled_date в базе
+        self.changed: Set[int] = set()       # задачи, переставленные после _save
+        self.not_before: Dict[int, date] = {}
+        self.min_duration = 0
+        self.planned_on: Optional[date] = None
+
+    @property
+    def overflow(self) -> int:
+        return len(self.dates) - 1
+
+    # === Полный план ===
+    def plan(self, now: Optional[datetime] = None) -> Dict:
+        now = now or datetime.now()
+        self._load_days(now)
+        if not self.dates:
+            # Рабочих дней нет: ставить некуда, scheduled_date в базе не трогаем
+            self.tasks, self.rank, self.day_of, self.saved = {}, {}, {}, {}
+            self.changed = set()
+            return self.summary()
+        self.tasks = {t.id: t for t in self.calc.fetch_tasks(include_blocked=True, all_dates=True)}
+        self.rank = {task_id: self._rank(t) for task_id, t in self.tasks.items()}
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, scheduled_date FROM tasks WHERE user_id = ? AND status = 'todo'",
+                       (self.calc.user_id,))
+        self.saved = dict(cursor.fetchall())
+        self.not_before = {task_id: day for task_id, day in self.not_before.items()
+                           if task_id in self.tasks and day > now.date()}
+        self.day_of = {}
+        self.changed = set()
+        self.min_duration = min((t.duration for t in self.tasks.values()), default=0)
+
+        # Топологический порядок по рангу: блокер всегда ставится раньше зависимой
+        waiting = {task_id: sum(1 for b in self.graph.blockers.get(task_id, ()) if b in self.tasks)
+                   for task_id in self.tasks}
+        heap = [self.rank[task_id] for task_id, n in waiting.items() if n == 0]
+        heapq.heapify(heap)
+        while heap:
+            task_id = heapq.heappop(heap)[-1]
+            self._place(task_id, self._first_fit(task_id, self._earliest(task_id)))
+            for dependent_id in self.graph.dependents.get(task_id, ()):
+                if dependent_id in waiting:
+                    waiting[dependent_id] -= 1
+                    if waiting[dependent_id] == 0:
+                        heapq.heappush(heap, self.rank[dependent_id])
+
+        # Задачи в цикле зависимостей (в базе их быть не должно) — в переполнение
+        for task_id in self.tasks:
+            if task_id not in self.day_of:
+                self._place(task_id, self.overflow)
+
+        self._save()
+        return self.summary()
+
+    # === Инкрементальные изменения ===
+    # Массовая операция — один запрос задач, один проход _refill и одна
+    # транзакция _save на все id; методы для одной задачи — частный случай
+    def add_tasks(self, task_ids: Iterable[int], now: Optional[datetime] = None) -> Dict:
+        # Новые задачи (или вернувшиеся в todo, или с изменёнными полями)
+        if self._stale(now):
+            return self.plan(now)
+        task_ids = list(task_ids)
+        touched = {self._unplace(task_id) for task_id in task_ids if task_id in self.day_of}
+        tasks = [Task(*row) for row in self.calc.candidate_rows(include_blocked=True, task_ids=task_ids)]
+        for task in tasks:
+            self.tasks[task.id] = task
+            self.rank[task.id] = self._rank(task)
+            self.min_duration = min(self.min_duration, task.duration)
+        # Дату в базе могла уже записать сама операция (перенос): сверяем с ней
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, scheduled_date FROM tasks WHERE id IN (SELECT value FROM json_each(?))",
+                       (json.dumps([task.id for task in tasks]),))
+        self.saved.update(cursor.fetchall())
+        # Важные первыми: им не придётся вытеснять только что поставленные
+        for task in sorted(tasks, key=lambda t: self.rank[t.id]):
+            touched |= self._insert(task.id, 0)
+        self._refill(touched)
+        self._save()
+        return self.summary()
+
+    def remove_tasks(self, task_ids: Iterable[int], now: Optional[datetime] = None) -> Dict:
+        # Задачи выполнены, взяты в работу или удалены
+        if self._stale(now):
+            return self.plan(now)
+        task_ids = list(task_ids)
+        touched = {self._unplace(task_id) for task_id in task_ids if task_id in self.day_of}
+        if touched:
+            self._refill(touched)
+            self._save()
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+            self.not_before.pop(task_id, None)
+        return self.summary()
+
+    def postpone_tasks(self, task_ids: Iterable[int], now: Optional[datetime] = None) -> Dict:
+        # Не раньше завтрашнего дня, даже если сегодня для них есть место
+        now = now or datetime.now()
+        task_ids = list(task_ids)
+        for task_id in task_ids:
+            self.not_before[task_id] = now.date() + timedelta(days=1)
+        return self.add_tasks(task_ids, now)
+
+    def add_task(self, task_id: int, now: Optional[datetime] = None) -> Dict:
+        return self.add_tasks([task_id], now)
+
+    def remove_task(self, task_id: int, now: Optional[datetime] = None) -> Dict:
+        return self.remove_tasks([task_id], now)
+
+    def postpone_task(self, task_id: int, now: Optional[datetime] = None) -> Dict:
+        return self.postpone_tasks([task_id], now)
+
+    def summary(self) -> Dict:
+        return {
+            "days": [(self.dates[d], self.used[d], self.capacity[d], len(self.queues[d]))
+                     for d in range(self.overflow)],
+            "overflow": (self.dates[self.overflow], len(self.queues[self.overflow])) if self.dates else None,
+        }
+
+    # === Внутреннее ===
+    def _load_days(self, now: datetime):
+        schedule = self.calc.schedule_context
+        self.dates, self.capacity = [], []
+        today = plan_window(self.calc, now)
+        if today:
+            self.dates.append(now.date())
+            self.capacity.append((today[1] - today[0]).total_seconds() // 60)
+        day = now.date()
+        for _ in range(LOOKAHEAD_DAYS):
+            if len(self.dates) > self.horizon_days:
+                break
+            day += timedelta(days=1)
+            window = schedule.window(day)
+            if window:
+                self.dates.append(day)
+                self.capacity.append((window[1] - window[0]).total_seconds() // 60)
+        if self.dates:
+            self.capacity[-1] = math.inf
+        self.date_strs = [day.strftime("%Y-%m-%d") for day in self.dates]
+        self.used = [0] * len(self.dates)
+        self.queues = [[] for _ in self.dates]
+        # Без рабочих дней плана нет: следующее изменение снова проверит расписание
+        self.planned_on = now.date() if self.dates else None
+
+    def _stale(self, now: Optional[datetime]) -> bool:
+        # Пока нет плана или наступил новый день, индексы дней недействительны
+        return self.planned_on != (now or datetime.now()).date()
+
+    def _rank(self, task: Task) -> tuple:
+        # Меньше — раньше: дедлайн, затем статическая часть приоритета, затем id
+        calc = self.calc
+        static = (WEIGHTS["importance"] * calc.calculate_importance(task)
+                  + WEIGHTS["goal_alignment"] * calc.calculate_goal_alignment(task)
+                  + WEIGHTS["dependency_bonus"] * calc.calculate_dependency_bonus(task)
+                  + WEIGHTS["time_cost"] * calc.calculate_time_cost(task))
+        deadline = epoch_seconds(task.deadline) if task.deadline else math.inf
+        return (deadline, -static, task.id)
+
+    def _place(self, task_id: int, day: int):
+        self.day_of[task_id] = day
+        self.changed.add(task_id)
+        self.used[day] += self.tasks[task_id].duration
+        insort(self.queues[day], self.rank[task_id])
+
+    def _unplace(self, task_id: int) -> int:
+        day = self.day_of.pop(task_id)
+        self.used[day] -= self.tasks[task_id].duration
+        queue = self.queues[day]
+        queue.pop(bisect_left(queue, self.rank[task_id]))
+        return day
+
+    def _free(self, day: int) -> float:
+        return self.capacity[day] - self.used[day]
+
+    def _earliest(self, task_id: int) -> int:
+        day = 0
+        for blocker_id in self.graph.blockers.get(task_id, ()):
+            day = max(day, self.day_of.get(blocker_id, 0))
+        not_before = self.not_before.get(task_id)
+        if not_before:
+            while day < self.overflow and self.dates[day] < not_before:
+                day += 1
+        return day
+
+    def _first_fit(self, task_id: int, start: int) -> int:
+        duration = self.tasks[task_id].duration
+        for day in range(start, self.overflow):
+            if duration <= self._free(day):
+                return day
+        return self.overflow
+
+    def _insert(self, task_id: int, start: int) -> Set[int]:
+        # Ставит задачу, вытесняя менее важные на следующий день; зависимые,
+        # оказавшиеся раньше своего блокера, сдвигаются за ним.
+        # Возвращает дни, где после сдвигов могло остаться свободное место
+        touched: Set[int] = set()
+        pending = [(task_id, start)]
+        while pending:
+            current, start = pending.pop()
+            day, victims = self._slot(current, max(start, self._earliest(current)))
+            for victim_id in victims:
+                self._unplace(victim_id)
+                pending.append((victim_id, day + 1))
+            self._place(current, day)
+            for dependent_id in self.graph.dependents.get(current, ()):
+                if self.day_of.get(dependent_id, day) < day:
+                    touched.add(self._unplace(dependent_id))
+                    pending.append((dependent_id, day))
+        return touched
+
+    def _slot(self, task_id: int, start: int) -> Tuple[int, List[int]]:
+        # Первый день, где задача помещается сама или после вытеснения задач
+        # с рангом ниже (кроме её собственных блокеров)
+        duration = self.tasks[task_id].duration
+        rank = self.rank[task_id]
+        for day in range(start, self.overflow):
+            need = duration - self._free(day)
+            if need <= 0:
+                return day, []
+            if duration > self.capacity[day]:
+                continue
+            protected = self._blockers_on(task_id, day)
+            victims, freed = [], 0
+            for key in reversed(self.queues[day]):
+                if key <= rank:
+                    break
+                if key[-1] in protected:
+                    continue
+                victims.append(key[-1])
+                freed += self.tasks[key[-1]].duration
+                if freed >= need:
+                    return day, victims
+        return self.overflow, []
+
+    def _blockers_on(self, task_id: int, day: int) -> Set[int]:
+        # Блокеры задачи (транзитивно), стоящие в тот же день
+        found, stack = set(), [task_id]
+        while stack:
+            for blocker_id in self.graph.blockers.get(stack.pop(), ()):
+                if blocker_id not in found and self.day_of.get(blocker_id) == day:
+                    found.add(blocker_id)
+                    stack.append(blocker_id)
+        return found
+
+    def _refill(self, days: Set[int]):
+        # Подтягивает на освободившиеся дни задачи с более поздних дней (по рангу);
+        # дни, откуда их забрали, заполняются следующими
+        days = [day for day in days if day < self.overflow]
+        heapq.heapify(days)
+        while days:
+            day = heapq.heappop(days)
+            while days and days[0] == day:
+                heapq.heappop(days)
+            free = self._free(day)
+            moved = []
+            pulled: Dict[int, int] = {}
+            for key in heapq.merge(*self.queues[day + 1:]):
+                if free < self.min_duration:
+                    break
+                task_id = key[-1]
+                if self.tasks[task_id].duration > free or self._pull_day(task_id, pulled) > day:
+                    continue
+                pulled[task_id] = day
+                moved.append(task_id)
+                free -= self.tasks[task_id].duration
+            for task_id in moved:
+                old_day = self._unplace(task_id)
+                self._place(task_id, day)
+                heapq.heappush(days, old_day)
+
+    def _pull_day(self, task_id: int, pulled: Dict[int, int]) -> int:
+        # Как _earliest, но с учётом задач, уже подтянутых в этом проходе
+        day = 0
+        for blocker_id in self.graph.blockers.get(task_id, ()):
+            day = max(day, pulled.get(blocker_id, self.day_of.get(blocker_id, 0)))
+        not_before = self.not_before.get(task_id)
+        if not_before:
+            while day < self.overflow and self.dates[day] < not_before:
+                day += 1
+        return day
+
+    def _save(self):
+        # Все изменённые scheduled_date — одной транзакцией
+        changes = []
+        for task_id in self.changed:
+            day = self.day_of.get(task_id)
+            if day is not None and self.saved.get(task_id) != self.date_strs[day]:
+                changes.append((self.date_strs[day], task_id))
+        self.changed = set()
+        if not changes:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE tasks SET scheduled_date = ? WHERE id = ? AND status = 'todo'", changes)
+        for scheduled, task_id in changes:
+            self.saved[task_id] = scheduled
+        self.calc.invalidate()
+
+
+def format_horizon(summary: Dict) -> List[str]:
+    lines = []
+    for day, used, capacity, count in summary["days"]:
+        lines.append(f"{day:%d.%m}: задач {count}, занято {used} из {int(capacity)} мин")
+    if summary["overflow"]:
+        day, count = summary["overflow"]
+        if count:
+            lines.append(f"Не поместились в горизонт, перенесены на {day:%d.%m}: {count}")
+    return lines or ["Нет рабочих дней в расписании."]
+
+
+def print_horizon(conn: sqlite3.Connection, days: int = HORIZON_DAYS, user_id: int = DEFAULT_USER_ID):
+    for line in format_horizon(HorizonScheduler(PriorityCalculator(conn, user_id=user_id), days).plan()):
+        print(line)
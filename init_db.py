@@ -1,6 +1,35 @@
+# Пользователь, которому принадлежат данные однопользовательских баз и
+# которого берут GUI, cli и сервер, если другой не указан
+DEFAULT_USER_ID = 1
+
+
 def init_db(conn):
+    # Версия схемы хранится в PRAGMA user_version; каждая миграция со своим
+    # номером выполняется один раз, в отдельной транзакции.
+    # Базу открывают сразу несколько процессов (GUI, server.py, cli.py,
+    # transfer.py): версия перечитывается уже под блокировкой записи, и
+    # миграцию, которую успел применить другой процесс, пропускаем
     cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] >= number:
+                conn.rollback()
+                continue
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
+
+def create_base_schema(cursor):
+    # Версия 1 — схема до появления версий; на старых базах (user_version = 0)
+    # ничего не меняет, кроме переноса JSON-зависимостей и goal_stats
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS schedule (
             id INTEGER PRIMARY KEY,
@@ -32,12 +61,36 @@ def init_db(conn):
             goal_id INTEGER,                  
             energy_type TEXT DEFAULT 'medium',-- low, medium, high
             task_type TEXT DEFAULT 'routine', -- creative, analytical, routine, communication
-            blocks_task_ids TEXT,             -- JSON: "[2,5]" ЗАВИСИМОСТИ
             contribution REAL DEFAULT 0.8,
             FOREIGN KEY(goal_id) REFERENCES goals(id)
         )
     ''')
 
+    # Зависимости: task_id ждёт выполнения blocker_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_dependencies (
+            task_id INTEGER NOT NULL,
+            blocker_id INTEGER NOT NULL,
+            PRIMARY KEY (task_id, blocker_id),
+            FOREIGN KEY(task_id) REFERENCES tasks(id),
+            FOREIGN KEY(blocker_id) REFERENCES tasks(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_task_dependencies_blocker
+        ON task_dependencies (blocker_id, task_id)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_delete_dependencies
+        AFTER DELETE ON tasks
+        BEGIN
+            DELETE FROM task_dependencies WHERE task_id = OLD.id OR blocker_id = OLD.id;
+        END
+    ''')
+    migrate_blocks_json(cursor)
+
+    create_goal_stats(cursor)
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_energy (
             id INTEGER PRIMARY KEY,
@@ -46,4 +99,199 @@ def init_db(conn):
         )
     ''')
 
-    conn.commit()
\ No newline at end of file
+
+def create_query_indexes(cursor):
+    # Покрывающие индексы под запросы priority_calculator, task_views и вкладок.
+    # Вкладки и кандидаты на сегодня: равенство по дате и статусу, все
+    # показываемые столбцы в индексе — таблица не читается вовсе. id сразу
+    # после статуса, чтобы ORDER BY t.id шёл по индексу без сортировки
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_day_status
+        ON tasks (scheduled_date, status, id, importance_level, goal_id, duration_minutes,
+                  deadline, energy_type, task_type, contribution, title)
+    ''')
+    # Задачи цели (отсортированы по статусу и дедлайну) и пересчёт goal_stats
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_goal
+        ON tasks (goal_id, status, deadline, importance_level, title)
+    ''')
+    # Все открытые задачи независимо от даты (планировщик на горизонт)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_status
+        ON tasks (status, scheduled_date)
+    ''')
+    # Последняя энергия: ORDER BY updated_at DESC LIMIT 1 без сортировки
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_energy_updated
+        ON user_energy (updated_at, energy_level)
+    ''')
+
+
+def create_paging_indexes(cursor):
+    # Вкладка «Задачи на сегодня» листается страницами по (важность, id) от
+    # большего к меньшему: страница читается обратным проходом по индексу от
+    # ключа предыдущей, без сортировки всего дня
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_day_importance
+        ON tasks (scheduled_date, importance_level, id, status)
+    ''')
+
+
+def add_users(cursor):
+    # Общая база на команду: у задач, целей, расписания и энергии есть
+    # user_id, всё прежнее достаётся DEFAULT_USER_ID. Зависимости и goal_stats
+    # идут по id задач и целей, которые уже принадлежат одному пользователю.
+    # REFERENCES у добавленных столбцов нет: ALTER TABLE не разрешает его
+    # вместе с ненулевым DEFAULT при включённых внешних ключах
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO users (id, name) VALUES (?, 'default')", (DEFAULT_USER_ID,))
+    for table in ("tasks", "goals", "user_energy"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN user_id INTEGER NOT NULL DEFAULT {DEFAULT_USER_ID}")
+
+    # День недели в расписании был уникален на всю базу — таблица пересоздаётся
+    cursor.execute(f'''
+        CREATE TABLE schedule_new (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL DEFAULT {DEFAULT_USER_ID},
+            day_of_week TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            UNIQUE (user_id, day_of_week)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO schedule_new (id, user_id, day_of_week, start_time, end_time)
+        SELECT id, ?, day_of_week, start_time, end_time FROM schedule
+    ''', (DEFAULT_USER_ID,))
+    cursor.execute("DROP TABLE schedule")
+    cursor.execute("ALTER TABLE schedule_new RENAME TO schedule")
+
+    # Запросы одного пользователя идут по его диапазону индекса: user_id
+    # первым, дальше прежние столбцы. idx_tasks_goal остаётся как есть — цель
+    # принадлежит одному пользователю
+    for name in ("idx_tasks_day_status", "idx_tasks_status", "idx_tasks_day_importance",
+                 "idx_user_energy_updated"):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    cursor.execute('''
+        CREATE INDEX idx_tasks_day_status
+        ON tasks (user_id, scheduled_date, status, id, importance_level, goal_id, duration_minutes,
+                  deadline, energy_type, task_type, contribution, title)
+    ''')
+    cursor.execute("CREATE INDEX idx_tasks_status ON tasks (user_id, status, scheduled_date)")
+    cursor.execute('''
+        CREATE INDEX idx_tasks_day_importance
+        ON tasks (user_id, scheduled_date, importance_level, id, status)
+    ''')
+    cursor.execute("CREATE INDEX idx_user_energy_updated ON user_energy (user_id, updated_at, energy_level)")
+    cursor.execute("CREATE INDEX idx_goals_user ON goals (user_id, deadline)")
+
+
+MIGRATIONS = [
+    create_base_schema,
+    create_query_indexes,
+    create_paging_indexes,
+    add_users,
+]
+
+
+def migrate_blocks_json(cursor):
+    # Старые базы хранили зависимости в tasks.blocks_task_ids (JSON: "[2,5]")
+    cursor.execute("PRAGMA table_info(tasks)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if "blocks_task_ids" not in columns:
+        return
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO task_dependencies (task_id, blocker_id)
+        SELECT t.id, bt.id
+        FROM tasks t, json_each(CASE WHEN json_valid(t.blocks_task_ids)
+                                          AND json_type(t.blocks_task_ids) = 'array'
+                                     THEN t.blocks_task_ids ELSE '[]' END) b
+        JOIN tasks bt ON bt.id = b.value
+    ''')
+    cursor.execute("ALTER TABLE tasks DROP COLUMN blocks_task_ids")
+
+
+def create_goal_stats(cursor):
+    # Агрегаты по целям, которые поддерживают триггеры на tasks
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'goal_stats'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goal_stats (
+            goal_id INTEGER PRIMARY KEY,
+            total_tasks INTEGER NOT NULL DEFAULT 0,
+            done_tasks INTEGER NOT NULL DEFAULT 0,
+            total_importance INTEGER NOT NULL DEFAULT 0,
+            done_importance INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY(goal_id) REFERENCES goals(id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goal_stats_task_insert
+        AFTER INSERT ON tasks
+        WHEN NEW.goal_id IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO goal_stats (goal_id) VALUES (NEW.goal_id);
+            UPDATE goal_stats SET
+                total_tasks = total_tasks + 1,
+                done_tasks = done_tasks + (CASE WHEN NEW.status = 'done' THEN 1 ELSE 0 END),
+                total_importance = total_importance + NEW.importance_level,
+                done_importance = done_importance + (CASE WHEN NEW.status = 'done' THEN NEW.importance_level ELSE 0 END)
+            WHERE goal_id = NEW.goal_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goal_stats_task_delete
+        AFTER DELETE ON tasks
+        WHEN OLD.goal_id IS NOT NULL
+        BEGIN
+            UPDATE goal_stats SET
+                total_tasks = total_tasks - 1,
+                done_tasks = done_tasks - (CASE WHEN OLD.status = 'done' THEN 1 ELSE 0 END),
+                total_importance = total_importance - OLD.importance_level,
+                done_importance = done_importance - (CASE WHEN OLD.status = 'done' THEN OLD.importance_level ELSE 0 END)
+            WHERE goal_id = OLD.goal_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goal_stats_task_update
+        AFTER UPDATE OF goal_id, status, importance_level ON tasks
+        WHEN OLD.goal_id IS NOT NEW.goal_id
+          OR OLD.status IS NOT NEW.status
+          OR OLD.importance_level IS NOT NEW.importance_level
+        BEGIN
+            UPDATE goal_stats SET
+                total_tasks = total_tasks - 1,
+                done_tasks = done_tasks - (CASE WHEN OLD.status = 'done' THEN 1 ELSE 0 END),
+                total_importance = total_importance - OLD.importance_level,
+                done_importance = done_importance - (CASE WHEN OLD.status = 'done' THEN OLD.importance_level ELSE 0 END)
+            WHERE goal_id = OLD.goal_id;
+            INSERT OR IGNORE INTO goal_stats (goal_id) SELECT NEW.goal_id WHERE NEW.goal_id IS NOT NULL;
+            UPDATE goal_stats SET
+                total_tasks = total_tasks + 1,
+                done_tasks = done_tasks + (CASE WHEN NEW.status = 'done' THEN 1 ELSE 0 END),
+                total_importance = total_importance + NEW.importance_level,
+                done_importance = done_importance + (CASE WHEN NEW.status = 'done' THEN NEW.importance_level ELSE 0 END)
+            WHERE goal_id = NEW.goal_id;
+        END
+    ''')
+
+    if not exists:
+        cursor.execute('''
+            INSERT INTO goal_stats (goal_id, total_tasks, done_tasks, total_importance, done_importance)
+            SELECT goal_id,
+                   COUNT(*),
+                   SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END),
+                   SUM(importance_level),
+                   SUM(CASE WHEN status = 'done' THEN importance_level ELSE 0 END)
+            FROM tasks
+            WHERE goal_id IS NOT NULL
+            GROUP BY goal_id
+        ''')
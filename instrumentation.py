@@ -0,0 +1,123 @@
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Счётчики SQL и таймеры по фазам (context, fetch, score, render, save).
+# Запросы ловятся через set_trace_callback и относятся к текущей фазе;
+# время фазы — собственное, без вложенных фаз. Время запроса считается до
+# начала следующего запроса или границы фазы, то есть вместе с разбором строк
+# в Python, — для поиска N+1 это и нужно.
+# Выключенный объект ничего не считает, phase() почти ничего не стоит.
+# Стек фаз у каждого потока свой: фоновые задачи GUI меряются вместе с главным.
+
+PHASES = ("context", "fetch", "score", "render", "save")
+TOP_STATEMENTS = 5
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.connections: List[sqlite3.Connection] = []
+        self.reset()
+
+    def reset(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.statements: Dict[str, List[float]] = {}  # текст без литералов -> [число, секунды]
+        self._local = threading.local()
+
+    def enable(self, conn: sqlite3.Connection):
+        conn.set_trace_callback(self._on_statement)
+        if conn not in self.connections:
+            self.connections.append(conn)
+        self.enabled = True
+
+    def disable(self):
+        for conn in self.connections:
+            conn.set_trace_callback(None)
+        self.connections = []
+        self.enabled = False
+        self.reset()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        local = self._thread()
+        now = time.perf_counter()
+        self._close_statement(now)
+        if local.stack:
+            outer = local.stack[-1]
+            self._stat(outer[0])["seconds"] += now - outer[1]
+        self._stat(name)["calls"] += 1
+        local.stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._close_statement(now)
+            current, started = local.stack.pop()
+            self._stat(current)["seconds"] += now - started
+            if local.stack:
+                local.stack[-1][1] = now
+
+    def snapshot(self) -> Dict:
+        self._close_statement(time.perf_counter())
+        top = sorted(self.statements.items(), key=lambda item: -item[1][1])[:TOP_STATEMENTS]
+        return {
+            "phases": {name: {"calls": int(stat["calls"]), "ms": round(stat["seconds"] * 1000, 3),
+                              "statements": int(stat["statements"])}
+                       for name, stat in sorted(self.phases.items(), key=lambda item: _phase_order(item[0]))},
+            "top_statements": [{"sql": sql, "count": int(count), "ms": round(seconds * 1000, 3)}
+                               for sql, (count, seconds) in top],
+        }
+
+    def status_line(self) -> str:
+        parts = []
+        for name, stat in self.snapshot()["phases"].items():
+            if stat["calls"]:
+                parts.append(f"{name} {stat['ms']:.1f} мс, {stat['statements']} запр.")
+            else:
+                # запросы вне фаз: время не меряется
+                parts.append(f"{name} {stat['statements']} запр.")
+        return " · ".join(parts) or "Нет замеров"
+
+    def _thread(self):
+        # [фаза, начало текущего отрезка] и последний запрос этого потока
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack, local.last_sql, local.last_at = [], None, 0.0
+        return local
+
+    def _stat(self, name: str) -> Dict[str, float]:
+        stat = self.phases.get(name)
+        if stat is None:
+            stat = self.phases[name] = {"calls": 0, "seconds": 0.0, "statements": 0}
+        return stat
+
+    def _on_statement(self, sql: str):
+        local = self._thread()
+        now = time.perf_counter()
+        self._close_statement(now)
+        self._stat(local.stack[-1][0] if local.stack else "other")["statements"] += 1
+        local.last_sql = " ".join(_LITERALS.sub("?", sql).split())
+        local.last_at = now
+
+    def _close_statement(self, now: float):
+        local = self._thread()
+        if local.last_sql is None:
+            return
+        entry = self.statements.setdefault(local.last_sql, [0, 0.0])
+        entry[0] += 1
+        entry[1] += now - local.last_at
+        local.last_sql = None
+
+
+def _phase_order(name: str) -> int:
+    # Известные фазы по порядку, остальные (other) — в конце
+    return PHASES.index(name) if name in PHASES else len(PHASES)
@@ -0,0 +1,219 @@
+import sqlite3
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Set
+
+from task_views import TaskList
+
+# Виртуальный список задач поверх ttk.Treeview: в дереве лежат только видимые
+# строки и небольшой запас, полоса прокрутки показывает положение во всём
+# списке. Строки читаются страницами (keyset, см. TaskList) и хранятся в
+# небольшом кэше последних страниц. Элемент дерева — id задачи (iid), при
+# прокрутке и обновлении меняются только отличающиеся строки (sync_tree).
+
+PAGE_SIZE = 100
+CACHED_PAGES = 8
+BUFFER_ROWS = 5
+ROW_HEIGHT = 20   # высота строки Treeview по умолчанию, если тема её не задаёт
+WHEEL_ROWS = 3
+
+
+def sync_tree(tree: ttk.Treeview, rows: List[tuple], shown: Dict[str, tuple]) -> Dict[str, tuple]:
+    # Приводит плоское дерево к rows = [(iid, values, tag)] минимумом операций:
+    # удаляет пропавшие строки, вставляет новые, обновляет изменившиеся и
+    # переставляет сдвинутые. shown — отпечатки (values, tag) того, что уже в
+    # дереве; возвращает новые
+    wanted = {iid for iid, _, _ in rows}
+    stale = [iid for iid in shown if iid not in wanted]
+    if stale:
+        tree.delete(*stale)
+    order = [iid for iid in tree.get_children() if iid in wanted]
+
+    # Инвариант: строки до index уже на своих местах, order[pos] — та, что
+    # сейчас стоит на позиции index (переставленные пропускаем)
+    result, moved, pos = {}, set(), 0
+    for index, (iid, values, tag) in enumerate(rows):
+        while pos < len(order) and order[pos] in moved:
+            pos += 1
+        fingerprint = (tuple(values), tag)
+        tags = (tag,) if tag else ()
+        if iid not in shown:
+            tree.insert("", index, iid=iid, values=values, tags=tags)
+        else:
+            if shown[iid] != fingerprint:
+                tree.item(iid, values=values, tags=tags)
+            if pos < len(order) and order[pos] == iid:
+                pos += 1
+            else:
+                tree.move(iid, "", index)
+                moved.add(iid)
+        result[iid] = fingerprint
+    return result
+
+
+class Pages:
+    # Состояние одного списка: число строк, известные границы страниц и кэш.
+    # Создаётся и заполняется в фоне, дальше дочитывается в главном потоке
+    def __init__(self, source: TaskList, conn: sqlite3.Connection):
+        self.source = source
+        self.total = source.count(conn)
+        self.starts: Dict[int, Optional[tuple]] = {0: None}  # номер страницы -> ключ перед ней
+        self.cache: "OrderedDict[int, List[tuple]]" = OrderedDict()
+
+    def missing(self, offset: int, count: int) -> bool:
+        return any(number not in self.cache for number in self._numbers(offset, count))
+
+    def fetch(self, conn: sqlite3.Connection, offset: int, count: int):
+        for number in self._numbers(offset, count):
+            self._page(conn, number)
+
+    def rows(self, offset: int, count: int) -> List[tuple]:
+        # [(ключ, values, tag)]; страницы должны быть уже прочитаны
+        result = []
+        for number in self._numbers(offset, count):
+            page = self.cache[number]
+            self.cache.move_to_end(number)
+            start = number * PAGE_SIZE
+            result.extend(page[max(offset - start, 0):offset + count - start])
+        return result
+
+    def _numbers(self, offset: int, count: int) -> range:
+        end = min(offset + count, self.total)
+        return range(offset // PAGE_SIZE, (end - 1) // PAGE_SIZE + 1) if end > offset else range(0)
+
+    def _page(self, conn: sqlite3.Connection, number: int):
+        if number in self.cache:
+            return
+        if number not in self.starts:
+            # Прыжок через непрочитанные страницы: границу ищем от ближайшей известной
+            known = max(n for n in self.starts if n < number)
+            skip = (number - known) * PAGE_SIZE
+            self.starts[number] = self.source.key_at(conn, self.starts[known], skip)
+        page = self.source.page(conn, self.starts[number], PAGE_SIZE)
+        if len(page) == PAGE_SIZE:
+            self.starts[number + 1] = page[-1][0]
+        self.cache[number] = page
+        while len(self.cache) > CACHED_PAGES:
+            self.cache.popitem(last=False)
+
+
+class PagedTree:
+    def __init__(self, parent, columns, reader: Callable, **options):
+        self.reader = reader   # контекстный менеджер, выдающий соединение для чтения
+        self.pages: Optional[Pages] = None
+        self.offset = 0
+        self.selected: Set[int] = set()
+        self.shown: Dict[str, tuple] = {}   # iid -> (values, tag) строк в дереве
+        self._rendering = False
+
+        self.tree = ttk.Treeview(parent, columns=columns, show="headings",
+                                 yscrollcommand=self._on_tree_scroll, **options)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self._scroll(-WHEEL_ROWS if e.delta > 0 else WHEEL_ROWS))
+        self.tree.bind("<Button-4>", lambda e: self._scroll(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self._scroll(WHEEL_ROWS))
+        self.tree.bind("<Up>", self._on_up)
+        self.tree.bind("<Prior>", lambda e: self._scroll(-self.visible_rows()))
+        self.tree.bind("<Next>", lambda e: self._scroll(self.visible_rows()))
+
+    def window(self) -> tuple:
+        # Что показать после обновления: прежнее место и видимые строки с запасом
+        return self.offset, self.visible_rows() + BUFFER_ROWS
+
+    def load(self, source: TaskList, conn: sqlite3.Connection, offset: int, count: int) -> Pages:
+        # Можно звать из фонового потока: виджеты не трогает
+        pages = Pages(source, conn)
+        offset = min(offset, max(pages.total - count + BUFFER_ROWS, 0))
+        pages.fetch(conn, offset, count)
+        return pages
+
+    def show(self, pages: Pages):
+        # Данные поменялись: выбор остаётся только у строк, видимых и теперь
+        self.pages = pages
+        self.scroll_to(self.offset)
+        self.selected = {int(iid) for iid in self.tree.selection()}
+
+    def selected_ids(self) -> List[int]:
+        self._on_select()
+        return sorted(self.selected)
+
+    def visible_rows(self) -> int:
+        height = self.tree.winfo_height() if self.tree.winfo_ismapped() else 0
+        if height <= 1:
+            return int(self.tree.cget("height") or 10)
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or ROW_HEIGHT
+        # минус строка заголовков
+        return max(height // int(row_height) - 1, 1)
+
+    def yview(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * (self.pages.total if self.pages else 0)))
+        elif args[0] == "scroll":
+            step = self.visible_rows() if args[2] == "pages" else 1
+            self._scroll(int(args[1]) * step)
+
+    def scroll_to(self, offset: int):
+        if self.pages is None:
+            return
+        visible = self.visible_rows()
+        count = visible + BUFFER_ROWS
+        self.offset = max(min(offset, self.pages.total - visible), 0)
+        if self.pages.missing(self.offset, count):
+            with self.reader() as conn:
+                self.pages.fetch(conn, self.offset, count)
+        self._render(self.pages.rows(self.offset, count))
+
+        total = self.pages.total
+        if total:
+            self.scrollbar.set(self.offset / total, min((self.offset + visible) / total, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _render(self, rows: List[tuple]):
+        tree = self.tree
+        self._rendering = True
+        try:
+            self.shown = sync_tree(tree, [(str(values[0]), values, tag) for _, values, tag in rows],
+                                   self.shown)
+            selection = {str(task_id) for task_id in self.selected} & self.shown.keys()
+            if selection != set(tree.selection()):
+                tree.selection_set(sorted(selection))
+            tree.yview_moveto(0)
+        finally:
+            self._rendering = False
+
+    def _scroll(self, rows: int):
+        self.scroll_to(self.offset + rows)
+        return "break"
+
+    def _on_select(self, event=None):
+        # Выбор вне окна помним; в окне берём то, что выделено в дереве
+        if self._rendering:
+            return
+        shown = {int(iid) for iid in self.tree.get_children()}
+        self.selected = (self.selected - shown) | {int(iid) for iid in self.tree.selection()}
+
+    def _on_up(self, event):
+        # Стрелка вверх на первой строке окна — сдвиг окна на строку
+        children = self.tree.get_children()
+        if children and self.tree.focus() == children[0] and self.offset > 0:
+            self._scroll(-1)
+            first = self.tree.get_children()[0]
+            self.tree.focus(first)
+            self.tree.selection_set(first)
+            return "break"
+
+    def _on_tree_scroll(self, first, last):
+        # Treeview прокрутился сам (стрелка вниз, see): переносим сдвиг в окно
+        if self._rendering or self.pages is None:
+            return
+        shift = round(float(first) * len(self.tree.get_children()))
+        if shift > 0:
+            self._scroll(shift)
@@ -1,8 +1,17 @@
-from datetime import datetime
+from datetime import datetime, timedelta, date, time
+from array import array
 import sqlite3
-from typing import Optional, List, Dict, Any
-import json
+import threading
+from typing import Optional, List, Dict, Any, Iterable, Set, Tuple
 import math
+import heapq
+from itertools import islice
+from operator import itemgetter
+import json
+
+from init_db import DEFAULT_USER_ID
+from instrumentation import Instrumentation
+from storage import open_reader
 
 WEIGHTS = {
     "urgency": 0.35,
@@ -26,127 +35,512 @@ ENERGY_MATCH = {
     "low":   {"high": 0.3, "medium": 0.5, "low": 1.0}
 }
 
+# Коды категорий для компактного хранения (TaskBatch) и векторного расчёта
+ENERGY_LEVELS = ("high", "medium", "low")
+TASK_TYPES = ("creative", "analytical", "routine", "communication")
+ENERGY_CODES = {name: i for i, name in enumerate(ENERGY_LEVELS)}
+TASK_TYPE_CODES = {name: i for i, name in enumerate(TASK_TYPES)}
+UNKNOWN_TASK_TYPE = len(TASK_TYPES)
+# Важность 1-10 из базы (CHECK в схеме) → 1-5, как в Task.__init__
+IMPORTANCE_BY_LEVEL = tuple(min(5, max(1, level // 2)) for level in range(11))
+
+EPOCH = datetime(1970, 1, 1)
+
+def epoch_seconds(dt: datetime) -> float:
+    # Наивная арифметика, как в (task.deadline - now)
+    return (dt - EPOCH).total_seconds()
+
 class Task:
+    __slots__ = ("id", "title", "duration", "importance_level", "_deadline", "_deadline_raw",
+                 "goal_weight", "contribution", "energy_type", "task_type", "dependents")
+
     def __init__(self, id, title, duration, importance_level, deadline=None, goal_weight=1.0,
                  contribution=1.0, energy_type="medium", task_type="routine", dependents=0):
         self.id = id
         self.title = title
         self.duration = duration
         self.importance_level = min(5, max(1, importance_level // 2))  # 1-10 → 1-5
-        self.deadline = datetime.fromisoformat(deadline) if deadline else None
+        # Строка дедлайна разбирается только при первом обращении к deadline
+        self._deadline = None
+        self._deadline_raw = deadline or None
         self.goal_weight = goal_weight
         self.contribution = contribution
         self.energy_type = energy_type
         self.task_type = task_type
         self.dependents = dependents
 
-class PriorityCalculator:
-    def __init__(self, conn: sqlite3.Connection):
+    @property
+    def deadline(self) -> Optional[datetime]:
+        raw = self._deadline_raw
+        if raw is not None:
+            self._deadline = raw if isinstance(raw, datetime) else datetime.fromisoformat(raw)
+            self._deadline_raw = None
+        return self._deadline
+
+# Набор задач в виде столбцов (struct-of-arrays) для расчёта и планирования.
+# Дедлайны — секунды от EPOCH (nan — без дедлайна), категории — коды ENERGY_CODES/TASK_TYPE_CODES.
+# Как и у Task, строки дедлайнов разбираются не при наполнении, а при первом
+# обращении к deadlines.
+class TaskBatch:
+    # Строк за один проход extend: в памяти держится только этот кусок строк,
+    # а не весь результат запроса
+    CHUNK_ROWS = 4096
+
+    def __init__(self):
+        self.ids = array("q")
+        self.titles: List[str] = []
+        self.durations = array("l")
+        self.importance = array("b")      # уже 1-5, как Task.importance_level
+        self._deadlines = array("d")
+        self._deadlines_raw: List = []    # ещё не разобранные: ISO-строка, datetime или None
+        self.goal_weights = array("d")
+        self.contributions = array("d")
+        self.energy_codes = array("b")
+        self.task_type_codes = array("b")
+        self.dependents = array("l")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, task_id, title, duration, importance_level, deadline, goal_weight,
+               contribution, energy_type, task_type, dependents):
+        # Аргументы как у Task: importance_level 1-10, deadline — ISO-строка
+        self.ids.append(task_id)
+        self.titles.append(title)
+        self.durations.append(duration)
+        self.importance.append(min(5, max(1, importance_level // 2)))
+        self._deadlines_raw.append(deadline)
+        self.goal_weights.append(goal_weight)
+        self.contributions.append(contribution)
+        self.energy_codes.append(ENERGY_CODES[energy_type])
+        self.task_type_codes.append(TASK_TYPE_CODES.get(task_type, UNKNOWN_TASK_TYPE))
+        self.dependents.append(dependents)
+
+    @property
+    def deadlines(self) -> array:
+        raw = self._deadlines_raw
+        if raw:
+            # Одинаковые строки (даты и часы в списке дня повторяются) разбираются один раз
+            parsed: Dict[Any, float] = {}
+
+            def seconds(value) -> float:
+                if not value:
+                    return math.nan
+                result = parsed.get(value)
+                if result is None:
+                    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+                    result = parsed[value] = epoch_seconds(dt)
+                return result
+
+            self._deadlines.extend(map(seconds, raw))
+            self._deadlines_raw = []
+        return self._deadlines
+
+    def extend(self, rows: Iterable[tuple]) -> None:
+        # То же, что append для каждой строки, но по столбцам: массивы
+        # пополняются на уровне C
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.CHUNK_ROWS))
+            if not chunk:
+                return
+
+            def column(i):
+                return map(itemgetter(i), chunk)
+
+            self.ids.extend(column(0))
+            self.titles.extend(column(1))
+            self.durations.extend(column(2))
+            self.importance.extend(map(IMPORTANCE_BY_LEVEL.__getitem__, column(3)))
+            self._deadlines_raw.extend(column(4))
+            self.goal_weights.extend(column(5))
+            self.contributions.extend(column(6))
+            self.energy_codes.extend(map(ENERGY_CODES.__getitem__, column(7)))
+            self.task_type_codes.extend([TASK_TYPE_CODES.get(t, UNKNOWN_TASK_TYPE) for t in column(8)])
+            self.dependents.extend(column(9))
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[Task]) -> "TaskBatch":
+        batch = cls()
+        for t in tasks:
+            batch.ids.append(t.id)
+            batch.titles.append(t.title)
+            batch.durations.append(t.duration)
+            batch.importance.append(t.importance_level)
+            batch._deadlines_raw.append(t.deadline)
+            batch.goal_weights.append(t.goal_weight)
+            batch.contributions.append(t.contribution)
+            batch.energy_codes.append(ENERGY_CODES[t.energy_type])
+            batch.task_type_codes.append(TASK_TYPE_CODES.get(t.task_type, UNKNOWN_TASK_TYPE))
+            batch.dependents.append(t.dependents)
+        return batch
+
+    def task(self, i: int) -> Task:
+        deadline = self.deadlines[i]
+        type_code = self.task_type_codes[i]
+        return Task(
+            id=self.ids[i],
+            title=self.titles[i],
+            duration=self.durations[i],
+            importance_level=self.importance[i] * 2,
+            deadline=None if math.isnan(deadline) else EPOCH + timedelta(seconds=deadline),
+            goal_weight=self.goal_weights[i],
+            contribution=self.contributions[i],
+            energy_type=ENERGY_LEVELS[self.energy_codes[i]],
+            # неизвестный тип в расчёте всё равно даёт 0.5
+            task_type=TASK_TYPES[type_code] if type_code != UNKNOWN_TASK_TYPE else None,
+            dependents=self.dependents[i]
+        )
+
+class DependencyCycleError(ValueError):
+    pass
+
+# Граф зависимостей в памяти: blockers[t] — чего ждёт t, dependents[b] — кто ждёт b.
+# Счётчики незавершённых блокеров и todo-зависимых обновляются инкрементально,
+# поэтому is_blocked и dependents_count работают за O(1).
+class DependencyGraph:
+    def __init__(self):
+        # Фоновые потоки GUI читают граф, пока главный его меняет
+        self._lock = threading.RLock()
+        self.blockers: Dict[int, Set[int]] = {}
+        self.dependents: Dict[int, Set[int]] = {}
+        self.status: Dict[int, str] = {}
+        self.open_blockers: Dict[int, int] = {}
+        self.todo_dependents: Dict[int, int] = {}
+
+    def load(self, conn: sqlite3.Connection):
+        # Новый граф строится отдельно и подменяется целиком: is_blocked и
+        # dependents_count читают без блокировки и не должны видеть его
+        # наполовину заполненным. Изменения на время загрузки ждут _lock
+        with self._lock:
+            fresh = DependencyGraph()
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, status FROM tasks")
+            fresh.status = dict(cursor.fetchall())
+            cursor.execute("SELECT task_id, blocker_id FROM task_dependencies")
+            for task_id, blocker_id in cursor.fetchall():
+                fresh._link(task_id, blocker_id)
+
+            self.status, self.blockers, self.dependents = fresh.status, fresh.blockers, fresh.dependents
+            self.open_blockers, self.todo_dependents = fresh.open_blockers, fresh.todo_dependents
+
+    def is_blocked(self, task_id: int) -> bool:
+        return self.open_blockers.get(task_id, 0) > 0
+
+    def dependents_count(self, task_id: int) -> int:
+        return self.todo_dependents.get(task_id, 0)
+
+    def open_blocker_ids(self, task_id: int) -> List[int]:
+        with self._lock:
+            return sorted(b for b in self.blockers.get(task_id, ())
+                          if self._is_open(self.status.get(b)))
+
+    def add_task(self, task_id: int, status: str, blocker_ids: Iterable[int] = ()):
+        with self._lock:
+            blocker_ids = set(blocker_ids) - self.blockers.get(task_id, set())
+            self._check_cycle(task_id, blocker_ids)
+            for blocker_id in blocker_ids:
+                self._link(task_id, blocker_id)
+            self.set_status(task_id, status)
+
+    def set_status(self, task_id: int, status: Optional[str]):
+        with self._lock:
+            old = self.status.get(task_id)
+            if old == status:
+                return
+
+            # Задача как блокер: меняется число незавершённых блокеров у зависимых
+            delta = self._is_open(status) - self._is_open(old)
+            if delta:
+                for dependent_id in self.dependents.get(task_id, ()):
+                    self.open_blockers[dependent_id] = self.open_blockers.get(dependent_id, 0) + delta
+
+            # Задача как зависимая: меняется число todo-зависимых у её блокеров
+            delta = (status == "todo") - (old == "todo")
+            if delta:
+                for blocker_id in self.blockers.get(task_id, ()):
+                    self.todo_dependents[blocker_id] = self.todo_dependents.get(blocker_id, 0) + delta
+
+            if status is None:
+                self.status.pop(task_id, None)
+            else:
+                self.status[task_id] = status
+
+    def remove_task(self, task_id: int):
+        with self._lock:
+            self.set_status(task_id, None)
+            for blocker_id in self.blockers.pop(task_id, set()):
+                self.dependents[blocker_id].discard(task_id)
+            for dependent_id in self.dependents.pop(task_id, set()):
+                self.blockers[dependent_id].discard(task_id)
+            self.open_blockers.pop(task_id, None)
+            self.todo_dependents.pop(task_id, None)
+
+    @staticmethod
+    def _is_open(status: Optional[str]) -> bool:
+        # Несуществующая задача никого не блокирует
+        return status is not None and status != "done"
+
+    def _link(self, task_id: int, blocker_id: int):
+        self.blockers.setdefault(task_id, set()).add(blocker_id)
+        self.dependents.setdefault(blocker_id, set()).add(task_id)
+        if self._is_open(self.status.get(blocker_id)):
+            self.open_blockers[task_id] = self.open_blockers.get(task_id, 0) + 1
+        if self.status.get(task_id) == "todo":
+            self.todo_dependents[blocker_id] = self.todo_dependents.get(blocker_id, 0) + 1
+
+    def _check_cycle(self, task_id: int, blocker_ids: Set[int]):
+        if not blocker_ids:
+            return
+        if task_id in blocker_ids:
+            raise DependencyCycleError(f"Задача {task_id} не может зависеть от самой себя")
+
+        # Цикл появится, если кто-то из новых блокеров уже (транзитивно) ждёт task_id
+        seen = {task_id}
+        stack = [task_id]
+        while stack:
+            for dependent_id in self.dependents.get(stack.pop(), ()):
+                if dependent_id in blocker_ids:
+                    raise DependencyCycleError(
+                        f"Циклическая зависимость: задача {dependent_id} уже ждёт задачу {task_id}")
+                if dependent_id not in seen:
+                    seen.add(dependent_id)
+                    stack.append(dependent_id)
+
+
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Недельное расписание (уже разобранное) и последняя энергия пользователя в памяти.
+# Сбрасывается только окнами расписания и энергии в GUIWindows.
+# Если конец раньше начала, рабочее окно переходит через полночь.
+# Читает на своём соединении под lock (см. get_schedule_context), так что
+# перечитать сброшенный кэш можно из любого потока.
+class ScheduleContext:
+    def __init__(self, conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID,
+                 lock: Optional[threading.Lock] = None):
         self.conn = conn
+        self.user_id = user_id
+        self._lock = lock or threading.Lock()
+        self._schedule: Optional[Dict[str, Tuple[str, str]]] = None
+        self._times: Dict[str, Tuple[time, time]] = {}
+        self._energy_level: Optional[str] = None
+
+    def invalidate_schedule(self):
+        self._schedule = None
+
+    def invalidate_energy(self):
+        self._energy_level = None
+
+    def schedule(self) -> Dict[str, Tuple[str, str]]:
+        schedule = self._schedule
+        if schedule is None:
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.execute("SELECT day_of_week, start_time, end_time FROM schedule WHERE user_id = ?",
+                               (self.user_id,))
+                schedule = {day: (start, end) for day, start, end in cursor.fetchall()}
+            times = {}
+            for day, (start, end) in schedule.items():
+                try:
+                    times[day] = (datetime.strptime(start, "%H:%M").time(),
+                                  datetime.strptime(end, "%H:%M").time())
+                except (TypeError, ValueError):
+                    pass
+            self._times, self._schedule = times, schedule
+        return schedule
+
+    def energy_level(self) -> str:
+        energy_level = self._energy_level
+        if energy_level is None:
+            with self._lock:
+                cursor = self.conn.cursor()
+                cursor.execute('''
+                    SELECT energy_level FROM user_energy
+                    WHERE user_id = ?
+                    ORDER BY updated_at DESC LIMIT 1
+                ''', (self.user_id,))
+                row = cursor.fetchone()
+            energy_level = self._energy_level = row[0] if row else "medium"
+        return energy_level
+
+    def window(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        # Рабочее окно, которое начинается в этот день
+        self.schedule()
+        times = self._times.get(DAYS[day.weekday()])
+        if not times:
+            return None
+        start = datetime.combine(day, times[0])
+        end = datetime.combine(day, times[1])
+        if end < start:
+            end += timedelta(days=1)
+        return start, end
+
+    def current_window(self, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+        # Сегодняшнее окно или вчерашнее, если оно перешло через полночь
+        for day in (now.date(), now.date() - timedelta(days=1)):
+            window = self.window(day)
+            if window and window[0] <= now <= window[1]:
+                return window
+        return None
+
+    def is_working_time(self, now: datetime) -> bool:
+        return self.current_window(now) is not None
+
+
+_GRAPHS: Dict[str, DependencyGraph] = {}
+_CONTEXTS: Dict[Tuple[str, int], ScheduleContext] = {}
+_CONTEXT_READERS: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+
+def _database_key(conn: sqlite3.Connection) -> str:
+    # Один объект на файл базы; для :memory: — на соединение
+    _, _, path = conn.execute("PRAGMA database_list").fetchone()
+    return path or f":memory:{id(conn)}"
+
+def get_dependency_graph(conn: sqlite3.Connection) -> DependencyGraph:
+    key = _database_key(conn)
+    graph = _GRAPHS.get(key)
+    if graph is None:
+        graph = DependencyGraph()
+        graph.load(conn)
+        _GRAPHS[key] = graph
+    return graph
+
+def get_schedule_context(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID) -> ScheduleContext:
+    # Граф общий на файл (id задач уникальны во всей базе), расписание и
+    # энергия — у каждого пользователя свои
+    key = (_database_key(conn), user_id)
+    context = _CONTEXTS.get(key)
+    if context is None:
+        reader_conn, lock = _context_reader(conn)
+        context = _CONTEXTS[key] = ScheduleContext(reader_conn, user_id, lock)
+    return context
+
+def _context_reader(conn: sqlite3.Connection) -> Tuple[sqlite3.Connection, threading.Lock]:
+    # Контексты делят процесс (GUI, сервер), поэтому читают не на соединении
+    # того, кто создал их первым, а на своём, только для чтения, — одном на
+    # файл, с блокировкой на все его контексты. У :memory: другого нет
+    key = _database_key(conn)
+    reader = _CONTEXT_READERS.get(key)
+    if reader is None:
+        reader_conn = conn if key.startswith(":memory:") else open_reader(key)
+        reader = _CONTEXT_READERS[key] = (reader_conn, threading.Lock())
+    return reader
+
+def release_database(conn: sqlite3.Connection):
+    # Забыть граф и контексты файла перед закрытием соединения: процессу,
+    # который проходит по многим базам (fleet.py), они больше не нужны
+    key = _database_key(conn)
+    _GRAPHS.pop(key, None)
+    for context_key in [k for k in _CONTEXTS if k[0] == key]:
+        del _CONTEXTS[context_key]
+    reader = _CONTEXT_READERS.pop(key, None)
+    if reader and reader[0] is not conn:
+        reader[0].close()
 
-    def get_current_context(self) -> Dict[str, Any]:
-        now = datetime.now()
-        hour = now.hour
-        time_of_day = ("morning" if 5 <= hour < 12 else
-                       "afternoon" if 12 <= hour < 17 else
-                       "evening" if 17 <= hour < 22 else "night")
-        
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT energy_level FROM user_energy ORDER BY updated_at DESC LIMIT 1")
-        row = cursor.fetchone()
-        energy_level = row[0] if row else "medium"
-
-        day_en = now.strftime("%A").lower()
-
-        return {"now": now, "time_of_day": time_of_day, "energy_level": energy_level, 
-                "day": day_en}
+class PriorityCalculator:
+    def __init__(self, conn: sqlite3.Connection, metrics: Optional[Instrumentation] = None,
+                 user_id: int = DEFAULT_USER_ID):
+        # Задачи, цели и контекст — одного пользователя
+        self.conn = conn
+        self.user_id = user_id
+        self.metrics = metrics or Instrumentation()
+        self.graph = get_dependency_graph(conn)
+        self.schedule_context = get_schedule_context(conn, user_id)
+
+        # Кэш статических компонентов задач на сегодня, сбрасывается invalidate()
+        self._cache_date: Optional[str] = None
+        self._static: Optional[List[tuple]] = None
+        self._context_key: Optional[tuple] = None
+        self._context_match: List[float] = []
+        self._version = 0
+
+    def invalidate(self):
+        # Изменились задачи или цели. Может прийти из другого потока посреди
+        # score_candidates — тогда посчитанное там в кэш не попадёт
+        self._static = None
+        self._version += 1
+
+    def get_current_context(self, now: Optional[datetime] = None,
+                            energy_level: Optional[str] = None) -> Dict[str, Any]:
+        # now и energy_level подставляются снаружи (fleet.py); по умолчанию —
+        # часы и последняя отметка энергии пользователя
+        with self.metrics.phase("context"):
+            now = now or datetime.now()
+            hour = now.hour
+            time_of_day = ("morning" if 5 <= hour < 12 else
+                           "afternoon" if 12 <= hour < 17 else
+                           "evening" if 17 <= hour < 22 else "night")
+
+            energy_level = energy_level or self.schedule_context.energy_level()
+
+            day_en = DAYS[now.weekday()]
+
+            return {"now": now, "time_of_day": time_of_day, "energy_level": energy_level, 
+                    "day": day_en}
     
     def is_working_time(self, context: Dict) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT start_time, end_time FROM schedule WHERE day_of_week = ?", (context["day"],))
-        row = cursor.fetchone()
-        if not row: return False
-        start_str, end_str = row
-        try:
-            start = datetime.strptime(start_str, "%H:%M").time()
-            end = datetime.strptime(end_str, "%H:%M").time()
-            return start <= context["now"].time() <= end
-        except: return False
-
-    def fetch_tasks(self) -> List[Task]:
-        cursor = self.conn.cursor()
-        today = datetime.now().strftime("%Y-%m-%d")
+        with self.metrics.phase("context"):
+            return self.schedule_context.is_working_time(context["now"])
 
-        cursor.execute('''
+    def candidate_rows(self, include_blocked: bool = False, all_dates: bool = False,
+                       task_ids: Optional[Iterable[int]] = None, today: Optional[str] = None) -> Iterable[Tuple]:
+        cursor = self.conn.cursor()
+        today = today or datetime.now().strftime("%Y-%m-%d")
+
+        # По умолчанию — задачи на сегодня; all_dates — все открытые, task_ids — только эти
+        if task_ids is not None:
+            condition, params = "t.id IN (SELECT value FROM json_each(?))", (json.dumps(list(task_ids)),)
+        elif all_dates:
+            condition, params = "1", ()
+        else:
+            condition, params = "t.scheduled_date = ?", (today,)
+        condition, params = f"t.user_id = ? AND {condition}", (self.user_id,) + params
+
+        # Один запрос вместо N+1: прогресс целей из goal_stats,
+        # блокировки и зависимые задачи берутся из графа в памяти
+        cursor.execute(f'''
             SELECT t.id, t.title, t.duration_minutes, t.importance_level, t.deadline,
-                   t.goal_id, g.weight, t.energy_type, t.task_type, t.blocks_task_ids,
-                   t.contribution
+                   t.goal_id, g.id, g.weight, s.total_importance, s.done_importance,
+                   t.energy_type, t.task_type, t.contribution
             FROM tasks t
-            LEFT JOIN goals g ON t.goal_id = g.id
-            WHERE t.scheduled_date = ? AND t.status = 'todo'
-        ''', (today,))
-        
-        rows = cursor.fetchall()
-        tasks = []
-
-        for row in rows:
-            task_id = row[0]
-            blocks_json = row[9]
-
-            # === Проверка блокировки задачи ===
-            blocked = False
-            if blocks_json:
-                try:
-                    blocked_ids = json.loads(blocks_json)
-                    if blocked_ids:
-                        placeholders = ','.join('?' * len(blocked_ids))
-                        cursor.execute(f'''
-                            SELECT COUNT(*) FROM tasks
-                            WHERE id IN ({placeholders}) AND status != 'done'
-                        ''', blocked_ids)
-                        if cursor.fetchone()[0] > 0:
-                            blocked = True
-                except:
-                    pass
-
-            if blocked:
+            LEFT JOIN goals g ON g.id = t.goal_id
+            LEFT JOIN goal_stats s ON s.goal_id = t.goal_id
+            WHERE {condition} AND t.status = 'todo'
+            ORDER BY t.id
+        ''', params)
+
+        # Строки в порядке аргументов Task
+        for row in cursor.fetchall():
+            (task_id, title, duration, importance, deadline, goal_id, goal_exists,
+             base_weight, total_importance, done_importance, energy_type, task_type,
+             contribution) = row
+
+            if not include_blocked and self.graph.is_blocked(task_id):
                 continue
 
             # === Динамический вес цели ===
-            goal_id_from_db = row[5]      
-            base_goal_weight = row[6] if row[6] is not None else 1.0
-            contribution = row[10] if row[10] is not None else 0.8
-
-            dynamic_goal_weight = base_goal_weight
-            if goal_id_from_db:
-                dynamic_goal_weight = self.get_dynamic_goal_weight(goal_id_from_db)
+            if goal_id and goal_exists is not None:
+                goal_weight = self.goal_weight_from_totals(base_weight, total_importance, done_importance)
             else:
-                dynamic_goal_weight = 1.0
-
-            dependents = self.count_dependents(task_id)
-
-            tasks.append(Task(
-                id=task_id,
-                title=row[1],
-                duration=row[2],
-                importance_level=row[3],
-                deadline=row[4],
-                goal_weight=dynamic_goal_weight,
-                contribution=contribution,
-                energy_type=row[7],
-                task_type=row[8],
-                dependents=dependents
-            ))
-
-        return tasks
+                goal_weight = 1.0
+
+            yield (task_id, title, duration, importance, deadline, goal_weight,
+                   contribution if contribution is not None else 0.8,
+                   energy_type, task_type, self.graph.dependents_count(task_id))
+
+    def fetch_tasks(self, include_blocked: bool = False, all_dates: bool = False,
+                    today: Optional[str] = None) -> List[Task]:
+        with self.metrics.phase("fetch"):
+            return [Task(*row) for row in self.candidate_rows(include_blocked, all_dates, today=today)]
+
+    def fetch_task_batch(self) -> TaskBatch:
+        batch = TaskBatch()
+        with self.metrics.phase("fetch"):
+            batch.extend(self.candidate_rows())
+        return batch
     
     def count_dependents(self, task_id: int) -> int:
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(*) FROM tasks
-            WHERE blocks_task_ids LIKE ? AND status = 'todo'
-        ''', (f'%"{task_id}"%',))
-        return cursor.fetchone()[0]
+        return self.graph.dependents_count(task_id)
     
     # === Компоненты ===
     def calculate_urgency(self, task: Task, now: datetime) -> float:
@@ -183,52 +577,110 @@ class PriorityCalculator:
         score = sum(WEIGHTS[k] * v for k, v in components.items())
         return {"task": task, "score": round(score, 3), "breakdown": {k: round(v, 3) for k, v in components.items()}}
     
-    def recommend_task(self) -> Optional[Dict]:
-        context = self.get_current_context()
-        if not self.is_working_time(context): 
-            return None
-        tasks = self.fetch_tasks()
-        if not tasks: 
-            return None
-
-        scored = [self.calculate_priority(t, context) for t in tasks]
-        scored.sort(key=lambda x: x["score"], reverse=True)
-        best = scored[0]
+    def calculate_priorities(self, tasks, context: Dict):
+        # Пакетный режим для списка Task или TaskBatch: (scores, breakdown)
+        # массивами NumPy, эталон — calculate_priority
+        from vector_scoring import score_tasks
+        with self.metrics.phase("score"):
+            return score_tasks(tasks, context)
+
+    def score_task(self, task: Task, context: Dict) -> float:
+        # Тот же балл, что и в calculate_priority, но без промежуточных словарей
+        score = (WEIGHTS["urgency"] * self.calculate_urgency(task, context["now"])
+                 + WEIGHTS["importance"] * self.calculate_importance(task)
+                 + WEIGHTS["goal_alignment"] * self.calculate_goal_alignment(task)
+                 + WEIGHTS["dependency_bonus"] * self.calculate_dependency_bonus(task)
+                 + WEIGHTS["context_match"] * self.calculate_context_match(task, context)
+                 + WEIGHTS["time_cost"] * self.calculate_time_cost(task))
+        return round(score, 3)
+
+    def score_candidates(self, context: Dict) -> List[tuple]:
+        # [(task, score)] по задачам на сегодня. Всё, кроме срочности, берётся из
+        # кэша, так что повторный вызов — только арифметика, без SQL
+        with self.metrics.phase("score"):
+            today = context["now"].strftime("%Y-%m-%d")
+            static = self._static
+            if static is None or self._cache_date != today:
+                version = self._version
+                static = [(t,
+                           self.calculate_importance(t),
+                           self.calculate_goal_alignment(t),
+                           self.calculate_dependency_bonus(t),
+                           self.calculate_time_cost(t)) for t in self.fetch_tasks(today=today)]
+                if version == self._version:
+                    self._static = static
+                self._cache_date = today
+                self._context_key = None
+
+            # Соответствие контексту меняется только на границе времени суток или с энергией
+            context_key = (context["time_of_day"], context["energy_level"])
+            context_match = self._context_match
+            if self._context_key != context_key:
+                context_match = [self.calculate_context_match(t, context) for t, *_ in static]
+                self._context_match = context_match
+                self._context_key = context_key
+
+            now = context["now"]
+            w_u, w_i, w_g, w_d, w_c, w_t = (WEIGHTS[k] for k in ("urgency", "importance", "goal_alignment",
+                                                                 "dependency_bonus", "context_match", "time_cost"))
+            return [(t, round(w_u * self.calculate_urgency(t, now) + w_i * imp + w_g * goal
+                              + w_d * dep + w_c * ctx + w_t * cost, 3))
+                    for (t, imp, goal, dep, cost), ctx in zip(static, context_match)]
+
+    def recommend_tasks(self, k: int = 5, now: Optional[datetime] = None,
+                        energy_level: Optional[str] = None) -> List[Dict]:
+        context = self.get_current_context(now, energy_level)
+        if not self.is_working_time(context):
+            return []
+        scored = self.score_candidates(context)
+        if not scored:
+            return []
+
+        # Куча на k элементов: O(n log k), словари только для победителей.
+        # nlargest устойчив, как и прежний sort(reverse=True)
+        with self.metrics.phase("score"):
+            top = heapq.nlargest(k, scored, key=lambda item: item[1])
+
+            recommendations = []
+            for task, _ in top:
+                result = self.calculate_priority(task, context)
+                recommendations.append({
+                    "task": task,
+                    "score": result["score"],
+                    "reason": self.format_reason(result["breakdown"], context)
+                })
+        return recommendations
 
-        return {
-            "task": best["task"],
-            "score": best["score"],
-            "reason": self.format_reason(best["breakdown"], context)
-        }
+    def recommend_task(self) -> Optional[Dict]:
+        recommendations = self.recommend_tasks(1)
+        return recommendations[0] if recommendations else None
     
     def get_dynamic_goal_weight(self, goal_id: Optional[int]) -> float:
         if not goal_id:
             return 1.0
 
         cursor = self.conn.cursor()
-
-        cursor.execute("SELECT weight FROM goals WHERE id = ?", (goal_id,))
+        cursor.execute('''
+            SELECT g.weight, s.total_importance, s.done_importance
+            FROM goals g
+            LEFT JOIN goal_stats s ON s.goal_id = g.id
+            WHERE g.id = ? AND g.user_id = ?
+        ''', (goal_id, self.user_id))
         row = cursor.fetchone()
         if not row:
             return 1.0
-        base_weight = row[0]
+        return self.goal_weight_from_totals(*row)
 
-        # взвешенный прогресс по важности задач
-        cursor.execute("""
-            SELECT 
-                SUM(importance_level) as total_importance,
-                SUM(CASE WHEN status = 'done' THEN importance_level ELSE 0 END) as done_importance
-            FROM tasks 
-            WHERE goal_id = ?
-        """, (goal_id,))
-
-        result = cursor.fetchone()
-        total_importance = result[0] or 0
-        done_importance = result[1] or 0
+    @staticmethod
+    def goal_weight_from_totals(base_weight: float, total_importance: Optional[int],
+                                done_importance: Optional[int]) -> float:
+        total_importance = total_importance or 0
+        done_importance = done_importance or 0
 
         if total_importance == 0:
             return base_weight
 
+        # взвешенный прогресс по важности задач
         progress = done_importance / total_importance
 
         momentum_bonus = 2.5 * progress * (1 - progress)
@@ -278,22 +730,62 @@ class PriorityCalculator:
 
         return ", ".join(parts).capitalize() + "."
     
-def what_to_do_now_smart(conn: sqlite3.Connection):
-    calc = PriorityCalculator(conn)
-    rec = calc.recommend_task()
-    if not rec:
+def what_to_do_now_smart(conn: sqlite3.Connection, alternatives: int = 5, show_plan: bool = False,
+                         debug: bool = False, start: bool = True, user_id: int = DEFAULT_USER_ID):
+    # debug: в конце печатается JSON с запросами и временем по фазам;
+    # start=False — только показать, не отмечая задачу начатой
+    metrics = Instrumentation()
+    if debug:
+        metrics.enable(conn)
+    try:
+        _what_to_do_now(PriorityCalculator(conn, metrics, user_id), alternatives, show_plan, start)
+    finally:
+        if debug:
+            print(json.dumps(metrics.snapshot(), ensure_ascii=False, indent=2))
+            metrics.disable()
+
+
+def _what_to_do_now(calc: PriorityCalculator, alternatives: int, show_plan: bool, start: bool = True):
+    recs = calc.recommend_tasks(1 + alternatives)
+
+    # План считаем и вне рабочего времени: plan_window берёт сегодняшнее
+    # окно, которое ещё не началось
+    plan = None
+    if show_plan:
+        from day_planner import plan_day, format_plan
+        plan = plan_day(calc)
+
+    if not recs:
         print("Сейчас не рабочее время или нет задач. Отдыхай!")
+        if plan:
+            print()
+            for line in format_plan(plan):
+                print(line)
         return
-    
-    t = rec["task"]
-    print(f"\nСейчас лучше всего:")
-    print(f"   {t.title}")
-    print(f"   Время: {t.duration} мин | Важность: {t.importance}/5")
-    print(f"   Приоритет: {rec['score']:.3f}")
-    print(f"   Почему: {rec['reason']}")
-
-    cursor = conn.cursor()
-    cursor.execute('UPDATE tasks SET status = "in_progress" WHERE id = ?', (t.id,))
-    conn.commit()
 
-        
\ No newline at end of file
+    rec = recs[0]
+    t = rec["task"]
+    with calc.metrics.phase("render"):
+        print(f"\nСейчас лучше всего:")
+        print(f"   {t.title}")
+        print(f"   Время: {t.duration} мин | Важность: {t.importance_level}/5")
+        print(f"   Приоритет: {rec['score']:.3f}")
+        print(f"   Почему: {rec['reason']}")
+
+        if len(recs) > 1:
+            print(f"\nДальше:")
+            for i, alt in enumerate(recs[1:], 2):
+                print(f"   {i}. {alt['task'].title} ({alt['score']:.3f}) — {alt['reason']}")
+
+        if plan:
+            print()
+            for line in format_plan(plan):
+                print(line)
+
+    if not start:
+        return
+    with calc.metrics.phase("save"):
+        cursor = calc.conn.cursor()
+        cursor.execute("UPDATE tasks SET status = 'in_progress' WHERE id = ?", (t.id,))
+        calc.conn.commit()
+    calc.graph.set_status(t.id, "in_progress")
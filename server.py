@@ -0,0 +1,470 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import task_mutations
+from init_db import DEFAULT_USER_ID
+from priority_calculator import PriorityCalculator, get_dependency_graph
+from storage import DB_PATH, READER_POOL_SIZE, Storage, open_reader
+from task_views import STATUS_RU, TaskList, goal_rows
+
+# HTTP/JSON API ассистента для скриптов, плагинов редактора и телефона в
+# локальной сети. Один поток asyncio принимает соединения и разбирает
+# запросы; работа с базой идёт в пуле потоков размером с пул читателей
+# Storage: запись — через единственное пишущее соединение (Storage.write()),
+# чтение — соединениями пула, расчёт рекомендаций — на своём соединении под
+# scoring_lock, как в GUI. Пользователь — параметр user (в запросе или в теле
+# POST, по умолчанию DEFAULT_USER_ID); у каждого свой калькулятор и свои
+# записи в кэше.
+# Ответы рекомендаций хранятся готовыми байтами, пока не поменяются данные:
+# PRAGMA data_version отдельного соединения меняется после любого коммита —
+# этого сервера, GUI, cli или другого процесса. Свои POST граф правят по
+# самой операции (как apply_mutation в GUI), а на чужой коммит кэш сбрасывается,
+# граф зависимостей перечитывается, а одинаковые запросы, пришедшие во время
+# расчёта, ждут один общий расчёт.
+# По умолчанию слушает только 127.0.0.1; для локальной сети — --host 0.0.0.0
+# (аутентификации нет).
+# Запуск: python server.py [--db assistant.db] [--host 127.0.0.1] [--port 8765]
+
+HOST = "127.0.0.1"
+PORT = 8765
+BACKLOG = 512
+IDLE_TIMEOUT = 30       # секунд ждать следующего запроса в keep-alive
+READ_TIMEOUT = 10       # секунд на заголовки и тело начатого запроса
+MAX_HEADERS = 100
+MAX_BODY = 1024 * 1024
+# Срочность и время суток зависят от часов, поэтому даже без изменений
+# данных рекомендация живёт в кэше не дольше минуты
+RECOMMEND_TTL = 60
+ALTERNATIVES = 5
+MAX_TOP = 100
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+MAX_IDS = 10_000
+
+TASK_FIELDS = ("id", "title", "status", "scheduled_date", "duration_minutes",
+               "importance_level", "deadline", "goal_id")
+GOAL_FIELDS = ("id", "title", "weight", "deadline", "done_tasks", "total_tasks", "progress")
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def encode(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+def recommendation_json(rec: Dict) -> Dict:
+    # importance — шкала Task (1-5), importance_level в базе — 1-10
+    task = rec["task"]
+    return {"id": task.id, "title": task.title, "duration_minutes": task.duration,
+            "importance": task.importance_level,
+            "deadline": task.deadline.isoformat(timespec="minutes") if task.deadline else None,
+            "score": rec["score"], "reason": rec["reason"]}
+
+
+def task_list(user_id: int, day: str, status: Optional[str]) -> TaskList:
+    where, params = "t.user_id = ? AND t.scheduled_date = ?", (user_id, day)
+    if status:
+        where, params = where + " AND t.status = ?", params + (status,)
+    return TaskList(where, params, [("t.id", False)], ", ".join(f"t.{field}" for field in TASK_FIELDS),
+                    lambda conn, rows: [(row, "") for row in rows])
+
+
+def _int(query: Dict[str, str], name: str, default: int, low: int, high: int) -> int:
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise HTTPError(400, f"{name}: нужно целое число")
+    if not low <= value <= high:
+        raise HTTPError(400, f"{name}: от {low} до {high}")
+    return value
+
+
+def _user(value: Any) -> int:
+    if value is None:
+        return DEFAULT_USER_ID
+    try:
+        user_id = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, "user: нужен id пользователя")
+    if user_id < 1 or isinstance(value, bool):
+        raise HTTPError(400, "user: нужен id пользователя")
+    return user_id
+
+
+def _day(value: Optional[str], default: date) -> str:
+    if value is None:
+        return default.isoformat()
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPError(400, f"ожидается дата ГГГГ-ММ-ДД: {value}")
+
+
+def _ids(body: Dict) -> list:
+    ids = body.get("ids")
+    if (not isinstance(ids, list) or not ids or len(ids) > MAX_IDS
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)):
+        raise HTTPError(400, f"ids: непустой список id задач, не больше {MAX_IDS}")
+    return ids
+
+
+class AssistantServer:
+    def __init__(self, storage: Storage, workers: int = READER_POOL_SIZE):
+        self.storage = storage
+        # Калькуляторы пользователей делят одно соединение и одну блокировку
+        self.scoring_conn = open_reader(storage.path)
+        self.scoring_lock = threading.Lock()
+        self.scorers: Dict[int, PriorityCalculator] = {}
+        self.users: Set[int] = set()   # id, уже найденные в таблице users
+        self.graph = get_dependency_graph(self.scoring_conn)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="assistant")
+
+        # Только для PRAGMA data_version, только из потока asyncio
+        self.watch = open_reader(storage.path)
+        self.data_version = self._data_version()
+        # data_version пишущего соединения не меняется от его собственных
+        # коммитов: по нему видно, писал ли кто-то ещё (читается под write_lock)
+        with storage.write_lock:
+            self.writer_version = self._writer_version()
+        self.version = 0   # растёт при каждом замеченном изменении данных
+        self.refreshing: Optional[asyncio.Task] = None
+        self.cache: Dict[tuple, Tuple[int, float, bytes]] = {}   # ключ -> (version, годен до, тело)
+        self.inflight: Dict[tuple, asyncio.Task] = {}
+
+        self.routes: Dict[str, Dict[str, Callable]] = {
+            "/recommend": {"GET": self.get_recommend},
+            "/top": {"GET": self.get_top},
+            "/tasks": {"GET": self.get_tasks},
+            "/goals": {"GET": self.get_goals},
+            "/tasks/done": {"POST": self.post_done},
+            "/tasks/postpone": {"POST": self.post_postpone},
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.scoring_conn.close()
+        self.watch.close()
+
+    # === Соединение HTTP ===
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    writer.write(response(e.status, encode({"error": e.message}), False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                status, payload = await self.dispatch(method, target, body)
+                writer.write(response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # остановка сервера при открытом keep-alive: соединение просто закрываем
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[tuple]:
+        # (метод, цель, тело, keep_alive); None — клиент закрыл соединение
+        try:
+            line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+            if not line:
+                return None
+            parts = line.decode("latin-1").split()
+            if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                raise HTTPError(400, "неверная строка запроса")
+            method, target, version = parts
+
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                if len(headers) >= MAX_HEADERS:
+                    raise HTTPError(431, "слишком много заголовков")
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            # строка длиннее буфера StreamReader или кривой Content-Length
+            raise HTTPError(400, "неверный запрос")
+        if not 0 <= length <= MAX_BODY:
+            raise HTTPError(413, "слишком большое тело запроса")
+        body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method.upper(), target, body, keep_alive
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, bytes]:
+        url = urlsplit(target)
+        handlers = self.routes.get(url.path.rstrip("/") or "/")
+        if handlers is None:
+            return 404, encode({"error": f"нет такого адреса: {url.path}"})
+        handler = handlers.get(method)
+        if handler is None:
+            return 405, encode({"error": f"{method} не поддерживается, можно: {', '.join(handlers)}"})
+
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            if method == "POST":
+                try:
+                    data = json.loads(body or b"{}")
+                except ValueError:
+                    raise HTTPError(400, "тело запроса — не JSON")
+                if not isinstance(data, dict):
+                    raise HTTPError(400, "тело запроса — JSON-объект")
+                result = await handler(data)
+            else:
+                result = await handler(query)
+        except HTTPError as e:
+            return e.status, encode({"error": e.message})
+        except Exception:
+            traceback.print_exc()
+            return 500, encode({"error": "внутренняя ошибка"})
+        return 200, result if isinstance(result, bytes) else encode(result)
+
+    # === Изменения данных и кэш ===
+    def _data_version(self) -> int:
+        return self.watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def _writer_version(self) -> int:
+        return self.storage.writer.execute("PRAGMA data_version").fetchone()[0]
+
+    async def run(self, func: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def sync(self):
+        # Перед ответом: если после прошлой проверки кто-то коммитил, сбрасываем
+        # кэш и ждём перечитывания графа (одно на всех, кто пришёл за это время)
+        if self.refreshing is None:
+            current = self._data_version()
+            if current == self.data_version:
+                return
+            self.data_version = current
+            self.version += 1
+            self.cache.clear()
+            self.refreshing = asyncio.get_running_loop().create_task(self._refresh())
+        await asyncio.shield(self.refreshing)
+
+    async def _refresh(self):
+        try:
+            await self.run(self._reload)
+        finally:
+            self.refreshing = None
+
+    def _reload(self):
+        # Что поменялось, неизвестно (мог писать другой процесс): граф
+        # перечитывается целиком, расписание и энергия — заново. Подмена графа —
+        # под scoring_lock: расчёты прошлой версии ещё могут идти в пуле.
+        # Версию пишущего соединения запоминаем до чтения: всё, что закоммитят
+        # позже, заметит следующая проверка
+        with self.storage.write_lock:
+            self.writer_version = self._writer_version()
+        with self.storage.reader() as conn, self.scoring_lock:
+            self.graph.load(conn)
+            for scorer in self.scorers.values():
+                scorer.schedule_context.invalidate_schedule()
+                scorer.schedule_context.invalidate_energy()
+                scorer.invalidate()
+
+    def _apply(self, mutation: task_mutations.Mutation) -> bool:
+        # Вызывается после чтения data_version в mutate; True — с прошлой
+        # проверки писало другое соединение, и одной операции недостаточно
+        with self.storage.write_lock, self.scoring_lock:
+            current = self._writer_version()
+            external = current != self.writer_version
+            self.writer_version = current
+            for task_id in mutation.task_ids:
+                if mutation.action == "delete":
+                    self.graph.remove_task(task_id)
+                elif mutation.status:
+                    self.graph.set_status(task_id, mutation.status)
+            for scorer in self.scorers.values():
+                scorer.invalidate()
+        return external
+
+    async def user(self, value: Any) -> int:
+        # Калькулятор и записи кэша заводятся только для существующих
+        # пользователей: произвольный ?user= из сети не раздувает память
+        user_id = _user(value)
+        if user_id not in self.users:
+            def exists():
+                with self.storage.reader() as conn:
+                    return conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is not None
+
+            if not await self.run(exists):
+                raise HTTPError(404, f"нет пользователя {user_id}")
+            self.users.add(user_id)
+        return user_id
+
+    def scorer(self, user_id: int) -> PriorityCalculator:
+        scorer = self.scorers.get(user_id)
+        if scorer is None:
+            with self.scoring_lock:
+                scorer = self.scorers.get(user_id)
+                if scorer is None:
+                    scorer = self.scorers[user_id] = PriorityCalculator(self.scoring_conn, user_id=user_id)
+        return scorer
+
+    async def cached(self, key: tuple, compute: Callable) -> bytes:
+        await self.sync()
+        entry = self.cache.get(key)
+        if entry and entry[0] == self.version and entry[1] > time.monotonic():
+            return entry[2]
+        # Одинаковые запросы во время расчёта ждут его, а не считают заново
+        flight = (key, self.version)
+        task = self.inflight.get(flight)
+        if task is None:
+            task = self.inflight[flight] = asyncio.get_running_loop().create_task(
+                self._compute(flight, compute))
+        return await asyncio.shield(task)
+
+    async def _compute(self, flight: tuple, compute: Callable) -> bytes:
+        key, version = flight
+        try:
+            body = encode(await self.run(compute))
+        finally:
+            del self.inflight[flight]
+        if version == self.version:
+            self.cache[key] = (version, time.monotonic() + RECOMMEND_TTL, body)
+        return body
+
+    def recommend(self, user_id: int, k: int) -> list:
+        scorer = self.scorer(user_id)
+        with self.scoring_lock:
+            return [recommendation_json(rec) for rec in scorer.recommend_tasks(k)]
+
+    # === Адреса ===
+    async def get_recommend(self, query: Dict[str, str]) -> bytes:
+        user_id = await self.user(query.get("user"))
+
+        def compute():
+            recs = self.recommend(user_id, 1 + ALTERNATIVES)
+            if not recs:
+                return {"task": None, "alternatives": [],
+                        "message": "Сейчас не рабочее время или нет задач. Отдыхай!"}
+            return {"task": recs[0], "alternatives": recs[1:]}
+
+        return await self.cached(("recommend", user_id), compute)
+
+    async def get_top(self, query: Dict[str, str]) -> bytes:
+        user_id = await self.user(query.get("user"))
+        k = _int(query, "k", 10, 1, MAX_TOP)
+        return await self.cached(("top", user_id, k), lambda: {"tasks": self.recommend(user_id, k)})
+
+    async def get_tasks(self, query: Dict[str, str]) -> Dict:
+        # Задачи дня по статусу, страницами по id: следующая — с after=next
+        status = query.get("status")
+        if status is not None and status not in STATUS_RU:
+            raise HTTPError(400, f"status: одно из {', '.join(STATUS_RU)}")
+        source = task_list(await self.user(query.get("user")), _day(query.get("date"), date.today()), status)
+        after = _int(query, "after", 0, 0, 2 ** 63 - 1)
+        limit = _int(query, "limit", PAGE_LIMIT, 1, MAX_PAGE_LIMIT)
+
+        def load():
+            with self.storage.reader() as conn:
+                return source.page(conn, (after,) if after else None, limit)
+
+        page = await self.run(load)
+        return {"tasks": [dict(zip(TASK_FIELDS, values)) for _, values, _ in page],
+                "next": page[-1][0][0] if len(page) == limit else None}
+
+    async def get_goals(self, query: Dict[str, str]) -> Dict:
+        user_id = await self.user(query.get("user"))
+
+        def load():
+            with self.storage.reader() as conn:
+                return goal_rows(conn, user_id)
+
+        return {"goals": [dict(zip(GOAL_FIELDS, values), tag=tag) for values, tag in await self.run(load)]}
+
+    async def post_done(self, data: Dict) -> Dict:
+        ids, user_id = _ids(data), await self.user(data.get("user"))
+        return await self.mutate(lambda conn: task_mutations.set_status(conn, ids, "done", user_id))
+
+    async def post_postpone(self, data: Dict) -> Dict:
+        ids, user_id = _ids(data), await self.user(data.get("user"))
+        day = _day(data.get("date"), date.today() + timedelta(days=1))
+        result = await self.mutate(lambda conn: task_mutations.postpone(conn, ids, day, user_id))
+        result["date"] = day
+        return result
+
+    async def mutate(self, work: Callable) -> Dict:
+        def write():
+            with self.storage.write() as conn:
+                return work(conn)
+
+        mutation = await self.run(write)
+        # Свой коммит тоже меняет data_version. Его учитываем здесь, до ответа,
+        # и правим граф по операции — O(изменённых задач), а не всей базы
+        self.data_version = self._data_version()
+        self.version += 1
+        self.cache.clear()
+        if await self.run(self._apply, mutation):
+            # Кто-то ещё коммитил рядом с нашим коммитом: перечитываем всё
+            self.data_version = None
+            await self.sync()
+        return {"changed": mutation.task_ids, "goals": mutation.goal_ids}
+
+
+async def serve(path: str, host: str, port: int):
+    storage = Storage(path)
+    app = AssistantServer(storage)
+    server = await asyncio.start_server(app.handle, host, port, backlog=BACKLOG)
+    try:
+        for sock in server.sockets:
+            print(f"{datetime.now():%H:%M:%S} слушаю http://{sock.getsockname()[0]}:{sock.getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+    finally:
+        app.close()
+        storage.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python server.py", description="HTTP/JSON API ассистента")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--host", default=HOST, help="0.0.0.0 — доступ из локальной сети")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.db, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
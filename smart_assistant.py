@@ -1,21 +1,52 @@
+import threading
 import tkinter as tk
+from contextlib import contextmanager
 from tkinter import ttk, messagebox
-import sqlite3
 from datetime import datetime, timedelta
 
-from init_db import init_db
-from priority_calculator import PriorityCalculator
+import task_mutations
+from background import BackgroundExecutor
+from events import ChangeBus, TASKS, GOALS, SCHEDULE, ENERGY
+from init_db import DEFAULT_USER_ID
+from storage import Storage, open_reader
+from priority_calculator import PriorityCalculator, DAYS
+from instrumentation import Instrumentation
 from gui_windows import GUIWindows
 from gui_tabs import GUITabs
+from horizon_scheduler import HorizonScheduler, format_horizon
 
 
 class SmartAssistantGUI:
-    def __init__(self, root):
+    def __init__(self, root, user_id: int = DEFAULT_USER_ID):
         self.root = root
+        # Окно показывает и меняет данные одного пользователя общей базы
+        self.user_id = user_id
         self.setup_main_window()
         
-        self.conn = sqlite3.connect('assistant.db')
-        init_db(self.conn)
+        # WAL: пишущее соединение для GUI, пул читателей для фоновых задач
+        self.storage = Storage()
+        self.conn = self.storage.writer
+        # Замеры включаются по F12 и показываются в строке состояния
+        self.metrics = Instrumentation()
+        self.calc = PriorityCalculator(self.conn, self.metrics, user_id)
+        # Рекомендации и план дня считаются в фоне на своём соединении только
+        # для чтения; граф и расписание у них с calc общие (один файл базы)
+        self.scorer = PriorityCalculator(open_reader(self.storage.path), self.metrics, user_id)
+        self.scoring_lock = threading.Lock()
+        # Пишут и другие процессы (cli.py, server.py, transfer.py): по PRAGMA
+        # data_version отдельного соединения «Обновить» видит их коммиты
+        self.watch = open_reader(self.storage.path)
+        self.data_version = self.watch.execute("PRAGMA data_version").fetchone()[0]
+        self.executor = BackgroundExecutor(self.root, on_busy=self.show_loading)
+        # Запись сообщает, что поменялось; кэши сбрасываются сразу, заголовок и
+        # вкладки обновляются по своим событиям раз за проход цикла Tk
+        self.events = ChangeBus(self.root)
+        self.events.subscribe((TASKS, GOALS), lambda changes: self.invalidate(), immediate=True)
+        self.events.subscribe((SCHEDULE,), self.on_schedule_changed, immediate=True)
+        self.events.subscribe((ENERGY,), self.on_energy_changed, immediate=True)
+        self.events.subscribe((SCHEDULE,), lambda changes: self.load_schedule())
+        # Включается кнопкой «Распланировать неделю», дальше чинит план при изменениях
+        self.horizon = None
         
         self.gui_windows = GUIWindows(self)
         self.gui_tabs = GUITabs(self)
@@ -34,6 +65,7 @@ class SmartAssistantGUI:
         self.create_buttons()
         self.gui_tabs.create_tabs()
         self.create_recommendation_section()
+        self.create_debug_bar()
 
     def create_title(self):
         title = tk.Label(self.root, text="Трекер задач", font=("Helvetica", 20, "bold"),
@@ -49,6 +81,7 @@ class SmartAssistantGUI:
             ("Добавить цель", self.open_add_goal),
             ("Добавить задачу", self.open_add_task),
             ("Установить энергию", self.open_set_energy),
+            ("Распланировать неделю", self.plan_horizon),
             ("Обновить", self.refresh_all)
         ]
 
@@ -65,7 +98,14 @@ class SmartAssistantGUI:
                             padx=10,  
                             pady=6)   
         special_btn.pack(side=tk.LEFT, padx=5)
-        
+
+        self.loading_label = tk.Label(btn_frame, text="", font=("Helvetica", 10, "italic"),
+                                      bg="#f0f4f8", fg="#627d98", width=10)
+        self.loading_label.pack(side=tk.LEFT, padx=5)
+
+    def show_loading(self, busy):
+        self.loading_label.config(text="Загрузка…" if busy else "")
+
     def create_recommendation_section(self):
         rec_frame = tk.LabelFrame(self.root, text=" Рекомендация ", font=("Helvetica", 12, "bold"),
                                   bg="#e8f4f8", fg="#2c3e50")
@@ -75,17 +115,73 @@ class SmartAssistantGUI:
                                   bg="#e8f4f8", fg="#555", justify=tk.LEFT, anchor="w")
         self.rec_label.pack(fill=tk.X, padx=10, pady=5)
 
+    def create_debug_bar(self):
+        self.debug_bar = tk.Label(self.root, text="", font=("Courier", 9), bg="#243b53", fg="#d9e2ec",
+                                  anchor="w", justify=tk.LEFT)
+        self.root.bind("<F12>", self.toggle_debug)
+
+    def toggle_debug(self, event=None):
+        if self.metrics.enabled:
+            self.metrics.disable()
+            self.debug_bar.pack_forget()
+        else:
+            self.metrics.enable(self.conn)
+            self.metrics.enable(self.scorer.conn)
+            self.debug_bar.config(text="Отладка: замеры появятся после следующего обновления")
+            self.debug_bar.pack(side=tk.BOTTOM, fill=tk.X)
+
+    def update_debug_bar(self):
+        # Замеры с прошлого обновления: рекомендация, сохранение, перерисовка
+        if self.metrics.enabled:
+            self.debug_bar.config(text=self.metrics.status_line())
+            self.metrics.reset()
+
     # === Основные методы обновления ===
     def refresh_all(self):
+        self.sync_external_changes()
         self.load_schedule()
         self.gui_tabs.refresh_all_tabs()
 
+    def invalidate(self):
+        self.calc.invalidate()
+        self.scorer.invalidate()
+
+    def sync_external_changes(self):
+        # Что поменялось снаружи, неизвестно: граф перечитывается целиком
+        # (и подменяется разом — фоновый расчёт не увидит его наполовину),
+        # расписание, энергия и кэши оценок сбрасываются (как в server.py)
+        current = self.watch.execute("PRAGMA data_version").fetchone()[0]
+        if current == self.data_version:
+            return
+        self.data_version = current
+        with self.storage.reader() as conn:
+            self.calc.graph.load(conn)
+        with self.scoring_lock:
+            context = self.calc.schedule_context
+            context.invalidate_schedule()
+            context.invalidate_energy()
+            self.invalidate()
+
+    def on_schedule_changed(self, changes):
+        self.calc.schedule_context.invalidate_schedule()
+
+    def on_energy_changed(self, changes):
+        self.calc.schedule_context.invalidate_energy()
+
+    @contextmanager
+    def reader(self):
+        # Соединение из пула для фоновой загрузки; при включённой отладке его
+        # запросы тоже попадают в замеры
+        with self.storage.reader() as conn:
+            if self.metrics.enabled:
+                self.metrics.enable(conn)
+            with self.metrics.phase("fetch"):
+                yield conn
+
     def load_schedule(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT day_of_week, start_time, end_time FROM schedule")
-        schedule = {row[0]: f"{row[1]}–{row[2]}" for row in cursor.fetchall()}
-        day = datetime.now().strftime("%A").lower()
-        today_str = schedule.get(day, "не задано")
+        schedule = self.calc.schedule_context.schedule()
+        day = DAYS[datetime.now().weekday()]
+        today_str = "–".join(schedule[day]) if day in schedule else "не задано"
         self.root.title(f"Трекер задач | Сегодня: {today_str}")
 
     # === Методы открытия окон (делегируем GUIWindows) ===
@@ -101,14 +197,30 @@ class SmartAssistantGUI:
     def open_set_energy(self):
         self.gui_windows.open_set_energy()
 
+    def plan_horizon(self):
+        if self.horizon is None:
+            self.horizon = HorizonScheduler(self.calc)
+        with self.storage.write_lock:
+            summary = self.horizon.plan()
+        self.events.publish(TASKS)
+        messagebox.showinfo("План на неделю", "\n".join(format_horizon(summary)))
+
     # === Рекомендация ===
     def show_recommendation(self):
-        calc = PriorityCalculator(self.conn)
-        rec = calc.recommend_task()
-        if not rec:
+        scorer, lock = self.scorer, self.scoring_lock
+
+        def work():
+            with lock:
+                return scorer.recommend_tasks(6)
+
+        self.executor.submit("recommend", work, self.show_recommendation_result)
+
+    def show_recommendation_result(self, recs):
+        if not recs:
             self.rec_label.config(text="Сейчас не рабочее время или нет задач. Отдыхай!")
             return
 
+        rec = recs[0]
         t = rec["task"]
         original_importance = t.importance_level * 2
 
@@ -118,6 +230,10 @@ class SmartAssistantGUI:
                 f"Почему именно сейчас:\n"
                 f"{rec['reason']}"
                 )
+        if len(recs) > 1:
+            text += "\n\nДальше:\n" + "\n".join(
+                f"{i}. {alt['task'].title} — {alt['score']:.3f}"
+                for i, alt in enumerate(recs[1:], 2))
         
         self.rec_label.config(
             text=text,
@@ -128,11 +244,42 @@ class SmartAssistantGUI:
             wraplength=900
         )
 
-        cursor = self.conn.cursor()
-        cursor.execute('UPDATE tasks SET status = "in_progress" WHERE id = ?', (t.id,))
-        self.conn.commit()
-        self.refresh_all()
+        with self.storage.write() as conn, self.metrics.phase("save"):
+            mutation = task_mutations.set_status(conn, [t.id], "in_progress", self.user_id)
+        self.apply_mutation(mutation)
+
+    def apply_mutation(self, mutation):
+        # Всё, что зависит от задач, — по итогу одной массовой операции: граф
+        # зависимостей, план на неделю, затем события (кэши, вкладки, цели)
+        graph = self.calc.graph
+        for task_id in mutation.task_ids:
+            if mutation.action == "delete":
+                graph.remove_task(task_id)
+            elif mutation.status:
+                graph.set_status(task_id, mutation.status)
+
+        if self.horizon and mutation.task_ids:
+            if mutation.action == "postpone":
+                method = self.horizon.postpone_tasks
+            elif mutation.action == "delete" or mutation.status in ("done", "in_progress"):
+                method = self.horizon.remove_tasks
+            else:
+                # вернулись в todo или поменялись поля — место в плане пересчитывается
+                method = self.horizon.add_tasks
+            # Один проход планировщика и одна транзакция на всю операцию
+            with self.storage.write_lock:
+                method(mutation.task_ids)
+
+        self.events.publish(TASKS, mutation.task_ids)
+        if mutation.goal_ids:
+            self.events.publish(GOALS, mutation.goal_ids)
 
     def __del__(self):
-        if hasattr(self, 'conn'):
-            self.conn.close()
\ No newline at end of file
+        if hasattr(self, 'executor'):
+            self.executor.shutdown()
+        if hasattr(self, 'scorer'):
+            self.scorer.conn.close()
+        if hasattr(self, 'watch'):
+            self.watch.close()
+        if hasattr(self, 'storage'):
+            self.storage.close()
@@ -0,0 +1,102 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from init_db import init_db
+
+# Подключения к базе: одно пишущее в режиме WAL и небольшой пул только для
+# чтения. В WAL читатели не ждут писателя и видят последнее закоммиченное
+# состояние, поэтому GUI, CLI и фоновые задачи читают одновременно с записью.
+# Пишущее соединение — то, что раньше было единственным self.conn в GUI.
+
+DB_PATH = "assistant.db"
+READER_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5_000       # ждать блокировку вместо "database is locked"
+CACHE_SIZE_KIB = 32 * 1024    # страничный кэш на соединение
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def tune(conn: sqlite3.Connection):
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+
+def open_writer(path: str = DB_PATH) -> sqlite3.Connection:
+    # check_same_thread=False: писать могут и фоновые потоки, под Storage.write()
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    # В WAL обычной синхронизации достаточно: коммит не теряет целостность
+    conn.execute("PRAGMA synchronous = NORMAL")
+    tune(conn)
+    return conn
+
+
+def open_reader(path: str = DB_PATH) -> sqlite3.Connection:
+    # Только чтение и автокоммит: каждый SELECT видит свежий снимок и не
+    # держит транзакцию между запросами
+    uri = "file:" + os.path.abspath(path).replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA query_only = 1")
+    tune(conn)
+    return conn
+
+
+class Storage:
+    def __init__(self, path: str = DB_PATH, readers: int = READER_POOL_SIZE):
+        # Калькулятор импортируем здесь: open_writer/open_reader нужны и
+        # консольным командам, которым он не нужен (cli.py)
+        from priority_calculator import get_dependency_graph
+
+        self.path = os.path.abspath(path)
+        self.writer = open_writer(self.path)
+        init_db(self.writer)
+        # Общий на файл граф загружаем на пишущем соединении: соединения пула
+        # в это время может держать другой поток. Расписание и энергия читают
+        # на своём соединении (get_schedule_context)
+        get_dependency_graph(self.writer)
+
+        self.write_lock = threading.RLock()
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(readers)
+
+    @contextmanager
+    def reader(self):
+        # Соединение из пула (создаётся при первой нужде); если заняты все,
+        # ждём, пока какое-нибудь вернут
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = open_reader(self.path)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._pool.put(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def write(self):
+        # Одна транзакция на блок: commit при успехе, rollback при ошибке
+        with self.write_lock:
+            try:
+                yield self.writer
+            except BaseException:
+                self.writer.rollback()
+                raise
+            self.writer.commit()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self.writer.close()
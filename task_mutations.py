@@ -0,0 +1,93 @@
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from init_db import DEFAULT_USER_ID
+
+# Массовые изменения задач: на действие — один запрос по всему выбору
+# (id передаются JSON-массивом через json_each), RETURNING возвращает, какие
+# задачи реально изменились и к каким целям они относятся. Транзакцией
+# управляет вызывающий (Storage.write()), так что несколько операций можно
+# собрать в одну. Граф, кэши и события обновляет по результату
+# SmartAssistantGUI.apply_mutation.
+# Меняются только задачи пользователя user_id: чужие id из выбора пропускаются.
+
+# Поля, которые можно менять сразу у всего выбора
+EDITABLE_FIELDS = ("goal_id", "importance_level", "energy_type", "task_type",
+                   "duration_minutes", "deadline", "scheduled_date", "contribution")
+
+_SELECTED = "user_id = ? AND id IN (SELECT value FROM json_each(?))"
+
+
+class Mutation:
+    # Итог одной массовой операции: action — status, postpone, delete или
+    # edit; status — новый статус (для status и postpone)
+    def __init__(self, action: str, rows: List[tuple], status: Optional[str] = None,
+                 extra_goal_ids: Iterable[int] = ()):
+        self.action = action
+        self.status = status
+        self.task_ids = [row[0] for row in rows]
+        self.goal_ids = sorted({row[1] for row in rows if row[1] is not None} | set(extra_goal_ids))
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+
+def set_status(conn: sqlite3.Connection, task_ids: List[int], status: str,
+               user_id: int = DEFAULT_USER_ID) -> Mutation:
+    cursor = conn.execute(f'''
+        UPDATE tasks SET status = ?
+        WHERE {_SELECTED} AND status != ?
+        RETURNING id, goal_id
+    ''', (status, user_id, json.dumps(task_ids), status))
+    return Mutation("status", cursor.fetchall(), status)
+
+
+def postpone(conn: sqlite3.Connection, task_ids: List[int], date: str,
+             user_id: int = DEFAULT_USER_ID) -> Mutation:
+    # Невыполненные задачи — на дату date и обратно в todo
+    cursor = conn.execute(f'''
+        UPDATE tasks SET scheduled_date = ?, status = 'todo'
+        WHERE {_SELECTED} AND status != 'done'
+        RETURNING id, goal_id
+    ''', (date, user_id, json.dumps(task_ids)))
+    return Mutation("postpone", cursor.fetchall(), "todo")
+
+
+def delete(conn: sqlite3.Connection, task_ids: List[int], user_id: int = DEFAULT_USER_ID) -> Mutation:
+    # Зависимости удалённых задач убирает триггер tasks_delete_dependencies
+    cursor = conn.execute(f"DELETE FROM tasks WHERE {_SELECTED} RETURNING id, goal_id",
+                          (user_id, json.dumps(task_ids)))
+    return Mutation("delete", cursor.fetchall())
+
+
+def edit(conn: sqlite3.Connection, task_ids: List[int], fields: Dict[str, Any],
+         user_id: int = DEFAULT_USER_ID) -> Mutation:
+    unknown = set(fields) - set(EDITABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Нельзя менять поля: {', '.join(sorted(unknown))}")
+    if not fields:
+        return Mutation("edit", [])
+    if fields.get("goal_id") is not None:
+        cursor = conn.execute("SELECT 1 FROM goals WHERE id = ? AND user_id = ?", (fields["goal_id"], user_id))
+        if cursor.fetchone() is None:
+            raise ValueError(f"Нет цели {fields['goal_id']}")
+    selected = (user_id, json.dumps(task_ids))
+
+    # При смене цели прогресс меняется и у прежних целей
+    old_goal_ids = []
+    if "goal_id" in fields:
+        cursor = conn.execute(f"SELECT DISTINCT goal_id FROM tasks WHERE {_SELECTED} AND goal_id IS NOT NULL",
+                              selected)
+        old_goal_ids = [row[0] for row in cursor.fetchall()]
+
+    columns = list(fields)
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    changed = " OR ".join(f"{column} IS NOT ?" for column in columns)
+    values = [fields[column] for column in columns]
+    cursor = conn.execute(f'''
+        UPDATE tasks SET {assignments}
+        WHERE {_SELECTED} AND ({changed})
+        RETURNING id, goal_id
+    ''', values + list(selected) + values)
+    return Mutation("edit", cursor.fetchall(), extra_goal_ids=old_goal_ids)
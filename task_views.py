@@ -0,0 +1,266 @@
+import json
+import sqlite3
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from init_db import DEFAULT_USER_ID
+from priority_calculator import PriorityCalculator, get_dependency_graph
+
+# Данные для вкладок GUITabs без Tk: строки уже в том виде, в каком их
+# показывает Treeview, — (values, tag). Так их можно мерить и переиспользовать.
+
+
+TASK_COLUMNS = "t.id, t.title, t.duration_minutes, t.importance_level, t.deadline, g.title"
+STATUS_RU = {"todo": "к выполнению", "in_progress": "в процессе", "done": "выполнена"}
+
+
+class TaskList:
+    # Список задач вкладки для постраничного чтения (keyset): фильтр, ключ
+    # сортировки — столбцы с направлением (True — по убыванию), последний
+    # всегда t.id, — и перевод страницы строк в (values, tag).
+    # Страница продолжает предыдущую с её последнего ключа, без OFFSET.
+    def __init__(self, where: str, params: tuple, order: List[Tuple[str, bool]],
+                 columns: str = TASK_COLUMNS,
+                 format_rows: Callable[[sqlite3.Connection, list], list] = None):
+        self.where = where
+        self.params = params
+        self.order = order
+        self.columns = columns
+        self.format_rows = format_rows or _task_rows
+
+    def count(self, conn: sqlite3.Connection) -> int:
+        cursor = conn.execute(f"SELECT COUNT(*) FROM tasks t WHERE {self.where}", self.params)
+        return cursor.fetchone()[0]
+
+    def page(self, conn: sqlite3.Connection, after: Optional[tuple], limit: int) -> List[tuple]:
+        # [(ключ, values, tag)] — до limit строк после ключа after
+        where, params = self._after(after)
+        cursor = conn.execute(f'''
+            SELECT {self._keys()}, {self.columns}
+            FROM tasks t
+            LEFT JOIN goals g ON t.goal_id = g.id
+            WHERE {where}
+            ORDER BY {self._order_by()}
+            LIMIT ?
+        ''', params + (limit,))
+        width = len(self.order)
+        rows = cursor.fetchall()
+        formatted = self.format_rows(conn, [row[width:] for row in rows])
+        return [(row[:width], values, tag) for row, (values, tag) in zip(rows, formatted)]
+
+    def key_at(self, conn: sqlite3.Connection, after: Optional[tuple], skip: int) -> Optional[tuple]:
+        # Ключ skip-й строки после after: граница дальней страницы при прыжке
+        # полосой прокрутки. Читаются только столбцы ключа из индекса
+        where, params = self._after(after)
+        cursor = conn.execute(f'''
+            SELECT {self._keys()} FROM tasks t
+            WHERE {where}
+            ORDER BY {self._order_by()}
+            LIMIT 1 OFFSET ?
+        ''', params + (skip - 1,))
+        return cursor.fetchone()
+
+    def rows(self, conn: sqlite3.Connection, page_size: int = 1000) -> Iterator[Tuple[tuple, str]]:
+        # Весь список по страницам, без fetchall по всему результату
+        after = None
+        while True:
+            page = self.page(conn, after, page_size)
+            for _, values, tag in page:
+                yield values, tag
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    def _keys(self) -> str:
+        return ", ".join(column for column, _ in self.order)
+
+    def _order_by(self) -> str:
+        return ", ".join(f"{column} DESC" if desc else column for column, desc in self.order)
+
+    def _after(self, key: Optional[tuple]) -> Tuple[str, tuple]:
+        if key is None:
+            return self.where, self.params
+        directions = {desc for _, desc in self.order}
+        if len(directions) == 1 and None not in key:
+            # Одно направление и нет NULL: сравнение row value идёт по индексу диапазоном
+            op = "<" if directions.pop() else ">"
+            placeholders = ", ".join("?" * len(key))
+            return f"{self.where} AND ({self._keys()}) {op} ({placeholders})", self.params + tuple(key)
+
+        # Иначе — лексикографически по столбцам. NULL в SQLite идёт первым
+        # при ASC и последним при DESC
+        terms, params = [], []
+        for i, ((column, desc), value) in enumerate(zip(self.order, key)):
+            equal = [f"{prev} IS ?" for prev, _ in self.order[:i]]
+            params.extend(key[:i])
+            if value is None:
+                terms.append(" AND ".join(equal + ["0" if desc else f"{column} IS NOT NULL"]))
+                continue
+            later = f"({column} < ? OR {column} IS NULL)" if desc else f"{column} > ?"
+            terms.append(" AND ".join(equal + [later]))
+            params.append(value)
+        where = " OR ".join(f"({term})" for term in terms)
+        return f"{self.where} AND ({where})", self.params + tuple(params)
+
+
+# Списки вкладок — задачи одного пользователя: user_id стоит первым и в
+# условии, и в индексах, так что страница читает только его диапазон
+
+def today_list(user_id: int = DEFAULT_USER_ID) -> TaskList:
+    today = datetime.now().strftime("%Y-%m-%d")
+    return TaskList("t.user_id = ? AND t.scheduled_date = ? AND t.status IN ('todo', 'in_progress')",
+                    (user_id, today),
+                    [("t.importance_level", True), ("t.id", True)],
+                    TASK_COLUMNS + ", t.status", _today_rows)
+
+
+def in_progress_list(user_id: int = DEFAULT_USER_ID) -> TaskList:
+    today = datetime.now().strftime("%Y-%m-%d")
+    return TaskList("t.user_id = ? AND t.scheduled_date = ? AND t.status = 'in_progress'", (user_id, today),
+                    [("t.id", False)])
+
+
+def done_list(user_id: int = DEFAULT_USER_ID) -> TaskList:
+    today = datetime.now().strftime("%Y-%m-%d")
+    return TaskList("t.user_id = ? AND t.scheduled_date = ? AND t.status = 'done'", (user_id, today),
+                    [("t.id", True)])
+
+
+def goal_task_list(goal_id: int) -> TaskList:
+    # Цель принадлежит одному пользователю, её задачи — тоже
+    return TaskList("t.goal_id = ?", (goal_id,),
+                    [("t.status", False), ("t.deadline", False), ("t.id", False)],
+                    "t.id, t.title, t.status, t.deadline", _goal_task_rows)
+
+
+def today_rows(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID) -> List[Tuple[tuple, str]]:
+    return list(today_list(user_id).rows(conn))
+
+
+def in_progress_rows(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID) -> List[Tuple[tuple, str]]:
+    return list(in_progress_list(user_id).rows(conn))
+
+
+def done_rows(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID) -> List[Tuple[tuple, str]]:
+    return list(done_list(user_id).rows(conn))
+
+
+def _today_rows(conn: sqlite3.Connection, rows: list) -> List[Tuple[tuple, str]]:
+    # Блокировки берём из графа, названия блокеров — одним запросом на страницу
+    graph = get_dependency_graph(conn)
+    blocker_ids = {row[0]: graph.open_blocker_ids(row[0]) for row in rows if graph.is_blocked(row[0])}
+    titles = {}
+    if blocker_ids:
+        all_ids = sorted({b for ids in blocker_ids.values() for b in ids})
+        cursor = conn.execute("SELECT id, title FROM tasks WHERE id IN (SELECT value FROM json_each(?))",
+                              (json.dumps(all_ids),))
+        titles = dict(cursor.fetchall())
+    blockers = {task_id: [f"{b}: {titles.get(b, '')}" for b in ids]
+                for task_id, ids in blocker_ids.items()}
+
+    result = []
+    for row in rows:
+        task_id, title, duration, importance, deadline, goal_title, status = row
+
+        deadline_str = deadline[:16].replace("T", " ") if deadline else "-"
+        status_suffix = " [в процессе]" if status == "in_progress" else ""
+
+        # Проверка: заблокирована ли задача
+        blocking_tasks = blockers.get(task_id, [])
+        blocked = bool(blocking_tasks)
+
+        # Отображение
+        if blocked:
+            hint = ", ".join(blocking_tasks[:2])
+            if len(blocking_tasks) > 2:
+                hint += f" и ещё {len(blocking_tasks)-2}"
+            title_display = f"[Заблокирована: {hint}] {title}"
+            tag = "blocked"
+        else:
+            title_display = f"{title}{status_suffix}"
+            tag = "normal" if status == "todo" else "in_progress"
+
+        result.append(((task_id, title_display, f"{duration} мин", f"{importance}/10",
+                        deadline_str, goal_title or "-"), tag))
+    return result
+
+
+def _task_rows(conn: sqlite3.Connection, rows: list) -> List[Tuple[tuple, str]]:
+    return [_task_values(row) for row in rows]
+
+
+def _task_values(row: tuple) -> Tuple[tuple, str]:
+    deadline = row[4][:16].replace("T", " ") if row[4] else "-"
+    return (row[0], row[1], f"{row[2]} мин", f"{row[3]}/10", deadline, row[5] or "-"), ""
+
+
+def _goal_task_rows(conn: sqlite3.Connection, rows: list) -> List[Tuple[tuple, str]]:
+    return [((task_id, title, STATUS_RU[status], deadline[:16].replace("T", " ") if deadline else "-"), "")
+            for task_id, title, status, deadline in rows]
+
+
+def goal_rows(conn: sqlite3.Connection, user_id: int = DEFAULT_USER_ID,
+              goal_ids: Optional[Iterable[int]] = None) -> List[Tuple[tuple, str]]:
+    # goal_ids — только эти цели (для точечного обновления дерева)
+    cursor = conn.cursor()
+    where, params = "WHERE g.user_id = ?", (user_id,)
+    if goal_ids is not None:
+        where += " AND g.id IN (SELECT value FROM json_each(?))"
+        params += (json.dumps(sorted(goal_ids)),)
+
+    # Готовые агрегаты из goal_stats одним запросом
+    cursor.execute(f'''
+        SELECT g.id, g.title, g.weight, g.deadline,
+               COALESCE(s.total_tasks, 0), COALESCE(s.done_tasks, 0),
+               COALESCE(s.total_importance, 0), COALESCE(s.done_importance, 0)
+        FROM goals g
+        LEFT JOIN goal_stats s ON s.goal_id = g.id
+        {where}
+        ORDER BY
+            CASE WHEN g.deadline IS NULL THEN 1 ELSE 0 END,
+            g.deadline ASC
+    ''', params)
+    goals = cursor.fetchall()
+
+    result = []
+    for goal in goals:
+        (goal_id, title, base_weight, deadline,
+         total_tasks, done_tasks, total_importance, done_importance) = goal
+        deadline_str = deadline or "—"
+
+        if total_importance > 0:
+            percent = int(100 * done_importance / total_importance)
+            progress_text = f"{done_importance}/{total_importance} важн. ({percent}%)"
+        else:
+            percent = 0 if total_tasks == 0 else int(100 * done_tasks / total_tasks)
+            progress_text = f"{done_tasks}/{total_tasks} задач ({percent}%)"
+
+        if percent == 100 and total_tasks > 0:
+            progress_text += " [Выполнена]"
+
+        current_weight = PriorityCalculator.goal_weight_from_totals(
+            base_weight, total_importance, done_importance)
+
+        if abs(current_weight - base_weight) < 0.05:
+            weight_display = f"{base_weight:.2f}"
+        else:
+            weight_display = f"{base_weight:.2f} → {current_weight:.2f}"
+            if current_weight >= base_weight * 2.0:
+                weight_display += " [Горячо!]"
+            elif current_weight >= base_weight * 1.5:
+                weight_display += " [Тепло]"
+
+        if percent == 100 and total_tasks > 0:
+            tag = "completed"
+        elif current_weight >= base_weight * 2.5:
+            tag = "on_fire"
+        elif current_weight >= base_weight * 1.8:
+            tag = "hot"
+        elif current_weight >= base_weight * 1.3:
+            tag = "warm"
+        else:
+            tag = "normal"
+
+        result.append(((goal_id, title, weight_display, deadline_str,
+                        done_tasks, total_tasks, progress_text), tag))
+    return result
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks.cli_startup import COMMANDS, FORBIDDEN, IMPORT_BUDGET_MS, command_args, imported
+from benchmarks.generate import generate
+
+# Консольный вход не тянет GUI и numpy и импортируется в пределах бюджета
+# (отчёт по времени команд — python -m benchmarks.cli_startup)
+
+N_TASKS = 500
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    return generate(str(tmp_path_factory.mktemp("cli") / "cli.db"), N_TASKS)
+
+
+def test_import_cli_within_budget():
+    modules, cli_ms = imported([])
+    assert not sorted(modules & set(FORBIDDEN))
+    assert cli_ms <= IMPORT_BUDGET_MS, f"import cli: {cli_ms:.1f} мс"
+
+
+@pytest.mark.parametrize("command", COMMANDS, ids=" ".join)
+def test_command_skips_heavy_modules(db_path, command):
+    modules, _ = imported(command_args(db_path, command))
+    assert not sorted(modules & set(FORBIDDEN))
@@ -0,0 +1,25 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.generate import generate
+from benchmarks.query_plans import checks, check
+
+# Горячие запросы на сгенерированной базе должны идти по своим индексам
+# (подробный вывод планов — python -m benchmarks.query_plans)
+
+N_TASKS = 5_000
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    conn = sqlite3.connect(generate(str(tmp_path_factory.mktemp("plans") / "plans.db"), N_TASKS))
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_indexes(conn):
+    failures = []
+    for name, func, expected_index, target in checks(conn):
+        failures.extend(check(target, name, func, expected_index))
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,407 @@
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from init_db import DEFAULT_USER_ID, init_db
+from priority_calculator import get_dependency_graph, DependencyCycleError
+
+# Потоковый импорт и экспорт целей и задач в JSONL и CSV (формат — по
+# расширению файла). Одна запись — одна строка файла, вид записи в поле kind
+# (goal или task, по умолчанию task); цели должны идти раньше задач, которые
+# ссылаются на них по названию (поле goal).
+# Зависимости: blocked_by — список ссылок. Строка — ref другой задачи из того
+# же файла (можно и ниже по файлу), число (в CSV — "#12") — id задачи,
+# уже лежащей в базе. В CSV ссылки разделяются ";".
+# Память не растёт с размером файла: строки читаются и вставляются пачками по
+# CHUNK_SIZE через executemany, ref и ещё не разрешённые зависимости лежат во
+# временных таблицах, экспорт пишет прямо из курсора.
+# Запуск: python -m transfer import tasks.jsonl | python -m transfer export tasks.csv
+
+CHUNK_SIZE = 1_000
+MAX_ERRORS = 100
+
+STATUSES = ("todo", "in_progress", "done")
+ENERGY_TYPES = ("low", "medium", "high")
+TASK_TYPES = ("creative", "analytical", "routine", "communication")
+
+TASK_FIELDS = ("ref", "title", "duration_minutes", "importance_level", "status", "created_date",
+               "scheduled_date", "deadline", "goal", "energy_type", "task_type", "contribution",
+               "blocked_by")
+GOAL_FIELDS = ("title", "weight", "deadline")
+CSV_FIELDS = ("kind",) + TASK_FIELDS + ("weight",)
+
+
+class ImportReport:
+    def __init__(self):
+        self.goals = 0
+        self.tasks = 0
+        self.dependencies = 0
+        self.error_count = 0
+        self.errors: List[str] = []   # первые MAX_ERRORS
+
+    def error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"строка {line}: {message}")
+
+    def lines(self) -> List[str]:
+        lines = [f"Целей: {self.goals}, задач: {self.tasks}, зависимостей: {self.dependencies}"]
+        if self.error_count:
+            lines.append(f"Пропущено с ошибками: {self.error_count}")
+            lines.extend(self.errors)
+            if self.error_count > len(self.errors):
+                lines.append(f"... и ещё {self.error_count - len(self.errors)}")
+        return lines
+
+
+def import_file(conn: sqlite3.Connection, path: str, today: Optional[date] = None,
+                user_id: int = DEFAULT_USER_ID) -> ImportReport:
+    # Неверные строки пропускаются и попадают в отчёт; каждая пачка — своя
+    # транзакция, зависимости связываются в конце одной транзакцией.
+    # Цели и задачи достаются пользователю user_id, ссылаться можно только на его
+    today = (today or date.today()).isoformat()
+    report = ImportReport()
+    cursor = conn.cursor()
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS import_refs (ref TEXT PRIMARY KEY, task_id INTEGER NOT NULL)")
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS import_deps (
+            line INTEGER NOT NULL, task_id INTEGER NOT NULL, blocker_ref TEXT, blocker_id INTEGER
+        )
+    ''')
+    cursor.execute("DELETE FROM import_refs")
+    cursor.execute("DELETE FROM import_deps")
+    conn.commit()
+
+    goals: List[tuple] = []
+    tasks: List[Tuple[int, Dict]] = []
+    try:
+        for line, record in read_rows(path):
+            if isinstance(record, str):
+                report.error(line, record)
+                continue
+            try:
+                kind = record.get("kind") or "task"
+                if kind == "goal":
+                    goals.append(_goal_values(record))
+                elif kind == "task":
+                    tasks.append((line, _task_values(record, today)))
+                else:
+                    raise ValueError(f"неизвестный вид записи «{kind}»")
+            except (ValueError, TypeError) as e:
+                report.error(line, str(e))
+                continue
+            if len(goals) + len(tasks) >= CHUNK_SIZE:
+                _insert_chunk(conn, goals, tasks, report, user_id)
+                goals, tasks = [], []
+        _insert_chunk(conn, goals, tasks, report, user_id)
+        _link_dependencies(conn, report, user_id)
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        cursor.execute("DELETE FROM import_refs")
+        cursor.execute("DELETE FROM import_deps")
+        conn.commit()
+    return report
+
+
+def export_file(conn: sqlite3.Connection, path: str, user_id: int = DEFAULT_USER_ID) -> int:
+    # Сначала цели, потом задачи пользователя; ref задачи — её id, так что
+    # файл можно загрузить обратно в другую базу вместе с зависимостями
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        write = _csv_writer(f) if path.endswith(".csv") else _jsonl_writer(f)
+        cursor = conn.execute("SELECT title, weight, deadline FROM goals WHERE user_id = ? ORDER BY id",
+                              (user_id,))
+        for row in cursor:
+            write(dict(zip(GOAL_FIELDS, row), kind="goal"))
+            count += 1
+        cursor = conn.execute('''
+            SELECT t.id, t.title, t.duration_minutes, t.importance_level, t.status, t.created_date,
+                   t.scheduled_date, t.deadline, g.title, t.energy_type, t.task_type, t.contribution,
+                   (SELECT json_group_array(d.blocker_id) FROM task_dependencies d WHERE d.task_id = t.id)
+            FROM tasks t
+            LEFT JOIN goals g ON t.goal_id = g.id
+            WHERE t.user_id = ?
+            ORDER BY t.id
+        ''', (user_id,))
+        for row in cursor:
+            record = dict(zip(TASK_FIELDS, row), kind="task")
+            record["ref"] = str(record["ref"])
+            record["blocked_by"] = [str(blocker_id) for blocker_id in json.loads(record["blocked_by"])]
+            write(record)
+            count += 1
+    return count
+
+
+def read_rows(path: str) -> Iterator[Tuple[int, Dict]]:
+    # (номер строки, запись); пустые ячейки CSV — отсутствующие поля, вместо
+    # неразборчивой строки JSONL — текст ошибки
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            reader = csv.DictReader(f)
+            for record in reader:
+                record = {key: value for key, value in record.items() if key and value not in ("", None)}
+                if "blocked_by" in record:
+                    record["blocked_by"] = [_csv_ref(ref) for ref in record["blocked_by"].split(";") if ref.strip()]
+                yield reader.line_num, record
+        else:
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    record = f"неразборчивый JSON: {e}"
+                yield line, record if isinstance(record, (dict, str)) else "ожидается объект JSON"
+
+
+def _csv_ref(ref: str):
+    ref = ref.strip()
+    return int(ref[1:]) if ref.startswith("#") and ref[1:].isdigit() else ref
+
+
+def _csv_writer(f):
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+
+    def write(record: Dict):
+        if "blocked_by" in record:
+            record["blocked_by"] = ";".join(record["blocked_by"])
+        writer.writerow(record)
+    return write
+
+
+def _jsonl_writer(f):
+    def write(record: Dict):
+        f.write(json.dumps({key: value for key, value in record.items() if value is not None},
+                           ensure_ascii=False))
+        f.write("\n")
+    return write
+
+
+# === Проверка записей ===
+def _goal_values(record: Dict) -> tuple:
+    return (_text(record, "title"),
+            _number(record, "weight", float, 0.1, 1.0, 1.0),
+            _moment(record, "deadline"))
+
+
+def _task_values(record: Dict, today: str) -> Dict:
+    blocked_by = record.get("blocked_by") or []
+    if not isinstance(blocked_by, list) or not all(isinstance(ref, (int, str)) for ref in blocked_by):
+        raise ValueError("blocked_by должен быть списком ссылок")
+    ref = record.get("ref")
+    return {
+        "ref": None if ref is None else str(ref),
+        "title": _text(record, "title"),
+        "duration_minutes": _number(record, "duration_minutes", int, 1, None, None),
+        "importance_level": _number(record, "importance_level", int, 1, 10, None),
+        "status": _choice(record, "status", STATUSES, "todo"),
+        "created_date": _day(record, "created_date") or today,
+        "scheduled_date": _day(record, "scheduled_date") or today,
+        "deadline": _moment(record, "deadline"),
+        "goal": record.get("goal") and str(record["goal"]).strip(),
+        "energy_type": _choice(record, "energy_type", ENERGY_TYPES, "medium"),
+        "task_type": _choice(record, "task_type", TASK_TYPES, "routine"),
+        "contribution": _number(record, "contribution", float, 0.0, 1.0, 0.8),
+        "blocked_by": blocked_by,
+    }
+
+
+def _text(record: Dict, key: str) -> str:
+    value = str(record.get(key) or "").strip()
+    if not value:
+        raise ValueError(f"не заполнено {key}")
+    return value
+
+
+def _number(record: Dict, key: str, kind, low, high, default):
+    value = record.get(key)
+    if value is None:
+        if default is None:
+            raise ValueError(f"не заполнено {key}")
+        return default
+    if isinstance(value, bool) or (kind is int and isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{key}: ожидается {kind.__name__}, получено {value!r}")
+    try:
+        number = kind(value)
+    except ValueError:
+        raise ValueError(f"{key}: ожидается {kind.__name__}, получено {value!r}")
+    if number < low or (high is not None and number > high):
+        raise ValueError(f"{key} = {number} вне диапазона {low}–{high if high is not None else '∞'}")
+    return number
+
+
+def _choice(record: Dict, key: str, choices, default: str) -> str:
+    value = record.get(key) or default
+    if value not in choices:
+        raise ValueError(f"{key}: «{value}» не из {', '.join(choices)}")
+    return value
+
+
+def _day(record: Dict, key: str) -> Optional[str]:
+    value = record.get(key)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f"{key}: ожидается дата YYYY-MM-DD, получено {value!r}")
+
+
+def _moment(record: Dict, key: str) -> Optional[str]:
+    # Хранится как есть, как и в форме добавления: priority_calculator сам разбирает ISO.
+    # Время с поясом переводим в местное без пояса — калькулятор и планировщики
+    # вычитают его из наивного datetime.now()
+    value = record.get(key)
+    if value is None:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"{key}: ожидается дата или дата и время ISO, получено {value!r}")
+    if moment.tzinfo is not None:
+        return moment.astimezone().replace(tzinfo=None).isoformat(timespec="minutes")
+    return str(value)
+
+
+# === Вставка ===
+def _insert_chunk(conn: sqlite3.Connection, goals: List[tuple], tasks: List[Tuple[int, Dict]],
+                  report: ImportReport, user_id: int):
+    # Пишут и другие процессы (GUI, server.py, cli.py): блокировку записи
+    # берём до чтения MAX(id), иначе чужая вставка между ним и нашей даст
+    # конфликт первичного ключа посреди импорта
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    if goals:
+        cursor.executemany("INSERT INTO goals (user_id, title, weight, deadline) VALUES (?, ?, ?, ?)",
+                           [(user_id,) + goal for goal in goals])
+        report.goals += len(goals)
+
+    if tasks:
+        # Названия целей и повторы ref — одним запросом на пачку
+        titles = sorted({task["goal"] for _, task in tasks if task["goal"]})
+        cursor.execute('''
+            SELECT title, MIN(id) FROM goals
+            WHERE user_id = ? AND title IN (SELECT value FROM json_each(?))
+            GROUP BY title
+        ''', (user_id, json.dumps(titles)))
+        goal_ids = dict(cursor.fetchall())
+        refs = sorted({task["ref"] for _, task in tasks if task["ref"] is not None})
+        cursor.execute("SELECT ref FROM import_refs WHERE ref IN (SELECT value FROM json_each(?))",
+                       (json.dumps(refs),))
+        seen_refs = {row[0] for row in cursor.fetchall()}
+
+        # id назначаем сами, чтобы связать ref в той же пачке executemany
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tasks")
+        next_id = cursor.fetchone()[0] + 1
+        rows, ref_rows, dep_rows = [], [], []
+        for line, task in tasks:
+            if task["goal"] and task["goal"] not in goal_ids:
+                report.error(line, f"нет цели «{task['goal']}»")
+                continue
+            if task["ref"] is not None:
+                if task["ref"] in seen_refs:
+                    report.error(line, f"повторный ref «{task['ref']}»")
+                    continue
+                seen_refs.add(task["ref"])
+                ref_rows.append((task["ref"], next_id))
+            rows.append((next_id, user_id, task["title"], task["duration_minutes"], task["importance_level"],
+                         task["status"], task["created_date"], task["scheduled_date"], task["deadline"],
+                         goal_ids.get(task["goal"]), task["energy_type"], task["task_type"],
+                         task["contribution"]))
+            for blocker in task["blocked_by"]:
+                if isinstance(blocker, int):
+                    dep_rows.append((line, next_id, None, blocker))
+                else:
+                    dep_rows.append((line, next_id, blocker, None))
+            next_id += 1
+
+        cursor.executemany('''
+            INSERT INTO tasks (
+                id, user_id, title, duration_minutes, importance_level, status, created_date,
+                scheduled_date, deadline, goal_id, energy_type, task_type, contribution
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.executemany("INSERT INTO import_refs (ref, task_id) VALUES (?, ?)", ref_rows)
+        cursor.executemany("INSERT INTO import_deps (line, task_id, blocker_ref, blocker_id) VALUES (?, ?, ?, ?)",
+                           dep_rows)
+        report.tasks += len(rows)
+    conn.commit()
+
+
+def _link_dependencies(conn: sqlite3.Connection, report: ImportReport, user_id: int):
+    # Ссылки разрешаются join-ом с import_refs, id блокера должен быть задачей
+    # того же пользователя; циклы ловит граф зависимостей, перечитанный уже с
+    # новыми задачами. Блокировка записи — сразу: транзакцию, начатую чтением,
+    # SQLite не повысит до записи, если между ними коммитил другой процесс
+    conn.execute("BEGIN IMMEDIATE")
+    graph = get_dependency_graph(conn)
+    graph.load(conn)
+    cursor = conn.execute('''
+        SELECT d.line, d.task_id, COALESCE(d.blocker_id, r.task_id), d.blocker_ref, b.id
+        FROM import_deps d
+        LEFT JOIN import_refs r ON r.ref = d.blocker_ref
+        LEFT JOIN tasks b ON b.id = COALESCE(d.blocker_id, r.task_id) AND b.user_id = ?
+        ORDER BY d.task_id
+    ''', (user_id,))
+    insert = conn.cursor()
+    chunk = []
+    for line, task_id, blocker_id, blocker_ref, owned in cursor:
+        if blocker_id is None:
+            report.error(line, f"нет задачи с ref «{blocker_ref}»")
+            continue
+        if owned is None:
+            report.error(line, f"нет задачи с id {blocker_id}")
+            continue
+        try:
+            graph.add_task(task_id, graph.status[task_id], [blocker_id])
+        except DependencyCycleError as e:
+            report.error(line, str(e))
+            continue
+        chunk.append((task_id, blocker_id))
+        if len(chunk) >= CHUNK_SIZE:
+            report.dependencies += _insert_dependencies(insert, chunk)
+            chunk = []
+    report.dependencies += _insert_dependencies(insert, chunk)
+    conn.commit()
+
+
+def _insert_dependencies(cursor: sqlite3.Cursor, chunk: List[Tuple[int, int]]) -> int:
+    # Повторы в файле и уже лежащие в базе связи IGNORE пропускает: считаем
+    # только вставленные строки
+    if not chunk:
+        return 0
+    cursor.executemany("INSERT OR IGNORE INTO task_dependencies (task_id, blocker_id) VALUES (?, ?)", chunk)
+    return cursor.rowcount
+
+
+def main(argv=None) -> int:
+    from storage import DB_PATH, open_writer
+
+    parser = argparse.ArgumentParser(prog="python -m transfer", description="Импорт и экспорт целей и задач")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("path", help="файл .jsonl или .csv")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--user", type=int, default=DEFAULT_USER_ID, help="id пользователя")
+    args = parser.parse_args(argv)
+
+    conn = open_writer(args.db)
+    try:
+        init_db(conn)
+        if args.action == "import":
+            report = import_file(conn, args.path, user_id=args.user)
+            print("\n".join(report.lines()))
+            return 1 if report.error_count else 0
+        print(f"Записей: {export_file(conn, args.path, args.user)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
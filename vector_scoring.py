@@ -0,0 +1,104 @@
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
+
+from priority_calculator import (WEIGHTS, ENERGY_MATCH, TIME_OF_DAY_MATCH, Task, TaskBatch,
+                                 ENERGY_LEVELS, TASK_TYPES, ENERGY_CODES, TASK_TYPE_CODES,
+                                 UNKNOWN_TASK_TYPE, epoch_seconds)
+
+# Пакетный расчёт приоритетов: задачи раскладываются по столбцам, и все
+# компоненты считаются одним проходом NumPy по всему набору.
+# Эталоном остаётся скалярный PriorityCalculator.calculate_priority.
+
+TIMES_OF_DAY = ("morning", "afternoon", "evening", "night")
+
+# ENERGY_MATRIX[энергия пользователя, энергия задачи]
+ENERGY_MATRIX = np.array([[ENERGY_MATCH[user][task] for task in ENERGY_LEVELS]
+                          for user in ENERGY_LEVELS])
+# TIME_MATRIX[время суток, тип задачи]; последний столбец — неизвестный тип (0.5)
+TIME_MATRIX = np.array([[TIME_OF_DAY_MATCH[tod].get(t, 0.5) for t in TASK_TYPES] + [0.5]
+                        for tod in TIMES_OF_DAY])
+
+COMPONENTS = ("urgency", "importance", "goal_alignment", "dependency_bonus",
+              "context_match", "time_cost")
+
+
+def _round3(values: np.ndarray) -> np.ndarray:
+    # np.round округляет половинки к чётному по x*1000, а round() — по точному
+    # двоичному значению; спорные половинки досчитываем скалярно
+    scaled = values * 1000
+    rounded = np.round(scaled) / 1000
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        rounded[i] = round(float(values[i]), 3)
+    return rounded
+
+
+def task_columns(tasks: Sequence[Task]) -> Dict[str, np.ndarray]:
+    n = len(tasks)
+    deadline = np.full(n, np.nan)
+    for i, t in enumerate(tasks):
+        if t.deadline:
+            deadline[i] = epoch_seconds(t.deadline)
+
+    return {
+        "deadline": deadline,
+        "importance": np.fromiter((t.importance_level for t in tasks), dtype=np.float64, count=n),
+        "goal_weight": np.fromiter((t.goal_weight for t in tasks), dtype=np.float64, count=n),
+        "contribution": np.fromiter((t.contribution for t in tasks), dtype=np.float64, count=n),
+        "dependents": np.fromiter((t.dependents for t in tasks), dtype=np.float64, count=n),
+        "energy": np.fromiter((ENERGY_CODES[t.energy_type] for t in tasks), dtype=np.intp, count=n),
+        "task_type": np.fromiter((TASK_TYPE_CODES.get(t.task_type, UNKNOWN_TASK_TYPE) for t in tasks),
+                                 dtype=np.intp, count=n),
+        "duration": np.fromiter((t.duration for t in tasks), dtype=np.float64, count=n),
+    }
+
+
+def batch_columns(batch: TaskBatch) -> Dict[str, np.ndarray]:
+    # Массивы TaskBatch читаются через буфер, без обхода задач в Python
+    def column(values, dtype):
+        return np.frombuffer(values, dtype=values.typecode).astype(dtype) if len(values) else np.zeros(0, dtype)
+
+    return {
+        "deadline": column(batch.deadlines, np.float64),
+        "importance": column(batch.importance, np.float64),
+        "goal_weight": column(batch.goal_weights, np.float64),
+        "contribution": column(batch.contributions, np.float64),
+        "dependents": column(batch.dependents, np.float64),
+        "energy": column(batch.energy_codes, np.intp),
+        "task_type": column(batch.task_type_codes, np.intp),
+        "duration": column(batch.durations, np.float64),
+    }
+
+
+def score_columns(cols: Dict[str, np.ndarray], context: Dict) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    hours_left = np.maximum(0.1, (cols["deadline"] - epoch_seconds(context["now"])) / 3600)
+    with np.errstate(invalid="ignore"):
+        urgency = np.where(np.isnan(cols["deadline"]), 0.3,
+                           np.minimum(1.0, 1 / (hours_left ** 0.7)))
+
+    energy_match = ENERGY_MATRIX[ENERGY_CODES[context["energy_level"]], cols["energy"]]
+    time_match = TIME_MATRIX[TIMES_OF_DAY.index(context["time_of_day"]), cols["task_type"]]
+
+    components = {
+        "urgency": urgency,
+        "importance": cols["importance"] / 5.0,
+        "goal_alignment": np.minimum(1.0, cols["goal_weight"] * cols["contribution"]),
+        "dependency_bonus": np.minimum(0.5, np.log(1 + cols["dependents"]) * 0.3),
+        "context_match": (energy_match + time_match + 1.0) / 3.0,
+        "time_cost": np.minimum(1.0, cols["duration"] / 240.0),
+    }
+
+    score = np.zeros(len(urgency))
+    for k in COMPONENTS:
+        score = score + WEIGHTS[k] * components[k]
+    return _round3(score), {k: _round3(v) for k, v in components.items()}
+
+
+def score_tasks(tasks: Union[Sequence[Task], TaskBatch], context: Dict) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    cols = batch_columns(tasks) if isinstance(tasks, TaskBatch) else task_columns(tasks)
+    return score_columns(cols, context)
+
+
+def breakdown_at(breakdown: Dict[str, np.ndarray], i: int) -> Dict[str, float]:
+    return {k: float(breakdown[k][i]) for k in COMPONENTS}